@@ -0,0 +1,89 @@
+"""
+Benchmark reading tweets from columnar chunks against JSON logs
+
+Usage:
+    python benchmarks/columnar_store.py [tweet log] [chunk size]
+
+Converts the tweet log to columnar chunks in memory, then reports the size
+of each format and the time to turn its lines into the records seen by the
+mappers: JSON decoding of every tweet with the standard library and with
+the input protocol of the jobs, and chunks decoded with all columns or only
+the columns of the metro-words and poi-nearby jobs.
+
+"""
+import gc
+import os
+import sys
+import json
+import time
+import zlib
+from os.path import dirname
+
+ROOT = dirname(dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+DATA = os.path.join(ROOT, 'geotweet/data/mapreduce')
+
+from geotweet.mapreduce.utils.columnar import ColumnarValueProtocol, encode_chunk
+from geotweet.mapreduce.utils.columnar import DEFAULT_CHUNK_SIZE
+from geotweet.mapreduce.metro_wordcount import COLUMNS as METRO_COLUMNS
+from geotweet.mapreduce.poi_nearby_tweets import COLUMNS as POI_COLUMNS
+
+
+TWEET_LOG = os.path.join(DATA, 'twitter-test.log10000')
+REPEAT = 3
+
+
+def best(func):
+    """ best time of REPEAT runs with garbage collection disabled like timeit """
+    times = []
+    gc.disable()
+    try:
+        for i in range(REPEAT):
+            start = time.time()
+            result = func()
+            times.append(time.time() - start)
+    finally:
+        gc.enable()
+    return min(times), result
+
+
+def read_chunks(lines, columns=None):
+    protocol = ColumnarValueProtocol()
+    return [
+        record for line in lines
+        for record in protocol.read(line)[1].records(columns)
+    ]
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else TWEET_LOG
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_CHUNK_SIZE
+    with open(path, 'r') as f:
+        lines = [line.rstrip('\n') for line in f]
+    tweets = [json.loads(line) for line in lines]
+    chunks = [
+        encode_chunk(tweets[i:i + chunk_size])
+        for i in range(0, len(tweets), chunk_size)
+    ]
+    json_size = sum(len(line) + 1 for line in lines)
+    chunk_size = sum(len(line) + 1 for line in chunks)
+    print "{0} tweets in {1} chunks".format(len(tweets), len(chunks))
+    output = "    {0:<8} {1:10d} bytes  {2:10d} bytes zlib"
+    print output.format('json', json_size, len(zlib.compress('\n'.join(lines))))
+    print output.format('columnar', chunk_size, len(zlib.compress('\n'.join(chunks))))
+    protocol = ColumnarValueProtocol()
+    readers = [
+        ('stdlib json', lambda: [json.loads(line) for line in lines]),
+        ('protocol json', lambda: [protocol.read(line)[1] for line in lines]),
+        ('chunks all', lambda: read_chunks(chunks)),
+        ('chunks metro', lambda: read_chunks(chunks, METRO_COLUMNS)),
+        ('chunks poi', lambda: read_chunks(chunks, POI_COLUMNS)),
+    ]
+    for name, reader in readers:
+        read_time, records = best(reader)
+        output = "    {0:<14} {1:7.3f}s  {2:7.2f}us/tweet"
+        print output.format(name, read_time, read_time * 1e6 / len(records))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark internal protocols on records shuffled by the geotweet jobs
+
+Usage:
+    python benchmarks/internal_protocol.py [tweet log] [osm poi log]
+
+Runs the first mapper of the metro-words and poi-nearby jobs over the test
+data, including the counts metro-words emits in `mapper_final`, then encodes and decodes all emitted records with each protocol in
+utils/protocol.py and reports shuffle bytes and serialization time. The
+standard library json module is included for reference.
+
+"""
+import gc
+import os
+import sys
+import json
+import time
+from os.path import dirname
+
+ROOT = dirname(dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+GEO = os.path.join(ROOT, 'geotweet/data/geo')
+DATA = os.path.join(ROOT, 'geotweet/data/mapreduce')
+os.environ.setdefault('METRO_GEOJSON_LOCAL', os.path.join(GEO, 'us_metro_areas102005.geojson'))
+os.environ.setdefault('STOPWORDS_LIST_LOCAL', os.path.join(ROOT, 'geotweet/data/stopwords.txt'))
+
+# local geojson and stopwords environment variables must be set before import
+from geotweet.mapreduce.metro_wordcount import MRMetroMongoWordCount
+from geotweet.mapreduce.poi_nearby_tweets import POINearbyTweetsMRJob
+from geotweet.mapreduce.utils.protocol import PROTOCOLS, build_protocol
+
+
+class StdlibJSONProtocol(object):
+    """ JSON protocol using the standard library for reference """
+
+    def read(self, line):
+        key, value = line.split('\t', 1)
+        return json.loads(key), json.loads(value)
+
+    def write(self, key, value):
+        return json.dumps(key) + '\t' + json.dumps(value)
+
+
+TWEET_LOG = os.path.join(DATA, 'twitter-test.log10000')
+POI_LOG = os.path.join(DATA, 'oregon-latest.poi')
+REPEAT = 3
+
+
+def read_log(path):
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f]
+
+
+def metro_words(tweets, pois):
+    job = MRMetroMongoWordCount(['--no-conf'])
+    # keep counters and status of mapper_final off the console
+    job.sandbox()
+    job.mapper_init()
+    records = [record for tweet in tweets for record in job.mapper(None, tweet)]
+    # words are combined in the mapper and emitted when the task ends
+    return records + list(job.mapper_final())
+
+
+def poi_nearby(tweets, pois):
+    job = POINearbyTweetsMRJob(['--no-conf'])
+    job.mapper_init_metro()
+    return [
+        record for data in pois + tweets
+        for record in job.mapper_metro(None, data)
+    ]
+
+
+def best(func):
+    """ best time of REPEAT runs with garbage collection disabled like timeit """
+    times = []
+    gc.disable()
+    try:
+        for i in range(REPEAT):
+            start = time.time()
+            result = func()
+            times.append(time.time() - start)
+    finally:
+        gc.enable()
+    return min(times), result
+
+
+def main():
+    tweets = read_log(sys.argv[1] if len(sys.argv) > 1 else TWEET_LOG)
+    pois = read_log(sys.argv[2] if len(sys.argv) > 2 else POI_LOG)
+    for name, mapper in [('metro-words', metro_words), ('poi-nearby', poi_nearby)]:
+        records = mapper(tweets, pois)
+        print "{0}: {1} records".format(name, len(records))
+        protocols = [('stdlib', StdlibJSONProtocol())]
+        protocols += [(key, build_protocol(key)) for key in sorted(PROTOCOLS.keys())]
+        for protocol_name, protocol in protocols:
+            write_time, lines = best(lambda: [protocol.write(k, v) for k, v in records])
+            read_time, decoded = best(lambda: [protocol.read(line) for line in lines])
+            size = sum(len(line) + 1 for line in lines)
+            output = "    {0:<6} {1:10d} bytes  write {2:7.3f}s  read {3:7.3f}s"
+            print output.format(protocol_name, size, write_time, read_time)
+
+
+if __name__ == '__main__':
+    main()
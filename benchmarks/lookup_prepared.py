@@ -0,0 +1,68 @@
+"""
+Benchmark point-in-polygon lookups with raw and prepared geometries
+
+Usage:
+    python benchmarks/lookup_prepared.py [geojson] [tweet log]
+
+Defaults to the US counties geojson used by CachedCountyLookup (set
+COUNTIES_GEOJSON_LOCAL to use a local copy) and the 10000 tweet test log.
+Lookups bypass the geohash cache so every tweet runs the full predicate path.
+
+"""
+import os
+import sys
+import json
+import time
+from os.path import dirname
+
+ROOT = dirname(dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from geotweet.mapreduce.utils.lookup import SpatialLookup, COUNTIES_GEOJSON
+from geotweet.mapreduce.utils.proj import project
+
+
+TWEET_LOG = os.path.join(ROOT, 'geotweet/data/mapreduce/twitter-test.log10000')
+METERS_PER_MILE = 1609
+METRO_DISTANCE = 50 * METERS_PER_MILE
+
+
+class RawLookup(SpatialLookup):
+    """ lookup testing predicates against raw geometries """
+
+    def _prepared(self, record):
+        return record['geometry']
+
+
+def load_points(log):
+    points = []
+    with open(log, 'r') as f:
+        for line in f:
+            points.append(project(json.loads(line)['lonlat']))
+    return points
+
+
+def run(lookup, points, **kwargs):
+    start = time.time()
+    results = [lookup.get_object(point, **kwargs) for point in points]
+    return time.time() - start, results
+
+
+def main():
+    src = sys.argv[1] if len(sys.argv) > 1 else COUNTIES_GEOJSON
+    log = sys.argv[2] if len(sys.argv) > 2 else TWEET_LOG
+    points = load_points(log)
+    raw = RawLookup(src=src, persist=False)
+    prepared = SpatialLookup(src=src, persist=False)
+    print "{0} features, {1} points".format(len(prepared.data_store), len(points))
+    for kwargs in [dict(), dict(buffer_size=METRO_DISTANCE)]:
+        raw_time, expected = run(raw, points, **kwargs)
+        prepared_time, actual = run(prepared, points, **kwargs)
+        output = "{0:<24} raw {1:8.3f}s  prepared {2:8.3f}s  speedup {3:6.1f}x  same {4}"
+        print output.format(
+            kwargs, raw_time, prepared_time, raw_time / prepared_time, expected == actual
+        )
+
+
+if __name__ == '__main__':
+    main()
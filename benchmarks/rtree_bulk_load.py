@@ -0,0 +1,116 @@
+"""
+Benchmark building spatial lookups by inserting features one at a time
+against bulk loading a packed R-tree
+
+Usage:
+    python benchmarks/rtree_bulk_load.py [tweet log]
+
+Builds lookups for the US states and metro areas geojson and for the Oregon
+OSM POI nodes (as in reducer_metro of the POI job), then runs the lookups
+for every tweet in the log against both indexes.
+
+"""
+import os
+import sys
+import json
+import time
+from os.path import dirname
+
+ROOT = dirname(dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from geotweet.mapreduce.utils.lookup import SpatialLookup
+from geotweet.mapreduce.utils.proj import project, project_many
+
+
+TWEET_LOG = os.path.join(ROOT, 'geotweet/data/mapreduce/twitter-test.log10000')
+GEO = os.path.join(ROOT, 'geotweet/data/geo')
+POI = os.path.join(ROOT, 'geotweet/data/mapreduce/oregon-latest.poi')
+METERS_PER_MILE = 1609
+METRO_DISTANCE = 50 * METERS_PER_MILE
+POI_DISTANCE = 100
+
+
+def read_geojson(name):
+    with open(os.path.join(GEO, name), 'r') as f:
+        return list(enumerate(json.load(f)['features']))
+
+
+def read_pois(path):
+    with open(path, 'r') as f:
+        pois = [json.loads(line) for line in f]
+    coordinates = project_many([poi['coordinates'] for poi in pois])
+    return [
+        (i, dict(
+            geometry=dict(type='Point', coordinates=tuple(point)),
+            properties=dict(tags=poi['tags'])
+        ))
+        for i, (poi, point) in enumerate(zip(pois, coordinates))
+    ]
+
+
+def load_points(log):
+    points = []
+    with open(log, 'r') as f:
+        for line in f:
+            points.append(project(json.loads(line)['lonlat']))
+    return points
+
+
+def copy(features):
+    # lookups convert the geometry of each feature in place
+    return [(key, json.loads(json.dumps(feature))) for key, feature in features]
+
+
+def build_inserted(features):
+    lookup = SpatialLookup()
+    start = time.time()
+    for key, feature in features:
+        lookup.insert(key, feature)
+    return time.time() - start, lookup
+
+
+def build_bulk(features):
+    lookup = SpatialLookup()
+    start = time.time()
+    lookup.load(features)
+    return time.time() - start, lookup
+
+
+def query(lookup, points, repeat=3, **kwargs):
+    """ best time of `repeat` runs and results sorted to ignore index order """
+    times = []
+    for i in range(repeat):
+        start = time.time()
+        results = [lookup.get_object(point, **kwargs) for point in points]
+        times.append(time.time() - start)
+    if kwargs.get('multiple'):
+        results = [sorted(json.dumps(r, sort_keys=True) for r in rs) for rs in results]
+    return min(times), results
+
+
+def main():
+    log = sys.argv[1] if len(sys.argv) > 1 else TWEET_LOG
+    points = load_points(log)
+    datasets = [
+        ('states', read_geojson('us_states102005.geojson'), dict()),
+        ('metro', read_geojson('us_metro_areas102005.geojson'),
+            dict(buffer_size=METRO_DISTANCE)),
+        ('poi', read_pois(POI), dict(buffer_size=POI_DISTANCE, multiple=True)),
+    ]
+    print "{0} points".format(len(points))
+    for name, features, kwargs in datasets:
+        insert_build, inserted = build_inserted(copy(features))
+        bulk_build, bulk = build_bulk(copy(features))
+        insert_query, expected = query(inserted, points, **kwargs)
+        bulk_query, actual = query(bulk, points, **kwargs)
+        output = "{0:<8} {1:>6} features  build insert {2:7.3f}s bulk {3:7.3f}s" + \
+            "  query insert {4:7.3f}s bulk {5:7.3f}s  same {6}"
+        print output.format(
+            name, len(features), insert_build, bulk_build,
+            insert_query, bulk_query, expected == actual
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark extracting words from tweets with WordExtractor
+
+Usage:
+    python benchmarks/word_extractor.py [tweet log]
+
+Compares the original regular expression based extraction (`run_legacy`)
+with `run` and `run_many` on the text of every tweet in the log, using the
+stop words list in geotweet/data.
+
+"""
+import os
+import sys
+import json
+import time
+from os.path import dirname
+
+ROOT = dirname(dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from geotweet.mapreduce.utils.words import WordExtractor
+
+
+TWEET_LOG = os.path.join(ROOT, 'geotweet/data/mapreduce/twitter-stream.log.2016-03-27_01-53')
+STOPWORDS = os.path.join(ROOT, 'geotweet/data/stopwords.txt')
+REPEAT = 5
+
+
+def run_legacy(extractor, line):
+    """ original regular expression based implementation of `run` """
+    words = []
+    for word in extractor.clean_unicode(line.lower()).split():
+        if word.startswith('http'):
+            continue
+        cleaned = extractor.clean_punctuation(word)
+        if len(cleaned) > 1 and cleaned not in extractor.stopwords:
+            words.append(cleaned)
+    return words
+
+
+def load_texts(log):
+    with open(log, 'r') as f:
+        return [json.loads(line)['text'] for line in f]
+
+
+def timed(run, texts):
+    """ best time of REPEAT runs over all texts """
+    times = []
+    for i in range(REPEAT):
+        start = time.time()
+        results = run(texts)
+        times.append(time.time() - start)
+    return min(times), results
+
+
+def main():
+    log = sys.argv[1] if len(sys.argv) > 1 else TWEET_LOG
+    texts = load_texts(log)
+    extractor = WordExtractor(src=STOPWORDS)
+    runs = [
+        ('run_legacy', lambda texts: [run_legacy(extractor, text) for text in texts]),
+        ('run', lambda texts: [extractor.run(text) for text in texts]),
+        ('run_many', lambda texts: list(extractor.run_many(texts))),
+    ]
+    print "{0} tweets".format(len(texts))
+    baseline = None
+    for name, run in runs:
+        elapsed, results = timed(run, texts)
+        if baseline is None:
+            baseline, expected = elapsed, results
+        output = "{0:<12} {1:8.3f}s {2:10.0f} tweets/s  speedup {3:5.1f}x  same {4}"
+        print output.format(
+            name, elapsed, len(texts) / elapsed, baseline / elapsed, results == expected
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import os
+import gzip
+import json
+import logging
+
+from .mapreduce.utils.columnar import write_chunks, DEFAULT_CHUNK_SIZE
+from .mapreduce.utils.files import atomic_write
+
+
+EXTENSION = '.col'
+
+
+class ColumnarConverter(object):
+    """
+    Convert rotated tweet logs to columnar chunk files
+
+    Each log is written to a file of the same name with a `.col` extension
+    in the output directory, holding one chunk line for every `chunk_size`
+    tweets. The jobs read chunk files in place of the logs, lines that are
+    not valid JSON are skipped.
+
+    """
+    def __init__(self, args):
+        self.logs = args.logs
+        self.output = args.output
+        self.chunk_size = args.chunk_size or DEFAULT_CHUNK_SIZE
+        self.skipped = 0
+
+    def run(self):
+        if not os.path.isdir(self.output):
+            os.makedirs(self.output)
+        for path in self.logs:
+            dst = self.destination(path)
+            with atomic_write(dst, 'w') as f:
+                count = write_chunks(self.read(path), f, self.chunk_size)
+            logging.info("Wrote {0} tweets from {1} to {2}".format(count, path, dst))
+        if self.skipped:
+            logging.info("Skipped {0} invalid lines".format(self.skipped))
+
+    def destination(self, path):
+        name = os.path.basename(path)
+        if name.endswith('.gz'):
+            name = name[:-3]
+        return os.path.join(self.output, name + EXTENSION)
+
+    def read(self, path):
+        """ decoded tweets of log file """
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    self.skipped += 1
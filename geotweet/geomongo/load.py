@@ -1,10 +1,14 @@
-import json
+try:
+    from geotweet.mapreduce.utils.geojson import iter_features
+except ImportError:
+    # running locally
+    from mapreduce.utils.geojson import iter_features
 
 
 class GeoJSONLoader(object):
 
     def load(self, json_file, load_func):
-        with open(json_file, 'r') as f:
-            data = json.loads(f.read().decode('latin-1').encode('utf-8'))
-            for feature in data['features']:
+        """ call load_func with each feature, reading one feature at a time """
+        with open(json_file, 'rb') as f:
+            for feature in iter_features(f, encoding='latin-1'):
                 load_func(feature)
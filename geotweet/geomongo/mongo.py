@@ -2,7 +2,7 @@ import os
 import json
 
 import pymongo
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 
 import logging
 
@@ -27,6 +27,8 @@ class Mongo(object):
         self.client = MongoClient(uri, **args)
         self.db = self.client[db]
         self.collection = self.db[collection]
+        # keys of indexes created by `increment_many`
+        self.indexes = set()
 
     def insert(self, data):
         try:
@@ -48,6 +50,30 @@ class Mongo(object):
             logging.warn(str(e))
             logging.warn("Write Error")
 
+    def increment_many(self, data, keys, field='count'):
+        """
+        Add `field` of each document to the document with the same `keys`,
+        inserting documents that do not exist yet in one bulk write
+        """
+        if not data:
+            return
+        if tuple(keys) not in self.indexes:
+            self.collection.create_index([(key, pymongo.ASCENDING) for key in keys])
+            self.indexes.add(tuple(keys))
+        requests = [
+            UpdateOne(
+                dict((key, doc[key]) for key in keys),
+                {"$inc": {field: doc[field]}},
+                upsert=True
+            )
+            for doc in data
+        ]
+        try:
+            self.collection.bulk_write(requests, ordered=False)
+        except pymongo.errors.BulkWriteError as e:
+            logging.warn(str(e.details))
+            logging.warn("Bulk Write Error")
+
 
 class MongoGeo(Mongo):
 
@@ -0,0 +1,228 @@
+import sys
+import os
+import zlib
+
+from mrjob.job import MRJob
+from mrjob.step import MRStep
+from mrjob.protocol import JSONProtocol, RawValueProtocol
+from pymongo.errors import ServerSelectionTimeoutError
+
+try:
+    # when running on EMR a geotweet package will be loaded onto PYTHON PATH
+    from geotweet.mapreduce.utils.words import WordExtractor
+    from geotweet.mapreduce.utils.lookup import CachedCountyLookup, CachedMetroLookup
+    from geotweet.mapreduce.utils.lookup import add_lookup_cache_option, report_cache
+    from geotweet.mapreduce.utils.protocol import add_protocol_option, build_protocol
+    from geotweet.mapreduce.utils.combine import PartialCounts, add_combine_option, report
+    from geotweet.mapreduce.utils.filters import TweetFilter, hr_rule
+    from geotweet.mapreduce.utils.columnar import ColumnarValueProtocol, expand_chunks
+    from geotweet.mapreduce.utils.dedup import add_dedup_option, dedup_rules, dedup_steps
+    from geotweet.mapreduce.utils.manifest import add_incremental_option
+    from geotweet.mapreduce.utils.sketch import add_top_options, top
+    from geotweet.geomongo.mongo import MongoGeo
+except ImportError:
+    # running locally
+    from utils.words import WordExtractor
+    from utils.lookup import CachedCountyLookup, CachedMetroLookup
+    from utils.lookup import add_lookup_cache_option, report_cache
+    from utils.protocol import add_protocol_option, build_protocol
+    from utils.combine import PartialCounts, add_combine_option, report
+    from utils.filters import TweetFilter, hr_rule
+    from utils.columnar import ColumnarValueProtocol, expand_chunks
+    from utils.dedup import add_dedup_option, dedup_rules, dedup_steps
+    from utils.manifest import add_incremental_option
+    from utils.sketch import add_top_options, top
+    parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, parent)
+    from geomongo.mongo import MongoGeo
+
+
+DB = "geotweet"
+METERS_PER_MILE = 1609
+METRO_DISTANCE = 50 * METERS_PER_MILE
+MONGO_TIMEOUT = 20 * 1000
+GEOHASH_PRECISION = 7
+COLUMNS = ['tweet_id', 'lonlat', 'geohash', 'text', 'description']
+# first element of every key tags the aggregation it belongs to
+STATE_COUNTY = 'state-county'
+METRO = 'metro'
+# ignore low occurences
+MIN_WORD_COUNT = {STATE_COUNTY: 5, METRO: 2}
+COLLECTIONS = {STATE_COUNTY: "state_county_word", METRO: "metro_word"}
+# identify documents for incremental runs
+MERGE_KEYS = {STATE_COUNTY: ["word", "state", "county"], METRO: ["metro_area", "word"]}
+# state-county words of each state are spread over this many output groups
+OUTPUT_BUCKETS = 64
+# documents written to MongoDB at once
+BATCH_SIZE = 5000
+
+
+class CombinedWordCountJob(MRJob):
+    """
+    Count words by US, State and County and by Metro area in one pass
+
+    Produces the results of `state_county_wordcount.py` and
+    `metro_wordcount.py` while reading, tokenizing and looking up each
+    tweet only once. Keys are tagged with the name of their aggregation.
+
+    Output lines start with the aggregation name followed by the columns
+    of the separate job, and each aggregation is inserted into its own
+    MongoDB collection if a MongoDB instance is available. State-county
+    words are grouped for output by state and a hash of the word, so the
+    US level words are not all sent to a single reducer.
+
+    """
+
+    INPUT_PROTOCOL = ColumnarValueProtocol
+    INTERNAL_PROTOCOL = JSONProtocol
+    OUTPUT_PROTOCOL = RawValueProtocol
+
+    def configure_options(self):
+        super(CombinedWordCountJob, self).configure_options()
+        add_protocol_option(self)
+        add_combine_option(self)
+        add_top_options(self)
+        add_incremental_option(self)
+        add_dedup_option(self)
+        add_lookup_cache_option(self)
+
+    def internal_protocol(self):
+        return build_protocol(self.options.internal_protocol)
+
+    def steps(self):
+        return dedup_steps(self, COLUMNS) + [
+            MRStep(
+                mapper_init=self.mapper_init,
+                mapper=self.mapper,
+                mapper_final=self.mapper_final,
+                combiner=self.combiner,
+                reducer=self.reducer
+            ),
+            MRStep(
+                reducer_init=self.reducer_init_output,
+                reducer=self.reducer_output
+            )
+        ]
+
+    def mapper_init(self):
+        """ build local spatial indexes of US counties and metro areas """
+        cache_size = self.options.lookup_cache_size
+        self.counties = CachedCountyLookup(precision=GEOHASH_PRECISION, cache_size=cache_size)
+        self.metros = CachedMetroLookup(precision=GEOHASH_PRECISION, cache_size=cache_size)
+        self.extractor = WordExtractor()
+        self.counts = PartialCounts(limit=self.options.combine_limit)
+        self.filter = TweetFilter([hr_rule()] + dedup_rules(self))
+
+    @expand_chunks(COLUMNS)
+    def mapper(self, _, data):
+        # ignore HR geo-tweets for job postings
+        if self.filter.rejects(data):
+            return
+        lonlat = data['lonlat']
+        geohash = data.get('geohash')
+        state, county = self.counties.get(lonlat, geohash)
+        metro = self.metros.get(lonlat, METRO_DISTANCE, geohash)
+        if not (state and county) and not metro:
+            return
+        # tokenize once for both aggregations
+        for word in self.extractor.run(data['text']):
+            if state and county:
+                self.counts.add((STATE_COUNTY, word))
+                self.counts.add((STATE_COUNTY, word, state))
+                self.counts.add((STATE_COUNTY, word, state, county))
+            if metro:
+                self.counts.add((METRO, metro, word))
+        if self.counts.full():
+            for key, count in self.counts.flush():
+                yield key, count
+
+    def mapper_final(self):
+        for key, count in self.counts.flush():
+            yield key, count
+        report(self, self.counts)
+        report_cache(self, self.counties, 'county')
+        report_cache(self, self.metros, 'metro')
+        self.filter.report(self)
+
+    def combiner(self, key, values):
+        yield key, sum(values)
+
+    def reducer(self, key, values):
+        """ group counts for output by metro area or by state and word bucket """
+        total = int(sum(values))
+        tag = key[0]
+        if total < MIN_WORD_COUNT[tag] and not self.options.incremental:
+            return
+        if tag == METRO:
+            tag, metro, word = key
+            yield (tag, metro), (total, word)
+        else:
+            word = key[1]
+            state = key[2] if len(key) >= 3 else None
+            county = key[3] if len(key) >= 4 else None
+            bucket = zlib.crc32(word.encode('utf-8')) % OUTPUT_BUCKETS
+            yield (tag, state, bucket), (total, word, county)
+
+    def reducer_init_output(self):
+        """ establish connection to a MongoDB collection for each aggregation """
+        self.mongo = {}
+        try:
+            for tag, collection in COLLECTIONS.items():
+                self.mongo[tag] = MongoGeo(
+                    db=DB, collection=collection, timeout=MONGO_TIMEOUT
+                )
+        except ServerSelectionTimeoutError:
+            # failed to connect to running MongoDB instance
+            self.mongo = {}
+
+    def reducer_output(self, key, values):
+        """ store records of each group in MongoDB and output tab delimited lines """
+        tag, group = key[:2]
+        if tag == METRO:
+            records = self.metro_records(group, values)
+        else:
+            records = self.state_county_records(group, values)
+        documents = []
+        for document, output in records:
+            documents.append(document)
+            if len(documents) >= BATCH_SIZE:
+                self.store(tag, documents)
+                documents = []
+            yield None, output
+        self.store(tag, documents)
+
+    def store(self, tag, documents):
+        """ write a batch of documents to the MongoDB collection of tag """
+        if tag not in self.mongo or not documents:
+            return
+        if self.options.incremental:
+            self.mongo[tag].increment_many(documents, MERGE_KEYS[tag])
+        else:
+            self.mongo[tag].insert_many(documents)
+
+    def metro_records(self, metro, values):
+        """ generate documents and output in the form of metro_wordcount.py """
+        top_k = 0 if self.options.incremental else self.options.top_k
+        for total, word in top(values, top_k):
+            document = dict(metro_area=metro, word=word, count=total)
+            output = "{0}\t{1}\t{2}\t{3}".format(
+                METRO, metro.encode('utf-8'), total, word.encode('utf-8')
+            )
+            yield document, output
+
+    def state_county_records(self, state, values):
+        """ generate documents and output in the form of state_county_wordcount.py """
+        for total, word, county in values:
+            document = dict(word=word, state=state, county=county, count=total)
+            output = "{0}\t{1}\t{2}\t{3}\t{4}".format(
+                STATE_COUNTY,
+                word.encode('utf-8'),
+                state.encode('utf-8') if state else None,
+                county.encode('utf-8') if county else None,
+                total
+            )
+            yield document, output
+
+
+if __name__ == '__main__':
+    CombinedWordCountJob.run()
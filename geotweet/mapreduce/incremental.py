@@ -0,0 +1,148 @@
+import sys
+import os
+import glob
+import argparse
+import logging
+
+try:
+    # when running on EMR a geotweet package will be loaded onto PYTHON PATH
+    from geotweet.mapreduce.jobs import JOBS
+    from geotweet.mapreduce.utils.manifest import Manifest
+except ImportError:
+    # running locally
+    from jobs import JOBS
+    from utils.manifest import Manifest
+
+
+# jobs writing to MongoDB support --incremental
+INCREMENTAL_JOBS = ['metro-words', 'poi-nearby', 'combined-words']
+DEFAULT_MANIFEST = 'geotweet-manifest.json'
+# rotated logs of `geotweet stream`, the live log is still being written
+LOG_PATTERN = 'twitter-stream.log.*'
+# handling of inputs of an interrupted run
+STOP = 'stop'
+RETRY = 'retry'
+MARK = 'mark'
+
+
+"""
+Run a job only on input logs it has not processed yet
+
+usage: python incremental.py JOB [--manifest PATH] [--pattern GLOB]
+                             [--interrupted {stop,retry,mark}]
+                             [--static PATH ...] inputs [inputs ...]
+                             [-- job arguments]
+
+Directories given as inputs are expanded to the files they contain matching
+`--pattern` (rotated logs by default) and inputs are recorded by absolute
+path. Inputs listed in the manifest for JOB are skipped, the job runs with
+`--incremental` on the remaining ones so their counts are merged into
+existing MongoDB documents, and they are added to the manifest once the job
+succeeds.
+
+Merging is at least once: the reducers upsert their counts before the
+manifest is saved, so a run that fails or dies partway may leave counts of
+its inputs merged without recording them. Inputs are recorded as started
+before each run and later runs stop while a run of JOB is interrupted. To
+recover check the MongoDB collection, then run again with `--interrupted
+retry` if the failed job wrote nothing (or after restoring the collection
+from a backup), or `--interrupted mark` if it completed and only the
+manifest was not saved.
+`--static` inputs, such as OSM POI files for `poi-nearby`, are passed to
+every run and never recorded.
+"""
+parser = argparse.ArgumentParser(description="Merge new logs into job results")
+parser.add_argument('job', choices=INCREMENTAL_JOBS)
+parser.add_argument('inputs', nargs='+', help="Input log files or directories")
+parser.add_argument(
+    '--manifest',
+    default=DEFAULT_MANIFEST,
+    help="Manifest of processed inputs (default={0})".format(DEFAULT_MANIFEST)
+)
+parser.add_argument(
+    '--pattern',
+    default=LOG_PATTERN,
+    help="Files of input directories to run on (default={0})".format(LOG_PATTERN)
+)
+parser.add_argument(
+    '--interrupted',
+    choices=[STOP, RETRY, MARK],
+    default=STOP,
+    help="Inputs of an interrupted run: stop, run them again or mark them as " +
+        "processed (default={0})".format(STOP)
+)
+parser.add_argument(
+    '--static',
+    nargs='*',
+    default=[],
+    help="Inputs passed to every run without being recorded"
+)
+
+
+def expand(inputs, pattern=LOG_PATTERN):
+    """
+    absolute paths of inputs, directories are expanded to their sorted files
+    matching `pattern`
+    """
+    paths = []
+    for src in inputs:
+        if os.path.isdir(src):
+            paths.extend(
+                path for path in sorted(glob.glob(os.path.join(src, pattern)))
+                if os.path.isfile(path)
+            )
+        else:
+            paths.append(src)
+    return [os.path.abspath(path) for path in paths]
+
+
+def run(job, inputs, manifest, static=None, args=None, pattern=LOG_PATTERN,
+        interrupted=STOP):
+    """ run job on pending inputs, write its output to stdout and record them """
+    inputs = expand(inputs, pattern)
+    unfinished = manifest.interrupted(job)
+    if unfinished and interrupted == STOP:
+        error = "A run of {0} on {1} inputs was interrupted, their counts may be " + \
+            "merged already. Check MongoDB and run with --interrupted retry or mark"
+        logging.error(error.format(job, len(unfinished)))
+        for src in unfinished:
+            logging.error("Interrupted {0}".format(src))
+        return []
+    if unfinished and interrupted == MARK:
+        manifest.mark(job, unfinished)
+        manifest.save()
+    for src in manifest.changed(job, inputs):
+        logging.warn("Skipping {0}, it changed since it was processed".format(src))
+    pending = manifest.pending(job, inputs)
+    if not pending:
+        logging.info("No new inputs for {0}".format(job))
+        return []
+    logging.info("Running {0} on {1} new inputs".format(job, len(pending)))
+    # record the inputs first so an interrupted run is detected
+    manifest.start(job, pending)
+    manifest.save()
+    mr_job = JOBS[job]((args or []) + ['--incremental'] + (static or []) + pending)
+    with mr_job.make_runner() as runner:
+        runner.run()
+        for line in runner.stream_output():
+            sys.stdout.write(line)
+    manifest.mark(job, pending)
+    manifest.save()
+    return pending
+
+
+def main(argv):
+    # arguments after -- are passed to the job
+    job_args = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, job_args = argv[:split], argv[split + 1:]
+    args = parser.parse_args(argv)
+    manifest = Manifest(args.manifest)
+    run(args.job, args.inputs, manifest, args.static, job_args, args.pattern,
+        args.interrupted)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    main(sys.argv[1:])
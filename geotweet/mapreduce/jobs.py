@@ -0,0 +1,21 @@
+try:
+    # when running on EMR a geotweet package will be loaded onto PYTHON PATH
+    from geotweet.mapreduce.state_county_wordcount import StateCountyWordCountJob
+    from geotweet.mapreduce.metro_wordcount import MRMetroMongoWordCount
+    from geotweet.mapreduce.poi_nearby_tweets import POINearbyTweetsMRJob
+    from geotweet.mapreduce.combined_wordcount import CombinedWordCountJob
+except ImportError:
+    # running locally
+    from state_county_wordcount import StateCountyWordCountJob
+    from metro_wordcount import MRMetroMongoWordCount
+    from poi_nearby_tweets import POINearbyTweetsMRJob
+    from combined_wordcount import CombinedWordCountJob
+
+
+# job classes by the names used by bin/mrjob_runner and bin/emrjob_runner
+JOBS = {
+    'state-county-words': StateCountyWordCountJob,
+    'metro-words': MRMetroMongoWordCount,
+    'poi-nearby': POINearbyTweetsMRJob,
+    'combined-words': CombinedWordCountJob
+}
@@ -6,7 +6,7 @@ import json
 
 from mrjob.job import MRJob
 from mrjob.step import MRStep
-from mrjob.protocol import JSONProtocol, JSONValueProtocol, RawValueProtocol
+from mrjob.protocol import JSONProtocol, RawValueProtocol
 from pymongo.errors import ServerSelectionTimeoutError
 
 try:
@@ -14,12 +14,28 @@ try:
     from geotweet.mapreduce.utils.words import WordExtractor
     from geotweet.mapreduce.utils.proj import project
     from geotweet.mapreduce.utils.lookup import CachedMetroLookup
+    from geotweet.mapreduce.utils.lookup import add_lookup_cache_option, report_cache
+    from geotweet.mapreduce.utils.protocol import add_protocol_option, build_protocol
+    from geotweet.mapreduce.utils.combine import PartialCounts, add_combine_option, report
+    from geotweet.mapreduce.utils.filters import TweetFilter, hr_rule
+    from geotweet.mapreduce.utils.columnar import ColumnarValueProtocol, expand_chunks
+    from geotweet.mapreduce.utils.dedup import add_dedup_option, dedup_rules, dedup_steps
+    from geotweet.mapreduce.utils.manifest import add_incremental_option
+    from geotweet.mapreduce.utils.sketch import SpaceSaving, add_top_options, top
     from geotweet.geomongo.mongo import MongoGeo
 except ImportError:
     # running locally
     from utils.words import WordExtractor
     from utils.proj import project
     from utils.lookup import CachedMetroLookup
+    from utils.lookup import add_lookup_cache_option, report_cache
+    from utils.protocol import add_protocol_option, build_protocol
+    from utils.combine import PartialCounts, add_combine_option, report
+    from utils.filters import TweetFilter, hr_rule
+    from utils.columnar import ColumnarValueProtocol, expand_chunks
+    from utils.dedup import add_dedup_option, dedup_rules, dedup_steps
+    from utils.manifest import add_incremental_option
+    from utils.sketch import SpaceSaving, add_top_options, top
     parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     sys.path.insert(0, parent) 
     from geomongo.mongo import MongoGeo
@@ -27,10 +43,12 @@ except ImportError:
 
 DB = "geotweet"
 COLLECTION = "metro_word"
+MERGE_KEYS = ["metro_area", "word"]     # identify documents for incremental runs
 MIN_WORD_COUNT = 2
 METERS_PER_MILE = 1609
 METRO_DISTANCE = 50 * METERS_PER_MILE
 MONGO_TIMEOUT = 20 * 1000
+COLUMNS = ['tweet_id', 'lonlat', 'geohash', 'text', 'description']
 """
 https://en.wikipedia.org/wiki/Geohash
 
@@ -72,18 +90,39 @@ class MRMetroMongoWordCount(MRJob):
 
         1. Build list of all documents for each metro area and insert as batch
         into MongoDB
+        2. With `--top-k` only keep the K most frequent words of each metro area
+
+    With `--sketch-capacity` mappers count the words of each metro area in a
+    Space-Saving sketch and only emit its monitored words. For a mapper that
+    counted N_i words of a metro area, a monitored word is overcounted by at
+    most N_i / capacity and a word it dropped was counted at most N_i /
+    capacity times, so summed counts may be above or below the true count by
+    up to the sum of N_i / capacity over the mappers.
 
     """
     
-    INPUT_PROTOCOL = JSONValueProtocol
+    INPUT_PROTOCOL = ColumnarValueProtocol
     INTERNAL_PROTOCOL = JSONProtocol
     OUTPUT_PROTOCOL = RawValueProtocol
 
+    def configure_options(self):
+        super(MRMetroMongoWordCount, self).configure_options()
+        add_protocol_option(self)
+        add_combine_option(self)
+        add_top_options(self, sketch=True)
+        add_incremental_option(self)
+        add_dedup_option(self)
+        add_lookup_cache_option(self)
+
+    def internal_protocol(self):
+        return build_protocol(self.options.internal_protocol)
+
     def steps(self):
-        return [
+        return dedup_steps(self, COLUMNS) + [
             MRStep(
                 mapper_init=self.mapper_init,
                 mapper=self.mapper,
+                mapper_final=self.mapper_final,
                 combiner=self.combiner,
                 reducer=self.reducer
             ),
@@ -95,28 +134,57 @@ class MRMetroMongoWordCount(MRJob):
     
     def mapper_init(self):
         """ build local spatial index of US metro areas """
-        self.lookup = CachedMetroLookup(precision=GEOHASH_PRECISION)
+        self.lookup = CachedMetroLookup(
+            precision=GEOHASH_PRECISION,
+            cache_size=self.options.lookup_cache_size
+        )
         self.extractor = WordExtractor()
+        self.counts = PartialCounts(limit=self.options.combine_limit)
+        self.filter = TweetFilter([hr_rule()] + dedup_rules(self))
+        # metro area -> Space-Saving sketch of word counts
+        self.sketches = {}
    
+    @expand_chunks(COLUMNS)
     def mapper(self, _, data):
         # ignore HR geo-tweets for job postings
-        expr = "|".join(["(job)", "(hiring)", "(career)"])
-        if data['description'] and re.findall(expr, data['description']):
+        if self.filter.rejects(data):
             return
         # lookup nearest metro area
-        metro = self.lookup.get(data['lonlat'], METRO_DISTANCE)
+        metro = self.lookup.get(data['lonlat'], METRO_DISTANCE, data.get('geohash'))
         if not metro:
             return
         # count each word
+        if self.options.sketch_capacity:
+            sketch = self.sketches.get(metro)
+            if sketch is None:
+                sketch = SpaceSaving(self.options.sketch_capacity)
+                self.sketches[metro] = sketch
+            for word in self.extractor.run(data['text']):
+                sketch.add(word)
+            return
         for word in self.extractor.run(data['text']):
-            yield (metro, word), 1
+            self.counts.add((metro, word))
+        if self.counts.full():
+            for key, count in self.counts.flush():
+                yield key, count
+
+    def mapper_final(self):
+        for key, count in self.counts.flush():
+            yield key, count
+        # only candidate heavy hitters of each metro area reach the shuffle
+        for metro, sketch in self.sketches.items():
+            for word, count, error in sketch.items():
+                yield (metro, word), count
+        report(self, self.counts)
+        report_cache(self, self.lookup, 'metro')
+        self.filter.report(self)
             
     def combiner(self, key, value):
         yield key, sum(value)
    
     def reducer(self, key, values):
         total = int(sum(values))
-        if total < MIN_WORD_COUNT:
+        if total < MIN_WORD_COUNT and not self.options.incremental:
             return
         metro, word = key
         yield metro, (total, word)
@@ -131,7 +199,8 @@ class MRMetroMongoWordCount(MRJob):
     
     def reducer_output(self, metro, values):
         records = []
-        for record in values:
+        top_k = 0 if self.options.incremental else self.options.top_k
+        for record in top(values, top_k):
             total, word = record
             records.append(dict(
                 metro_area=metro,
@@ -141,7 +210,9 @@ class MRMetroMongoWordCount(MRJob):
             output = "{0}\t{1}\t{2}"
             output = output.format(metro.encode('utf-8'), total, word.encode('utf-8'))
             yield None, output
-        if self.mongo:
+        if self.mongo and self.options.incremental:
+            self.mongo.increment_many(records, MERGE_KEYS)
+        elif self.mongo:
             self.mongo.insert_many(records)
 
 
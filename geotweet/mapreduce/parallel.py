@@ -0,0 +1,66 @@
+import sys
+import argparse
+import logging
+
+try:
+    # when running on EMR a geotweet package will be loaded onto PYTHON PATH
+    from geotweet.mapreduce.jobs import JOBS
+    from geotweet.mapreduce.utils.runner import ParallelRunner, DEFAULT_SHARD_SIZE
+except ImportError:
+    # running locally
+    from jobs import JOBS
+    from utils.runner import ParallelRunner, DEFAULT_SHARD_SIZE
+
+
+"""
+Run a job on local files with all cores, without Hadoop
+
+usage: python parallel.py JOB [--processes N] [--shard-size BYTES]
+                          inputs [inputs ...] [-- job arguments]
+
+Output lines are written to stdout and counters to stderr. The output holds
+the same lines as the inline and local runners of mrjob, grouped by reducer
+partition instead of in a single sorted order.
+"""
+parser = argparse.ArgumentParser(description="Run a job with a pool of processes")
+parser.add_argument('job', choices=sorted(JOBS.keys()))
+parser.add_argument('inputs', nargs='+', help="Input files")
+parser.add_argument(
+    '--processes',
+    type=int,
+    default=None,
+    help="Number of worker processes (default=number of cores)"
+)
+parser.add_argument(
+    '--shard-size',
+    type=int,
+    default=DEFAULT_SHARD_SIZE,
+    help="Bytes of input for each map task (default={0})".format(DEFAULT_SHARD_SIZE)
+)
+
+
+def run(job, inputs, processes=None, shard_size=DEFAULT_SHARD_SIZE, args=None,
+        stdout=None):
+    """ run job on inputs and return counters """
+    mr_job = JOBS[job](args or [])
+    runner = ParallelRunner(mr_job, inputs, processes=processes, shard_size=shard_size)
+    return runner.run(stdout or sys.stdout)
+
+
+def main(argv):
+    # arguments after -- are passed to the job
+    job_args = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, job_args = argv[:split], argv[split + 1:]
+    args = parser.parse_args(argv)
+    counters = run(args.job, args.inputs, args.processes, args.shard_size, job_args)
+    for group, values in sorted(counters.items()):
+        sys.stderr.write("{0}\n".format(group))
+        for name, amount in sorted(values.items()):
+            sys.stderr.write("\t{0}={1}\n".format(name, amount))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    main(sys.argv[1:])
@@ -1,22 +1,39 @@
 import sys
 import os
-import re
 
 from mrjob.job import MRJob
 from mrjob.step import MRStep
-from mrjob.protocol import JSONProtocol, JSONValueProtocol, RawValueProtocol
+from mrjob.protocol import JSONProtocol, RawValueProtocol
 from pymongo.errors import ServerSelectionTimeoutError
 
 try:
     # when running on EMR the geotweet package will be installed with pip
     from geotweet.mapreduce.utils.lookup import CachedMetroLookup, CachedLookup
-    from geotweet.mapreduce.utils.proj import project, rproject
+    from geotweet.mapreduce.utils.lookup import add_lookup_cache_option, report_cache
+    from geotweet.mapreduce.utils.proj import project_many
+    from geotweet.mapreduce.utils.protocol import add_protocol_option, build_protocol
+    from geotweet.mapreduce.utils.filters import TweetFilter, source_rule
+    from geotweet.mapreduce.utils.columnar import ColumnarValueProtocol, expand_chunks
+    from geotweet.mapreduce.utils.dedup import add_dedup_option, dedup_rules, dedup_steps
+    from geotweet.mapreduce.utils.manifest import add_incremental_option
+    from geotweet.mapreduce.utils.sketch import add_top_options, top
+    from geotweet.mapreduce.utils.tiles import tile, halo_tiles
+    from geotweet.mapreduce.utils.poi_index import POIIndex, poi_name
     from geotweet.geomongo.mongo import MongoGeo
     COLLECTION = "metro_osm_emr"
 except ImportError:
     # running locally
     from utils.lookup import CachedMetroLookup, CachedLookup
-    from utils.proj import project, rproject
+    from utils.lookup import add_lookup_cache_option, report_cache
+    from utils.proj import project_many
+    from utils.protocol import add_protocol_option, build_protocol
+    from utils.filters import TweetFilter, source_rule
+    from utils.columnar import ColumnarValueProtocol, expand_chunks
+    from utils.dedup import add_dedup_option, dedup_rules, dedup_steps
+    from utils.manifest import add_incremental_option
+    from utils.sketch import add_top_options, top
+    from utils.tiles import tile, halo_tiles
+    from utils.poi_index import POIIndex, poi_name
     parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     sys.path.insert(0, parent) 
     from geomongo.mongo import MongoGeo
@@ -28,9 +45,13 @@ METERS_PER_MILE = 1609
 METRO_DISTANCE = 50 * METERS_PER_MILE       # distance from metro area to include tweet
 POI_DISTANCE = 100                          # meter search radius from decoded geohash
 MONGO_TIMEOUT = 30 * 1000
-POI_TAGS = ["amenity", "builing", "shop", "office", "tourism"]
 METRO_GEOHASH_PRECISION = 7                 # used for caching results
 POI_GEOHASH_PRECISION = 8
+TILE_PRECISION = 5                          # tiles joined independently in reducers
+HALO_DISTANCE = 1.5 * POI_DISTANCE          # POIs are replicated to tiles within
+COUNTER_GROUP = 'geotweet'
+MERGE_KEYS = ["metro_area", "poi"]          # identify documents for incremental runs
+COLUMNS = ['tweet_id', 'user_id', 'lonlat', 'geohash', 'source']
 """
 https://en.wikipedia.org/wiki/Geohash
 
@@ -47,21 +68,58 @@ precision   width   height
 class POINearbyTweetsMRJob(MRJob):
     """ Count common OSM points-of-interest around Tweets with coordinates """
     
-    INPUT_PROTOCOL = JSONValueProtocol
+    INPUT_PROTOCOL = ColumnarValueProtocol
     INTERNAL_PROTOCOL = JSONProtocol
     OUTPUT_PROTOCOL = RawValueProtocol
     SORT_VALUES = True
+
+    def configure_options(self):
+        super(POINearbyTweetsMRJob, self).configure_options()
+        add_protocol_option(self)
+        add_top_options(self)
+        add_incremental_option(self)
+        add_dedup_option(self)
+        add_lookup_cache_option(self)
+        self.add_passthrough_option(
+            '--poi-index',
+            default=None,
+            help="Directory of per metro POI indexes built with `geotweet poi-index`, " +
+                "tweets are joined with POIs in mappers and POI input is ignored"
+        )
+
+    def internal_protocol(self):
+        return build_protocol(self.options.internal_protocol)
     
     def steps(self):
-        return [
-            # 1. lookup metro area for each geotweet and osm POI
-            #     emit to same reducer to perform POI lookup
+        if self.options.poi_index:
+            return dedup_steps(self, COLUMNS) + [
+                # 1. lookup metro area for each geotweet and nearby POIs from
+                #     the prebuilt index of that metro area
+                # 2. aggregate count for each (metro area, POI)
+                MRStep(
+                    mapper_init=self.mapper_init_join,
+                    mapper=self.mapper_join,
+                    mapper_final=self.mapper_final_join,
+                    combiner=self.combiner_count,
+                    reducer=self.reducer_count
+                ),
+                # convert output to final form and persist to Mongo
+                MRStep(
+                    reducer_init=self.reducer_init_output,
+                    reducer=self.reducer_output
+                )
+            ]
+        return dedup_steps(self, COLUMNS) + [
+            # 1. lookup metro area and geohash tile for each geotweet and osm POI
+            #     emit to same reducer to perform POI lookup, POIs are also
+            #     emitted to neighbouring tiles within HALO_DISTANCE
             # 2. lookup nearby osm POIs around each geotweet
             # 3. emit metro area + name of POI and 1 to count
             MRStep(
                 mapper_init=self.mapper_init_metro,
                 mapper=self.mapper_metro,
-                reducer=self.reducer_metro
+                mapper_final=self.mapper_final_metro,
+                reducer=self.reducer_tile
             ),
             # aggregate count for each (metro area, POI) 
             MRStep(
@@ -76,8 +134,16 @@ class POINearbyTweetsMRJob(MRJob):
     
     def mapper_init_metro(self):
         """ build local spatial index of US metro areas """
-        self.lookup = CachedMetroLookup(precision=METRO_GEOHASH_PRECISION)
+        self.lookup = CachedMetroLookup(
+            precision=METRO_GEOHASH_PRECISION,
+            cache_size=self.options.lookup_cache_size
+        )
+        # only allow tweets from the listed domains to try and filter out
+        # noise such as HR tweets, Weather reports and news updates
+        self.filter = TweetFilter([source_rule()] + dedup_rules(self))
+        self.replicas = 0
 
+    @expand_chunks(COLUMNS)
     def mapper_metro(self, _, data):
         """ map each osm POI and geotweets based on spatial lookup of metro area """
         # OSM POI record
@@ -85,61 +151,125 @@ class POINearbyTweetsMRJob(MRJob):
             type_tag = 1
             lonlat = data['coordinates']
             payload = data['tags']
+            geohash = None
         # Tweet with coordinates from Streaming API
         elif 'user_id' in data:
             type_tag = 2
-            # only allow tweets from the listed domains to try and filter out
-            # noise such as HR tweets, Weather reports and news updates
-            accept = [
-                "twitter\.com",
-                "foursquare\.com",
-                "instagram\.com",
-                "untappd\.com"
-            ]
-            expr = "|".join(accept)
-            if not re.findall(expr, data['source']):
+            if self.filter.rejects(data):
                 return
             lonlat = data['lonlat']
             payload = None
+            geohash = data.get('geohash')
         # spatial lookup using Rtree with cached results
-        metro = self.lookup.get(lonlat, METRO_DISTANCE)
+        metro = self.lookup.get(lonlat, METRO_DISTANCE, geohash)
         if not metro:
             return
-        yield metro, (type_tag, lonlat, payload)
+        if type_tag == 2:
+            key = geohash[:TILE_PRECISION] if geohash else tile(lonlat, TILE_PRECISION)
+            yield (metro, key), (type_tag, lonlat, payload)
+            return
+        # replicate POI into every tile it could be found from
+        tiles = halo_tiles(lonlat, HALO_DISTANCE, TILE_PRECISION)
+        self.replicas += len(tiles) - 1
+        for key in tiles:
+            yield (metro, key), (type_tag, lonlat, payload)
 
-    def reducer_metro(self, metro, values):
+    def mapper_final_metro(self):
+        report_cache(self, self.lookup, 'metro')
+        self.filter.report(self)
+        self.increment_counter(COUNTER_GROUP, 'poi halo replicas', self.replicas)
+
+    def reducer_tile(self, key, values):
         """
-        Output tags of POI locations nearby tweet locations
+        Output tags of POI locations nearby tweet locations in one tile
 
         Values will be sorted coming into reducer.
         First element in each value tuple will be either 1 (osm POI) or 2 (geotweet).
         Build a spatial index with POI records.
         For each tweet lookup nearby POI, and emit tag values for predefined tags.
+        Tweets without any nearby POI are counted as unmatched.
         
         """
+        metro, _ = key
         lookup = CachedLookup(precision=POI_GEOHASH_PRECISION)
+        pois = []
+        matched = unmatched = 0
         for i, value in enumerate(values):
             type_tag, lonlat, data = value
             if type_tag == 1:
-                # OSM POI node, construct geojson and add to Rtree index
-                lookup.insert(i, dict(
-                    geometry=dict(type='Point', coordinates=project(lonlat)),
-                    properties=dict(tags=data)
-                ))
-            else:
-                # geotweet, lookup nearest POI from index
-                if not lookup.data_store:
-                    return
-                poi_names = []
-                kwargs = dict(buffer_size=POI_DISTANCE, multiple=True)
-                # lookup nearby POI from Rtree index (caching results)
-                # for any tags we care about emit the tags value and 1
-                for poi in lookup.get(lonlat, **kwargs):
-                    has_tag = [ tag in poi['tags'] for tag in POI_TAGS ]
-                    if any(has_tag) and 'name' in poi['tags']:
-                        poi_names.append(poi['tags']['name'])
-                for poi in set(poi_names):
-                    yield (metro, poi), 1
+                # OSM POI node, collect until all POI nodes are received
+                pois.append((i, lonlat, data))
+                continue
+            if pois:
+                # bulk load all POI nodes into Rtree index with one projection call
+                self.load_pois(lookup, pois)
+                pois = []
+            # geotweet, lookup nearest POI from index
+            poi_names = self.nearby_pois(lookup, lonlat) if lookup.data_store else None
+            if not poi_names:
+                unmatched += 1
+                continue
+            matched += 1
+            for poi in poi_names:
+                yield (metro, poi), 1
+        self.increment_counter(COUNTER_GROUP, 'tweets near poi', matched)
+        self.increment_counter(COUNTER_GROUP, 'tweets without poi', unmatched)
+
+    def nearby_pois(self, lookup, lonlat, geohash=None):
+        """ names of POIs with any of POI_TAGS within POI_DISTANCE of lonlat """
+        poi_names = set()
+        # lookup nearby POI from Rtree index (caching results)
+        args = dict(buffer_size=POI_DISTANCE, multiple=True, geohash=geohash)
+        for poi in lookup.get(lonlat, **args):
+            name = poi_name(poi['tags'])
+            if name is not None:
+                poi_names.add(name)
+        return poi_names
+
+    def load_pois(self, lookup, pois):
+        """ construct geojson for each (key, lonlat, tags) and load into index """
+        coordinates = project_many([lonlat for key, lonlat, tags in pois])
+        lookup.load(
+            (key, dict(
+                geometry=dict(type='Point', coordinates=tuple(point)),
+                properties=dict(tags=tags)
+            ))
+            for (key, lonlat, tags), point in zip(pois, coordinates)
+        )
+
+    def mapper_init_join(self):
+        """ build local spatial index of US metro areas and open POI indexes """
+        self.mapper_init_metro()
+        self.pois = POIIndex(self.options.poi_index, precision=POI_GEOHASH_PRECISION)
+        self.matched = self.unmatched = 0
+
+    @expand_chunks(COLUMNS)
+    def mapper_join(self, _, data):
+        """ emit metro area and name of each POI near a geotweet """
+        # POI records are already indexed
+        if 'user_id' not in data or self.filter.rejects(data):
+            return
+        lonlat, geohash = data['lonlat'], data.get('geohash')
+        metro = self.lookup.get(lonlat, METRO_DISTANCE, geohash)
+        if not metro:
+            return
+        lookup = self.pois.get(metro)
+        poi_names = self.nearby_pois(lookup, lonlat, geohash) if lookup else None
+        if not poi_names:
+            self.unmatched += 1
+            return
+        self.matched += 1
+        for poi in poi_names:
+            yield (metro, poi), 1
+
+    def mapper_final_join(self):
+        report_cache(self, self.lookup, 'metro')
+        self.filter.report(self)
+        self.increment_counter(COUNTER_GROUP, 'tweets near poi', self.matched)
+        self.increment_counter(COUNTER_GROUP, 'tweets without poi', self.unmatched)
+
+    def combiner_count(self, key, values):
+        yield key, sum(values)
 
     def reducer_count(self, key, values):
         """ count occurences for each (metro, POI) record """
@@ -161,7 +291,8 @@ class POINearbyTweetsMRJob(MRJob):
         records = []
         # build up list of data for each metro area and submit as one network
         # call instead of individually 
-        for value in values:
+        top_k = 0 if self.options.incremental else self.options.top_k
+        for value in top(values, top_k):
             total, poi = value
             records.append(dict(
                 metro_area=metro,
@@ -171,7 +302,9 @@ class POINearbyTweetsMRJob(MRJob):
             output = "{0}\t{1}\t{2}"
             output = output.format(metro.encode('utf-8'), total, poi.encode('utf-8'))
             yield None, output
-        if self.mongo:
+        if self.mongo and self.options.incremental:
+            self.mongo.increment_many(records, MERGE_KEYS)
+        elif self.mongo:
             self.mongo.insert_many(records)
 
 
@@ -1,21 +1,34 @@
 import sys
 import os
 from os.path import dirname
-import re
 import json
 
 from mrjob.job import MRJob
 from mrjob.step import MRStep
-from mrjob.protocol import JSONProtocol, JSONValueProtocol, RawValueProtocol
+from mrjob.protocol import JSONProtocol, RawValueProtocol
 
 try:
     # when running on EMR a geotweet package will installed with pip
     from geotweet.mapreduce.utils.words import WordExtractor
     from geotweet.mapreduce.utils.lookup import project, CachedCountyLookup
+    from geotweet.mapreduce.utils.lookup import add_lookup_cache_option, report_cache
+    from geotweet.mapreduce.utils.protocol import add_protocol_option, build_protocol
+    from geotweet.mapreduce.utils.combine import PartialCounts, add_combine_option, report
+    from geotweet.mapreduce.utils.filters import TweetFilter, hr_rule
+    from geotweet.mapreduce.utils.columnar import ColumnarValueProtocol, expand_chunks
+    from geotweet.mapreduce.utils.dedup import add_dedup_option, dedup_rules, dedup_steps
+    from geotweet.mapreduce.utils.sketch import FrequentKeys, add_approximate_options
 except ImportError:
     # when running locally utils using relative import
     from utils.words import WordExtractor
     from utils.lookup import project, CachedCountyLookup
+    from utils.lookup import add_lookup_cache_option, report_cache
+    from utils.protocol import add_protocol_option, build_protocol
+    from utils.combine import PartialCounts, add_combine_option, report
+    from utils.filters import TweetFilter, hr_rule
+    from utils.columnar import ColumnarValueProtocol, expand_chunks
+    from utils.dedup import add_dedup_option, dedup_rules, dedup_steps
+    from utils.sketch import FrequentKeys, add_approximate_options
 
 
 """
@@ -31,6 +44,8 @@ precision   width   height
 """
 GEOHASH_PRECISION = 7 
 MIN_WORD_COUNT = 5              # ignore low occurences
+COUNTER_GROUP = 'geotweet'
+COLUMNS = ['tweet_id', 'lonlat', 'geohash', 'text', 'description']
 
 
 class StateCountyWordCountJob(MRJob):
@@ -40,18 +55,48 @@ class StateCountyWordCountJob(MRJob):
     A geojson file of US counties is downloaded from an S3 bucket. A RTree index
     is built using the bounding box of each county, and is used for determining
     State and County for each tweet.
+
+    With `--approximate` each mapper counts the keys of every level (word),
+    (word, state) and (word, state, county) in a Count-Min sketch and only
+    emits the sketches with their candidate frequent keys. One reducer for
+    each level merges them and outputs the candidates estimated to occur at
+    least MIN_WORD_COUNT times. Estimates exceed true counts by at most
+    `--epsilon` times the number of words with probability 1 - `--delta`,
+    and keys counted fewer times than that bound may be missing. The bound
+    of each level is reported in the 'approximate error bound' counters.
     
     """
 
-    INPUT_PROTOCOL = JSONValueProtocol
+    INPUT_PROTOCOL = ColumnarValueProtocol
     INTERNAL_PROTOCOL = JSONProtocol
     OUTPUT_PROTOCOL = RawValueProtocol
 
+    def configure_options(self):
+        super(StateCountyWordCountJob, self).configure_options()
+        add_protocol_option(self)
+        add_combine_option(self)
+        add_approximate_options(self)
+        add_dedup_option(self)
+        add_lookup_cache_option(self)
+
+    def internal_protocol(self):
+        return build_protocol(self.options.internal_protocol)
+
     def steps(self):
-        return [
+        if self.options.approximate:
+            return dedup_steps(self, COLUMNS) + [
+                MRStep(
+                    mapper_init=self.mapper_init_sketch,
+                    mapper=self.mapper_sketch,
+                    mapper_final=self.mapper_final_sketch,
+                    reducer=self.reducer_sketch
+                )
+            ]
+        return dedup_steps(self, COLUMNS) + [
             MRStep(
                 mapper_init=self.mapper_init,
                 mapper=self.mapper,
+                mapper_final=self.mapper_final,
                 combiner=self.combiner,
                 reducer=self.reducer
             )
@@ -59,29 +104,40 @@ class StateCountyWordCountJob(MRJob):
 
     def mapper_init(self):
         """ Download counties geojson from S3 and build spatial index and cache """
-        self.counties = CachedCountyLookup(precision=GEOHASH_PRECISION)
+        self.counties = CachedCountyLookup(
+            precision=GEOHASH_PRECISION,
+            cache_size=self.options.lookup_cache_size
+        )
         self.extractor = WordExtractor()
+        self.counts = PartialCounts(limit=self.options.combine_limit)
+        self.filter = TweetFilter([hr_rule()] + dedup_rules(self))
     
+    @expand_chunks(COLUMNS)
     def mapper(self, _, data):
         # ignore HR geo-tweets for job postings
-        if data['description'] and self.hr_filter(data['description']):
+        if self.filter.rejects(data):
             return
         lonlat = data['lonlat']
         # spatial lookup for state and county
-        state, county = self.counties.get(lonlat)
+        state, county = self.counties.get(lonlat, data.get('geohash'))
         if not state or not county:
             return
         # count words
         for word in self.extractor.run(data['text']):
-            yield (word, ), 1
-            yield (word, state), 1
-            yield (word, state, county), 1
+            self.counts.add((word, ))
+            self.counts.add((word, state))
+            self.counts.add((word, state, county))
+        if self.counts.full():
+            for key, count in self.counts.flush():
+                yield key, count
+
+    def mapper_final(self):
+        for key, count in self.counts.flush():
+            yield key, count
+        report(self, self.counts)
+        report_cache(self, self.counties, 'county')
+        self.filter.report(self)
     
-    def hr_filter(self, text):
-        """ check if description of twitter using contains job related key words """
-        expr = "|".join(["(job)", "(hiring)", "(career)"])
-        return re.findall(expr, text)
-  
     def combiner(self, key, values):
         yield key, sum(values)
 
@@ -89,6 +145,57 @@ class StateCountyWordCountJob(MRJob):
         total = int(sum(values))
         if total < MIN_WORD_COUNT:
             return
+        yield None, self.output(key, total)
+
+    def mapper_init_sketch(self):
+        """ build spatial index and a frequent keys summary for each level """
+        self.counties = CachedCountyLookup(
+            precision=GEOHASH_PRECISION,
+            cache_size=self.options.lookup_cache_size
+        )
+        self.extractor = WordExtractor()
+        self.filter = TweetFilter([hr_rule()] + dedup_rules(self))
+        self.levels = [self.frequent_keys() for _ in range(3)]
+
+    def frequent_keys(self):
+        return FrequentKeys(
+            epsilon=self.options.epsilon,
+            delta=self.options.delta,
+            conservative=self.options.conservative_update
+        )
+
+    @expand_chunks(COLUMNS)
+    def mapper_sketch(self, _, data):
+        if self.filter.rejects(data):
+            return
+        state, county = self.counties.get(data['lonlat'], data.get('geohash'))
+        if not state or not county:
+            return
+        words, states, counties = self.levels
+        for word in self.extractor.run(data['text']):
+            words.add((word, ))
+            states.add((word, state))
+            counties.add((word, state, county))
+
+    def mapper_final_sketch(self):
+        """ emit the summary of each level keyed by the length of its keys """
+        for level, summary in enumerate(self.levels, 1):
+            yield level, summary.dump()
+        report_cache(self, self.counties, 'county')
+        self.filter.report(self)
+
+    def reducer_sketch(self, level, values):
+        """ merge summaries of a level and output its frequent keys """
+        summary = self.frequent_keys()
+        for value in values:
+            summary.merge(value)
+        for key, total in summary.frequent(MIN_WORD_COUNT):
+            yield None, self.output(key, total)
+        counter = "approximate error bound level {0}".format(level)
+        self.increment_counter(COUNTER_GROUP, counter, summary.error_bound())
+
+    def output(self, key, total):
+        """ tab delimited word, state, county and count """
         word = state = county = None
         word = key[0]
         if len(key) >= 2:
@@ -99,7 +206,7 @@ class StateCountyWordCountJob(MRJob):
         word = word.encode('utf-8')
         state = state.encode('utf-8') if state else None
         county = county.encode('utf-8') if county else None
-        yield None, output.format(word, state, county, total)
+        return output.format(word, state, county, total)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,221 @@
+import os
+import json
+import math
+
+from .sketch import _hashes
+from .files import atomic_write
+
+
+"""
+Bloom filters for duplicate detection
+
+A `BloomFilter` answers membership of up to `capacity` keys with a false
+positive rate of at most `error_rate`, using about 1.44 * log2(1 / error_rate)
+bits per key. Keys are hashed once and the bit positions are derived by
+double hashing.
+
+A `ScalableBloomFilter` (Almeida et al. 2007) adds a new stage when the
+current one is full, each larger by `growth` and with the error rate
+tightened by `tightening` so the total false positive rate stays below
+error_rate / (1 - tightening). Stages stop growing at `max_capacity`, and
+with `max_stages` set only the newest stages are kept, so memory is bounded
+and keys not seen within the last (max_stages - 1) * max_capacity keys added
+are forgotten. Keys found only in older stages are added again to the newest
+one, so a key is remembered as long as it keeps being seen.
+
+A saved filter is a JSON header at `path` listing the stages, and the bits
+of each stage in `<path>.<stage number>`. Only the newest stage changes,
+full stages are written once, so saving a large filter again only rewrites
+the newest stage and the header.
+"""
+DEFAULT_CAPACITY = 100000
+DEFAULT_ERROR_RATE = 0.001
+DEFAULT_GROWTH = 2
+DEFAULT_TIGHTENING = 0.8
+LN2 = math.log(2)
+
+
+class BloomFilter(object):
+    """ Set membership of up to `capacity` keys with false positives """
+
+    def __init__(self, capacity, error_rate=DEFAULT_ERROR_RATE, bits=None, count=0):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("Bloom filter needs capacity >= 1 and 0 < error_rate < 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / LN2 ** 2))
+        self.hashes = max(1, int(round(self.size * LN2 / capacity)))
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = count
+
+    def _positions(self, hashes):
+        """ generate bit positions of a key, stopping early is cheap """
+        # reduce the 64 bit hashes first to stay within machine integers
+        size = self.size
+        position, step = hashes[0] % size, hashes[1] % size
+        for i in xrange(self.hashes):
+            yield position
+            position = (position + step) % size
+
+    def __contains__(self, key):
+        return self.contains_hashed(_hashes((key, )))
+
+    def add(self, key):
+        """ add key and return True if it was (probably) added before """
+        return self.add_hashed(_hashes((key, )))
+
+    def contains_hashed(self, hashes):
+        bits = self.bits
+        for position in self._positions(hashes):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add_hashed(self, hashes):
+        """ add key by its two hashes, as `add` """
+        bits = self.bits
+        found = True
+        for position in self._positions(hashes):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                found = False
+        if not found:
+            self.count += 1
+        return found
+
+    def full(self):
+        return self.count >= self.capacity
+
+    def nbytes(self):
+        return len(self.bits)
+
+
+class ScalableBloomFilter(object):
+    """ Bloom filter growing with the number of keys added """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE,
+            growth=DEFAULT_GROWTH, tightening=DEFAULT_TIGHTENING, max_capacity=None,
+            max_stages=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.max_capacity = max_capacity
+        self.max_stages = max_stages
+        self.stages = []
+        self.expired = 0
+        # number of the oldest live stage, of the oldest stage when last saved
+        # and of the stages saved since they filled up
+        self.first_stage = 0
+        self.saved_first = 0
+        self.saved = set()
+
+    def __contains__(self, key):
+        hashes = _hashes((key, ))
+        return any(stage.contains_hashed(hashes) for stage in reversed(self.stages))
+
+    def __len__(self):
+        """ number of keys remembered by the live stages """
+        return sum(stage.count for stage in self.stages)
+
+    def add(self, key):
+        """ add key and return True if it was (probably) added before """
+        hashes = _hashes((key, ))
+        stages = self.stages
+        if stages and stages[-1].contains_hashed(hashes):
+            return True
+        found = any(stage.contains_hashed(hashes) for stage in stages[:-1])
+        if found and not self.max_stages:
+            return True
+        # new key, or a key seen in older stages that may expire
+        if not stages or stages[-1].full():
+            self._grow()
+        self.stages[-1].add_hashed(hashes)
+        return found
+
+    def _grow(self):
+        if not self.stages:
+            stage = BloomFilter(self.capacity, self.error_rate)
+        else:
+            last = self.stages[-1]
+            capacity = last.capacity * self.growth
+            error_rate = last.error_rate * self.tightening
+            if self.max_capacity and capacity >= self.max_capacity:
+                # stop tightening once stages are capped so they keep their size
+                if last.capacity >= self.max_capacity:
+                    error_rate = last.error_rate
+                capacity = self.max_capacity
+            stage = BloomFilter(capacity, error_rate)
+        self.stages.append(stage)
+        if self.max_stages and len(self.stages) > self.max_stages:
+            # forget the oldest keys to bound memory
+            self.expired += self.stages.pop(0).count
+            self.first_stage += 1
+
+    def nbytes(self):
+        return sum(stage.nbytes() for stage in self.stages)
+
+    def save(self, path):
+        """ write filter to `path`, skipping full stages saved before """
+        numbers = range(self.first_stage, self.first_stage + len(self.stages))
+        for number, stage in zip(numbers, self.stages):
+            if number in self.saved:
+                continue
+            with atomic_write(_stage_path(path, number)) as f:
+                f.write(stage.bits)
+            if stage.full():
+                # full stages never change again
+                self.saved.add(number)
+        header = dict(
+            capacity=self.capacity,
+            error_rate=self.error_rate,
+            growth=self.growth,
+            tightening=self.tightening,
+            max_capacity=self.max_capacity,
+            max_stages=self.max_stages,
+            expired=self.expired,
+            first_stage=self.first_stage,
+            stages=[
+                [stage.capacity, stage.error_rate, stage.count]
+                for stage in self.stages
+            ]
+        )
+        with atomic_write(path, 'w') as f:
+            json.dump(header, f)
+        for number in range(self.saved_first, self.first_stage):
+            # stages expired since the last save, they may never have been written
+            try:
+                os.remove(_stage_path(path, number))
+            except OSError:
+                pass
+        self.saved = set(number for number in self.saved if number >= self.first_stage)
+        self.saved_first = self.first_stage
+
+    @classmethod
+    def load(cls, path):
+        """ filter saved to `path` """
+        with open(path, 'r') as f:
+            header = json.load(f)
+        stages = header.pop('stages')
+        expired = header.pop('expired')
+        first_stage = header.pop('first_stage')
+        bloom = cls(**header)
+        bloom.expired = expired
+        bloom.first_stage = bloom.saved_first = first_stage
+        for number, (capacity, error_rate, count) in enumerate(stages, first_stage):
+            stage = BloomFilter(capacity, error_rate, count=count)
+            stage_path = _stage_path(path, number)
+            with open(stage_path, 'rb') as f:
+                bits = bytearray(f.read())
+            if len(bits) != len(stage.bits):
+                raise ValueError("Bloom filter file < {0} > is truncated".format(stage_path))
+            stage.bits = bits
+            bloom.stages.append(stage)
+            if stage.full():
+                bloom.saved.add(number)
+        return bloom
+
+
+def _stage_path(path, number):
+    return "{0}.{1}".format(path, number)
@@ -0,0 +1,265 @@
+import sys
+import json
+import atexit
+import sqlite3
+from collections import OrderedDict
+
+
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_TIMEOUT = 60
+POLICIES = ['lru', 'clock']
+MISSING = object()
+
+
+def sizeof(key, value):
+    """ approximate number of bytes held by a cache entry """
+    size = sys.getsizeof(key) + sys.getsizeof(value)
+    if isinstance(key, tuple):
+        size += sum(sys.getsizeof(item) for item in key)
+    return size
+
+
+class BoundedCache(object):
+    """
+    Base class for a cache limited by number of entries and/or bytes
+
+    Subclasses implement the eviction policy. Hit, miss and eviction
+    counts are kept so cache size and geohash precision can be tuned
+    against the measured hit rate.
+
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=None):
+        if not max_entries and not max_bytes:
+            raise ValueError("Cache must be bounded by max_entries or max_bytes")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        """ return cached value for key or default and record hit or miss """
+        value = self._get(key)
+        if value is MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self._contains(key):
+            return
+        self._add(key, value)
+        if self.max_bytes:
+            self.bytes += sizeof(key, value)
+        while self._full():
+            self._evict()
+            self.evictions += 1
+
+    def _full(self):
+        if self.max_entries and len(self) > self.max_entries:
+            return True
+        if self.max_bytes and self.bytes > self.max_bytes and len(self) > 1:
+            return True
+        return False
+
+    def _removed(self, key, value):
+        if self.max_bytes:
+            self.bytes -= sizeof(key, value)
+
+    def __contains__(self, key):
+        return self._contains(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return dict(
+            entries=len(self),
+            bytes=self.bytes,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            hit_rate=float(self.hits) / lookups if lookups else 0.0
+        )
+
+
+class LRUCache(BoundedCache):
+    """ Evict least recently used entry """
+
+    def __init__(self, *args, **kwargs):
+        super(LRUCache, self).__init__(*args, **kwargs)
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _contains(self, key):
+        return key in self.entries
+
+    def _get(self, key):
+        value = self.entries.pop(key, MISSING)
+        if value is not MISSING:
+            # move to most recently used position
+            self.entries[key] = value
+        return value
+
+    def _add(self, key, value):
+        self.entries[key] = value
+
+    def _evict(self):
+        key, value = self.entries.popitem(last=False)
+        self._removed(key, value)
+
+
+class ClockCache(BoundedCache):
+    """
+    Evict entries with the CLOCK approximation of LRU
+
+    A hit only sets a reference bit instead of reordering entries. On
+    eviction the hand sweeps over the slots, clearing set bits, and evicts
+    the first entry that was not referenced since the last sweep.
+
+    """
+    def __init__(self, *args, **kwargs):
+        super(ClockCache, self).__init__(*args, **kwargs)
+        self.slots = {}         # key -> slot position
+        self.keys = []
+        self.values = []
+        self.referenced = []
+        self.hand = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _contains(self, key):
+        return key in self.slots
+
+    def _get(self, key):
+        slot = self.slots.get(key)
+        if slot is None:
+            return MISSING
+        self.referenced[slot] = True
+        return self.values[slot]
+
+    def _add(self, key, value):
+        self.slots[key] = len(self.keys)
+        self.keys.append(key)
+        self.values.append(value)
+        self.referenced.append(False)
+
+    def _evict(self):
+        while self.referenced[self.hand]:
+            self.referenced[self.hand] = False
+            self.hand = (self.hand + 1) % len(self.keys)
+        slot = self.hand
+        key, value = self.keys[slot], self.values[slot]
+        del self.slots[key]
+        self._removed(key, value)
+        # fill the freed slot with the last entry to keep slots compact
+        last = len(self.keys) - 1
+        if slot != last:
+            self.keys[slot] = self.keys[last]
+            self.values[slot] = self.values[last]
+            self.referenced[slot] = self.referenced[last]
+            self.slots[self.keys[slot]] = slot
+        self.keys.pop()
+        self.values.pop()
+        self.referenced.pop()
+        if self.keys:
+            self.hand %= len(self.keys)
+        else:
+            self.hand = 0
+
+
+def build_cache(policy='lru', **kwargs):
+    """ create cache using named eviction policy """
+    if policy == 'lru':
+        return LRUCache(**kwargs)
+    if policy == 'clock':
+        return ClockCache(**kwargs)
+    error = "Cache policy < {0} > is invalid. Must be one of {1}"
+    raise ValueError(error.format(policy, POLICIES))
+
+
+class SQLiteCache(object):
+    """
+    Geohash lookup results shared by all processes on a node
+
+    Entries are stored in a SQLite database keyed by `namespace` (which
+    identifies the source of the lookup and its version, see
+    `FileReader.version`) and (geohash, buffer_size, multiple).
+    The database uses write-ahead logging so readers never block on a
+    writer. New entries are buffered and written in batches of `batch_size`
+    with INSERT OR IGNORE, so tasks racing on the same key are harmless.
+
+    """
+    def __init__(self, path, namespace, batch_size=DEFAULT_BATCH_SIZE,
+            timeout=DEFAULT_TIMEOUT):
+        self.path = path
+        self.namespace = namespace
+        self.batch_size = batch_size
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, timeout=timeout)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS geohash_cache (
+                    namespace TEXT,
+                    geohash TEXT,
+                    buffer_size REAL,
+                    multiple INTEGER,
+                    payload TEXT,
+                    PRIMARY KEY (namespace, geohash, buffer_size, multiple)
+                )
+            """)
+        atexit.register(self.close)
+
+    def get(self, key, default=MISSING):
+        if key in self.pending:
+            self.hits += 1
+            return self.pending[key]
+        geohash, buffer_size, multiple = key
+        row = self.conn.execute("""
+            SELECT payload FROM geohash_cache
+            WHERE namespace = ? AND geohash = ? AND buffer_size = ? AND multiple = ?
+        """, (self.namespace, geohash, buffer_size, int(multiple))).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        self.pending[key] = value
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ write all pending entries in one transaction """
+        if not self.pending or not self.conn:
+            return
+        rows = [
+            (self.namespace, geohash, buffer_size, int(multiple), json.dumps(value))
+            for (geohash, buffer_size, multiple), value in self.pending.items()
+        ]
+        with self.conn:
+            self.conn.executemany("""
+                INSERT OR IGNORE INTO geohash_cache
+                (namespace, geohash, buffer_size, multiple, payload)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+        self.pending = {}
+
+    def close(self):
+        if not self.conn:
+            return
+        self.flush()
+        self.conn.close()
+        self.conn = None
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, pending=len(self.pending))
@@ -0,0 +1,262 @@
+import sys
+import json
+import zlib
+import base64
+import struct
+import functools
+import itertools
+from array import array
+
+import Geohash
+from mrjob.protocol import JSONValueProtocol
+
+
+"""
+Columnar chunks of pre-parsed tweets
+
+A chunk stores up to `chunk_size` tweets column by column and is written as
+a single line so chunk files can be split and read like any other log:
+
+    GTCOL1:<base64 of payload>
+
+The payload starts with the length of a JSON header listing the rows and
+(name, type, offset, length) of every column, followed by the zlib
+compressed data of each column
+
+    float   coordinates as 8 byte floats, `lonlat` is split into `lon` and
+            `lat` columns with NaN for tweets without coordinates
+    int     64 bit integers such as `user_id` and follower counts
+    str     utf-8 strings separated by NUL bytes, preceded by a table of
+            null rows, decoded and split all at once
+    ascii   byte strings stored like `str` but not decoded, used for the
+            precomputed `geohash` of each tweet
+    json    any other values (or strings with NUL characters), each encoded
+            as JSON in a `str` column
+
+`Chunk.records` only decompresses and decodes the columns it is asked for,
+so jobs reading chunks skip JSON decoding of whole tweets and never touch
+columns they do not use. Missing fields and nulls are both read back as None.
+Each job lists the tweet fields its mappers read as `COLUMNS`, the columns
+passed to `expand_chunks`.
+"""
+MAGIC = 'GTCOL1:'
+DEFAULT_CHUNK_SIZE = 10000
+# deep enough for every geohash lookup of the jobs
+GEOHASH_PRECISION = 8
+# virtual column built from the `lon` and `lat` columns
+LONLAT = 'lonlat'
+HEADER = struct.Struct('<I')
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+def _floats(data):
+    values = array('d')
+    values.fromstring(data)
+    if not LITTLE_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def _float_bytes(values):
+    values = array('d', values)
+    if not LITTLE_ENDIAN:
+        values.byteswap()
+    return values.tostring()
+
+
+def _int_bytes(values):
+    return struct.pack('<{0}q'.format(len(values)), *values)
+
+
+def _ints(data, rows):
+    return struct.unpack('<{0}q'.format(rows), data)
+
+
+def _string_bytes(values):
+    """ table of null rows followed by the utf-8 strings separated by NUL """
+    nulls = [i for i, value in enumerate(values) if value is None]
+    table = struct.pack('<{0}i'.format(len(nulls) + 1), len(nulls), *nulls)
+    encoded = [
+        value.encode('utf-8') if isinstance(value, unicode) else value or ''
+        for value in values
+    ]
+    return table + '\0'.join(encoded)
+
+
+def _strings(data, rows, decode=True):
+    count = struct.unpack_from('<i', data)[0]
+    nulls = struct.unpack_from('<{0}i'.format(count), data, 4)
+    data = buffer(data, 4 * (count + 1))
+    if not rows:
+        return []
+    values = unicode(data, 'utf-8').split(u'\0') if decode else str(data).split('\0')
+    for i in nulls:
+        values[i] = None
+    return values
+
+
+def _is_int(value):
+    return (
+        value.__class__ in (int, long) and
+        -0x8000000000000000 <= value <= 0x7fffffffffffffff
+    )
+
+
+def _column_type(values):
+    """ narrowest column type holding all values """
+    if all(value is not None and _is_int(value) for value in values):
+        return 'int'
+    if all(value is None or isinstance(value, basestring) and '\0' not in value
+            for value in values):
+        return 'str'
+    return 'json'
+
+
+def _encode_column(kind, values):
+    if kind == 'float':
+        return _float_bytes(values)
+    if kind == 'int':
+        return _int_bytes(values)
+    if kind == 'json':
+        values = [json.dumps(value) for value in values]
+    return _string_bytes(values)
+
+
+def _geohash(lonlat):
+    if not lonlat:
+        return None
+    lon, lat = lonlat
+    return Geohash.encode(lat, lon, precision=GEOHASH_PRECISION)
+
+
+def encode_chunk(records):
+    """ line holding dict `records` as a columnar chunk """
+    names = []
+    seen = set()
+    for record in records:
+        for name in record:
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+    columns = []
+    for name in names:
+        values = [record.get(name) for record in records]
+        if name == LONLAT:
+            nan = float('nan')
+            columns.append(('lon', 'float', [v[0] if v else nan for v in values]))
+            columns.append(('lat', 'float', [v[1] if v else nan for v in values]))
+            columns.append(('geohash', 'ascii', [_geohash(v) for v in values]))
+            continue
+        columns.append((name, _column_type(values), values))
+    header = dict(rows=len(records), columns=[])
+    blobs = []
+    offset = 0
+    for name, kind, values in columns:
+        blob = zlib.compress(_encode_column(kind, values))
+        header['columns'].append([name, kind, offset, len(blob)])
+        blobs.append(blob)
+        offset += len(blob)
+    header = json.dumps(header)
+    payload = HEADER.pack(len(header)) + header + ''.join(blobs)
+    return MAGIC + base64.b64encode(payload)
+
+
+def write_chunks(records, f, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ write iterable of dict `records` to file `f` in chunks, return count """
+    count = 0
+    while True:
+        batch = list(itertools.islice(records, chunk_size))
+        if not batch:
+            return count
+        f.write(encode_chunk(batch) + '\n')
+        count += len(batch)
+
+
+class Chunk(object):
+    """ Columns of a chunk line, decoded on demand """
+
+    def __init__(self, line):
+        if not line.startswith(MAGIC):
+            raise ValueError("Line is not a columnar chunk")
+        self.payload = base64.b64decode(line[len(MAGIC):].rstrip('\r\n'))
+        size = HEADER.unpack_from(self.payload)[0]
+        header = json.loads(self.payload[HEADER.size:HEADER.size + size])
+        self.rows = header['rows']
+        self.start = HEADER.size + size
+        self.names = [name for name, kind, offset, length in header['columns']]
+        self.columns = dict(
+            (name, (kind, offset, length))
+            for name, kind, offset, length in header['columns']
+        )
+
+    def __len__(self):
+        return self.rows
+
+    def fields(self):
+        """ names of records fields, `lon` and `lat` are joined into `lonlat` """
+        fields = [name for name in self.names if name not in ('lon', 'lat')]
+        if 'lon' in self.columns:
+            fields.insert(self.names.index('lon'), LONLAT)
+        return fields
+
+    def column(self, name):
+        """ list of values of column `name`, None for missing columns """
+        if name == LONLAT:
+            return self._lonlat()
+        if name not in self.columns:
+            return [None] * self.rows
+        kind, offset, length = self.columns[name]
+        start = self.start + offset
+        data = zlib.decompress(self.payload[start:start + length])
+        if kind == 'float':
+            return _floats(data)
+        if kind == 'int':
+            return _ints(data, self.rows)
+        if kind == 'json':
+            return [json.loads(value) for value in _strings(data, self.rows)]
+        return _strings(data, self.rows, decode=kind == 'str')
+
+    def _lonlat(self):
+        if 'lon' not in self.columns:
+            return [None] * self.rows
+        return [
+            None if lon != lon else [lon, lat]
+            for lon, lat in itertools.izip(self.column('lon'), self.column('lat'))
+        ]
+
+    def records(self, columns=None):
+        """ generate dict of `columns` (default all fields) for each row """
+        names = list(columns or self.fields())
+        values = [self.column(name) for name in names]
+        for row in itertools.izip(*values):
+            yield dict(itertools.izip(names, row))
+
+
+class ColumnarValueProtocol(JSONValueProtocol):
+    """ Read chunk lines as `Chunk` values and any other line as JSON """
+
+    def read(self, line):
+        if line.startswith(MAGIC):
+            return None, Chunk(line)
+        return super(ColumnarValueProtocol, self).read(line)
+
+
+def expand_chunks(columns):
+    """
+    Decorate a mapper to be called with each record of `Chunk` values
+
+    Records only hold `columns`, other values are passed on unchanged.
+
+    """
+    def decorator(mapper):
+        @functools.wraps(mapper)
+        def wrapper(self, key, value):
+            if value.__class__ is not Chunk:
+                for output in mapper(self, key, value) or ():
+                    yield output
+                return
+            for record in value.records(columns):
+                for output in mapper(self, key, record) or ():
+                    yield output
+        return wrapper
+    return decorator
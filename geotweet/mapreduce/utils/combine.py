@@ -0,0 +1,71 @@
+"""
+In-mapper combining of counts
+
+Mappers add a count for each key to a `PartialCounts` instead of yielding
+it. Partial counts are yielded when the number of distinct keys reaches
+the limit set with the `--combine-limit` option and in `mapper_final`, so
+a popular word is emitted once per flush instead of once per occurrence.
+"""
+DEFAULT_LIMIT = 100000          # distinct keys held before flushing
+COUNTER_GROUP = 'geotweet'
+
+
+class PartialCounts(object):
+    """
+    Bounded dict of partial counts
+
+    `added` is the number of counts added, which is the number of records
+    a mapper without combining would emit, and `emitted` the number of
+    records flushed.
+
+    """
+    def __init__(self, limit=DEFAULT_LIMIT):
+        self.limit = limit
+        self.counts = {}
+        self.added = 0
+        self.emitted = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, key, count=1):
+        self.added += 1
+        self.counts[key] = self.counts.get(key, 0) + count
+
+    def full(self):
+        """ check if distinct keys reached the limit (a limit of 0 is always full) """
+        return len(self.counts) >= max(self.limit, 1)
+
+    def flush(self):
+        """ remove all partial counts and return them as (key, count) """
+        counts = self.counts
+        self.counts = {}
+        self.emitted += len(counts)
+        return counts.iteritems()
+
+    def ratio(self):
+        """ counts added for each record emitted """
+        if not self.emitted:
+            return 0.0
+        return float(self.added) / self.emitted
+
+
+def add_combine_option(job):
+    """ add `--combine-limit` option to MRJob `job` """
+    job.add_passthrough_option(
+        '--combine-limit',
+        type='int',
+        default=DEFAULT_LIMIT,
+        help="Distinct keys counted in a mapper before flushing (default {0})".format(
+            DEFAULT_LIMIT
+        )
+    )
+
+
+def report(job, counts):
+    """ increment counters for records before and after combining """
+    job.increment_counter(COUNTER_GROUP, 'combine input records', counts.added)
+    job.increment_counter(COUNTER_GROUP, 'combine output records', counts.emitted)
+    # counters are summed over tasks so the ratio of each task is a status
+    status = "in-mapper combining: {0} records into {1} ({2:.1f}x)"
+    job.set_status(status.format(counts.added, counts.emitted, counts.ratio()))
@@ -0,0 +1,114 @@
+import Geohash
+from shapely.geometry import Polygon
+
+from .proj import project_many
+from .files import atomic_write
+
+
+"""
+Hierarchical geohash cover of indexed polygons
+
+Geohash cells that fall completely inside exactly one feature map straight
+to the key of that feature. Any point inside such a cell resolves to that
+feature without a projection or geometry test, only cells crossing a
+boundary need the exact lookup.
+
+Cells are subdivided from precision 2 down to `max_precision`
+
+precision   width   height
+2           1252km  624km
+3           156km   156km
+4           39.1km  19.5km
+5           4.9km   4.9km
+6           1.2km   609.4m
+"""
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+MIN_PRECISION = 2
+DEFAULT_MAX_PRECISION = 5
+SEGMENTS = 4            # vertices added along each cell edge before projecting
+MARGIN = 0.01           # cells are grown by this fraction of their width
+SEAM = 84.0             # longitude opposite of the ESRI:102005 central meridian
+VERSION = 1
+
+
+def cell_bounds(geohash):
+    """ (west, south, east, north) of geohash cell """
+    lat, lon, lat_err, lon_err = Geohash.decode_exactly(geohash)
+    return lon - lon_err, lat - lat_err, lon + lon_err, lat + lat_err
+
+
+def cell_polygon(geohash):
+    """ geohash cell projected to ESRI:102005 and grown by a safety margin """
+    west, south, east, north = cell_bounds(geohash)
+    corners = [(west, south), (east, south), (east, north), (west, north)]
+    ring = []
+    for i, (x0, y0) in enumerate(corners):
+        x1, y1 = corners[(i + 1) % len(corners)]
+        for step in range(SEGMENTS):
+            frac = float(step) / SEGMENTS
+            ring.append((x0 + (x1 - x0) * frac, y0 + (y1 - y0) * frac))
+    polygon = Polygon(project_many(ring))
+    minx, miny, maxx, maxy = polygon.bounds
+    return polygon.buffer(max(maxx - minx, maxy - miny) * MARGIN)
+
+
+def start_cells():
+    """ cells at MIN_PRECISION that do not cross the seam of the projection """
+    cells = []
+    for first in BASE32:
+        for second in BASE32:
+            west, south, east, north = cell_bounds(first + second)
+            if not west < SEAM < east:
+                cells.append(first + second)
+    return cells
+
+
+def build_cover(lookup, max_precision=DEFAULT_MAX_PRECISION):
+    """ map geohash cells inside exactly one feature of lookup to its key """
+    cover = {}
+    cells = start_cells()
+    while cells:
+        cell = cells.pop()
+        polygon = cell_polygon(cell)
+        matches = []
+        for key in lookup.idx.intersection(polygon.bounds):
+            prepared = lookup._prepared(lookup.data_store[key])
+            if prepared.intersects(polygon):
+                matches.append((key, prepared))
+        if not matches:
+            continue
+        if len(matches) == 1 and matches[0][1].contains(polygon):
+            cover[cell] = matches[0][0]
+        elif len(cell) < max_precision:
+            cells.extend(cell + char for char in BASE32)
+    return cover
+
+
+def find_cover(cover, geohash, max_precision):
+    """ key of feature covering geohash or None if it is near a boundary """
+    for i in range(MIN_PRECISION, min(len(geohash), max_precision) + 1):
+        key = cover.get(geohash[:i])
+        if key is not None:
+            return key
+    return None
+
+
+def write_cover(path, cover, max_precision):
+    """ persist cover as tab delimited lines, renamed into place when complete """
+    with atomic_write(path, 'w') as f:
+        f.write("{0}\t{1}\n".format(VERSION, max_precision))
+        for cell, key in sorted(cover.items()):
+            f.write("{0}\t{1}\n".format(cell, key))
+
+
+def read_cover(path, max_precision):
+    """ read persisted cover or return None if it was built differently """
+    with open(path, 'r') as f:
+        header = f.readline().split()
+        if header != [str(VERSION), str(max_precision)]:
+            return None
+        cover = {}
+        for line in f:
+            cell, key = line.split()
+            cover[cell] = int(key)
+        return cover
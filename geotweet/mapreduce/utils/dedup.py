@@ -0,0 +1,111 @@
+from mrjob.step import MRStep
+
+from .bloom import ScalableBloomFilter
+from .columnar import Chunk
+from .filters import COUNTER_GROUP
+
+
+"""
+Duplicate tweet elimination for the jobs
+
+Reconnects of the streaming connection write overlapping tweets to adjacent
+rotated logs. With `--dedup` a job only counts the first tweet of each
+`tweet_id`
+
+    exact         an extra first step shuffles the columns read by the job
+                  keyed by tweet_id and keeps one record of each
+    approximate   mappers drop tweets with a tweet_id already added to a
+                  scalable Bloom filter, catching duplicates within the input
+                  of each map task without a shuffle, with a small fraction
+                  (DEFAULT_ERROR_RATE) of new tweets dropped as false positives
+
+Duplicates are counted as 'duplicate tweet' in the filter counter group.
+"""
+EXACT = 'exact'
+APPROXIMATE = 'approximate'
+DEDUP_MODES = [EXACT, APPROXIMATE]
+DUPLICATE = 'duplicate tweet'
+# records without a tweet_id, such as POIs, are spread over this many keys
+PASSTHROUGH_BUCKETS = 64
+
+
+def add_dedup_option(job):
+    """ add `--dedup` option to MRJob `job` """
+    job.add_passthrough_option(
+        '--dedup',
+        type='choice',
+        choices=DEDUP_MODES,
+        default=None,
+        help="Count each tweet_id once: 'exact' with an extra shuffle step or " +
+            "'approximate' with a Bloom filter in each mapper (default no dedup)"
+    )
+
+
+class DuplicateRule(object):
+    """ Reject tweets with a tweet_id seen before, for a `TweetFilter` """
+
+    name = DUPLICATE
+
+    def __init__(self, **kwargs):
+        self.seen = ScalableBloomFilter(**kwargs)
+
+    def rejects(self, record):
+        tweet_id = record.get('tweet_id')
+        if not tweet_id:
+            return False
+        return self.seen.add(tweet_id)
+
+
+def dedup_rules(job):
+    """ filter rules for the `--dedup` mode of `job` """
+    if job.options.dedup == APPROXIMATE:
+        return [DuplicateRule()]
+    return []
+
+
+class ExactDedup(object):
+    """ Step passing on the `columns` of the first record of each tweet_id """
+
+    def __init__(self, job, columns):
+        self.job = job
+        self.columns = list(columns) + ['tweet_id']
+        self.passed = 0
+
+    def step(self):
+        return MRStep(mapper=self.mapper, combiner=self.combiner, reducer=self.reducer)
+
+    def mapper(self, _, value):
+        records = value.records(self.columns) if value.__class__ is Chunk else [value]
+        for record in records:
+            tweet_id = record.get('tweet_id')
+            if tweet_id:
+                yield tweet_id, record
+                continue
+            self.passed += 1
+            yield (None, self.passed % PASSTHROUGH_BUCKETS), record
+
+    def combiner(self, key, values):
+        for key, value in self._dedup(key, values):
+            yield key, value
+
+    def reducer(self, key, values):
+        for _, value in self._dedup(key, values):
+            yield None, value
+
+    def _dedup(self, key, values):
+        if not isinstance(key, basestring):
+            # records without a tweet_id are all passed on
+            for value in values:
+                yield key, value
+            return
+        yield key, next(values)
+        duplicates = sum(1 for _ in values)
+        if duplicates:
+            self.job.increment_counter(COUNTER_GROUP, DUPLICATE, duplicates)
+
+
+def dedup_steps(job, columns):
+    """ steps to run before the steps of `job` for its `--dedup` mode """
+    if job.options.dedup == EXACT:
+        return [ExactDedup(job, columns).step()]
+    return []
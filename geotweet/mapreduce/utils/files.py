@@ -0,0 +1,50 @@
+import os
+import fcntl
+from contextlib import contextmanager
+
+
+"""
+Safe writes of files shared by the tasks of a node
+
+`atomic_write` writes to a temporary file renamed into place once complete,
+so readers see either the previous or the new file and never a partially
+written one. `file_lock` holds an exclusive lock on `<path>.lock` so only
+one process builds a shared file while the others wait for it. The lock is
+reentrant within a process, a task holding it can fetch the files it builds
+from under the same lock.
+"""
+_held = {}
+
+
+@contextmanager
+def atomic_write(path, mode='wb'):
+    """ file object to write `path`, renamed into place on success """
+    tmp = "{0}-tmp{1}".format(path, os.getpid())
+    try:
+        with open(tmp, mode) as f:
+            yield f
+        os.rename(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+@contextmanager
+def file_lock(path):
+    """ exclusive lock on `<path>.lock` shared by the processes of a node """
+    lock_path = path + '.lock'
+    if lock_path in _held:
+        _held[lock_path] += 1
+        try:
+            yield
+        finally:
+            _held[lock_path] -= 1
+        return
+    with open(lock_path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _held[lock_path] = 1
+        try:
+            yield
+        finally:
+            del _held[lock_path]
+            fcntl.flock(lock, fcntl.LOCK_UN)
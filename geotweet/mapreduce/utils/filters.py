@@ -0,0 +1,77 @@
+import re
+
+
+"""
+Tweet filters
+
+A `Rule` joins its patterns into one compiled regular expression that is
+searched once per record, stopping at the first match. A `TweetFilter`
+applies rules in order, stops at the first rule rejecting a record and
+counts rejected records for each rule.
+"""
+COUNTER_GROUP = 'geotweet filter'
+# tweets from users with these words in their description are mostly job ads
+HR_KEYWORDS = ['job', 'hiring', 'career']
+# only tweets posted from these domains, to filter out noise such as HR
+# tweets, weather reports and news updates
+SOURCE_DOMAINS = ['twitter.com', 'foursquare.com', 'instagram.com', 'untappd.com']
+
+
+class Rule(object):
+    """
+    Reject records with `field` matching any of `patterns`
+
+    If `allow` is set records are rejected unless `field` matches instead.
+    Patterns are matched as literal strings unless `regex` is set.
+
+    """
+    def __init__(self, name, field, patterns, allow=False, regex=False):
+        if not patterns:
+            raise ValueError("Rule < {0} > must have at least one pattern".format(name))
+        self.name = name
+        self.field = field
+        self.allow = allow
+        if not regex:
+            patterns = [re.escape(pattern) for pattern in patterns]
+        self.search = re.compile('|'.join(patterns)).search
+
+    def rejects(self, record):
+        value = record.get(self.field)
+        if not value:
+            # nothing to match, only allow rules reject
+            return self.allow
+        matched = self.search(value) is not None
+        return matched != self.allow
+
+
+def hr_rule(keywords=HR_KEYWORDS):
+    """ reject tweets from users with job related keywords in description """
+    return Rule('hr description', 'description', keywords)
+
+
+def source_rule(domains=SOURCE_DOMAINS):
+    """ reject tweets not posted from one of the listed domains """
+    return Rule('source domain', 'source', domains, allow=True)
+
+
+class TweetFilter(object):
+    """ apply rules in order and count records rejected by each of them """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.rejected = dict((rule.name, 0) for rule in rules)
+
+    def rejects(self, record):
+        """ check if any rule rejects record """
+        for rule in self.rules:
+            if rule.rejects(record):
+                self.rejected[rule.name] += 1
+                return True
+        return False
+
+    def report(self, job):
+        """ increment reject counters of MRJob `job` and reset them """
+        for name, count in self.rejected.items():
+            if count:
+                job.increment_counter(COUNTER_GROUP, name, count)
+            self.rejected[name] = 0
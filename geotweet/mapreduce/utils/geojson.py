@@ -0,0 +1,101 @@
+import re
+import json
+import codecs
+
+
+"""
+Incremental GeoJSON reader
+
+`iter_features` yields the features of a FeatureCollection one at a time
+while reading the file in chunks, so peak memory is bounded by the largest
+single feature instead of the size of the whole file. Every other member
+of the collection is parsed and discarded.
+"""
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+DECODER = json.JSONDecoder()
+
+
+class _Stream(object):
+    """ text decoded from a file in chunks with a cursor into it """
+
+    def __init__(self, f, encoding, chunk_size):
+        self.f = f
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.chunk_size = chunk_size
+        self.buf = u''
+        self.pos = 0
+        self.eof = False
+
+    def more(self):
+        """ append next chunk to buffer, returns False at end of file """
+        if self.eof:
+            return False
+        # drop consumed text
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        # grow reads with the buffer so large values are not parsed too often
+        data = self.f.read(max(self.chunk_size, len(self.buf)))
+        if not data:
+            self.eof = True
+            self.buf += self.decoder.decode('', final=True)
+            return False
+        self.buf += self.decoder.decode(data)
+        return True
+
+    def peek(self):
+        """ skip whitespace and return next character or '' at end of file """
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                return ''
+
+    def expect(self, chars):
+        """ consume next character which must be one of chars """
+        char = self.peek()
+        if not char or char not in chars:
+            error = "Invalid GeoJSON: expected one of < {0} > but found < {1} >"
+            raise ValueError(error.format(chars, char or 'end of file'))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """ decode next complete JSON value """
+        self.peek()
+        while True:
+            try:
+                obj, end = DECODER.raw_decode(self.buf, self.pos)
+                # a number at the end of the buffer may continue in next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except ValueError:
+                if self.eof:
+                    raise
+            self.more()
+
+
+def iter_features(f, encoding='utf-8', chunk_size=CHUNK_SIZE):
+    """ generate each feature of GeoJSON FeatureCollection in file f """
+    stream = _Stream(f, encoding, chunk_size)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key == 'features':
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.pos += 1
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.expect(',]') == ']':
+                        break
+        else:
+            stream.value()
+        if stream.expect(',}') == '}':
+            return
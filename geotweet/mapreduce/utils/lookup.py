@@ -1,16 +1,25 @@
 import sys
 import os
 import hashlib
-import json
 
 import Geohash
+import numpy as np
 import shapely
+from shapely import vectorized
 from shapely.geometry import shape
+from shapely.prepared import prep
 from shapely.geometry.point import Point
 from rtree import index
+from rtree.core import RTreeError
 from reader import FileReader
 
-from .proj import project, rproject
+from .proj import project, rproject, project_many
+from .geojson import iter_features
+from .cover import build_cover, find_cover, read_cover, write_cover
+from .cover import DEFAULT_MAX_PRECISION
+from .files import file_lock
+from .cache import build_cache, SQLiteCache, DEFAULT_MAX_ENTRIES, MISSING
+from .store import build_index, index_exists, index_mtime, open_index, write_index
 
 
 # reference files to be downloaded from S3 once and stored locally
@@ -22,103 +31,345 @@ if 'COUNTIES_GEOJSON_LOCAL' in os.environ:
     COUNTIES_GEOJSON = os.environ['COUNTIES_GEOJSON_LOCAL']
 if 'METRO_GEOJSON_LOCAL' in os.environ:
     METRO_GEOJSON = os.environ['METRO_GEOJSON_LOCAL']
+# share cached lookup results between tasks on a node using this sqlite file
+SHARED_CACHE = os.getenv('GEOTWEET_SHARED_CACHE', None)
+# counter group of the cache statistics reported by the jobs
+CACHE_COUNTER_GROUP = 'geotweet lookup cache'
+# meters boundaries may be simplified by (see `simplify` of SpatialLookup)
+SIMPLIFY_TOLERANCE = 100
+# grow bands around simplified boundaries to absorb floating point error
+SAFETY = 1.01
 
 
 class SpatialLookup(FileReader):
-    """ Create a indexed spatial lookup of a geojson file """
+    """
+    Create a indexed spatial lookup of a geojson file
+
+    If `persist` is set the index built from `src` is written next to the
+    cached download of `src` and later instances open it from disk instead
+    of parsing the geojson again.
+
+    If `cover` is set a geohash cover of the features is built down to
+    `cover_precision` (and persisted along with the index) so geohashes deep
+    inside a feature resolve with `get_covered` without any geometry test.
+
+    If `simplify` is set each feature also keeps a geometry simplified by
+    that tolerance. Points inside the simplified geometry shrunk by the
+    tolerance (safe interior) or outside of it grown by the tolerance are
+    resolved against the simplified shapes, only points in the band between
+    them (uncertain band) are tested against the full resolution geometry.
+
+    """
     
     idx = None
     data_store = {}
+    cover = None
+    simplify = None
 
-    def __init__(self, src=None):
+    def __init__(self, src=None, persist=True, cover=False,
+            cover_precision=DEFAULT_MAX_PRECISION, simplify=None):
+        self.cover_precision = cover_precision
+        self.simplify = simplify
         if src:
             if not self.is_valid_src(src):
                 error = "Arg src=< {0} > is invalid."
                 error += " Must be existing file or valid url that starts with 'http'"
                 raise ValueError(error.format(src))
-            # build index from geojson
-            self.data_store, self.idx = self._build_from_geojson(src)
+            if persist:
+                # open prebuilt index or build and persist one from geojson
+                self.data_store, self.idx = self._load_or_build(src)
+            else:
+                # build index from geojson
+                self.data_store, self.idx = self._build_from_geojson(src)
+            if cover:
+                self.cover = self._load_or_build_cover(src, persist)
         else:
             # create empty index in memory
             self.data_store, self.idx = self._initialize()
 
-    def _get_nearest(self, point, geom):
+    def _candidates(self, point, distance):
+        """
+        generate records with a bounding box within distance of point
+
+        Bounding boxes are searched with the bounds of the point expanded
+        by distance, the true distance is checked by the caller.
+
+        """
+        x, y = point.x, point.y
+        bounds = (x - distance, y - distance, x + distance, y + distance)
+        for bbox_match in self.idx.intersection(bounds):
+            yield self.data_store[bbox_match]
+
+    def _get_nearest(self, point, distance):
         nearest = None
-        for bbox_match in self.idx.intersection(geom.bounds):
+        for record in self._candidates(point, distance):
             # check actual geometry after matching bounding box
-            #record = bbox_match.object
-            record = self.data_store[bbox_match]
             try:
-                if not record['geometry'].intersects(geom):
-                    # skip processing current matching bbox
+                if self._intersects_point(record, point):
+                    # no other record can be nearer than one containing point
+                    return record['properties']
+                if not distance:
                     continue
                 # save only nearest record
-                dist = point.distance(record['geometry'])
-                if not nearest or dist < nearest['dist']:
-                    nearest = dict(data=record, dist=dist)
+                limit = nearest['dist'] if nearest else distance
+                dist = self._distance(record, point, limit)
+                if dist is None or (nearest and dist >= limit):
+                    continue
+                nearest = dict(data=record, dist=dist)
             except shapely.geos.TopologicalError as e:
-                # geometry is invalid so stop processing
+                # geometry is invalid so skip processing current record
                 pass
         if nearest:
             return nearest['data']['properties']
         return None
 
-    def _get_all_near(self, geom):
+    def _get_all_near(self, point, distance):
         results = []
-        for bbox_match in self.idx.intersection(geom.bounds):
+        for record in self._candidates(point, distance):
             # check actual geometry after matching bounding box
-            #record = bbox_match.object
-            record = self.data_store[bbox_match]
             try:
-                if not record['geometry'].intersects(geom):
-                    # skip processing current matching bbox
-                    continue
-                # return all intersecting records
-                results.append(record['properties'])
+                if self._intersects_point(record, point):
+                    results.append(record['properties'])
+                elif distance and self._distance(record, point, distance) is not None:
+                    results.append(record['properties'])
             except shapely.geos.TopologicalError as e:
-                # geometry is invalid so stop processing
+                # geometry is invalid so skip processing current record
                 pass
+        # return all records within distance
         return results
 
     def get_object(self, point, buffer_size=0, multiple=False):
-        """ lookup object based on point as [longitude, latitude] """
-        # first search bounding boxes
-        # idx.intersection method modifies input if it is a list
+        """
+        lookup object based on point as [x, y]
+
+        If `buffer_size` is set objects within that distance of the point
+        are matched and the nearest one is returned, or all of them if
+        `multiple` is set.
+
+        """
         try:
             tmp = tuple(point)
         except TypeError:
             return None
-        # point must be in the form (minx, miny, maxx, maxy) or (x, y)
-        if len(tmp) not in [2, 4]:
+        # point must be in the form (x, y)
+        if len(tmp) != 2:
             return None
+        point = Point(tmp)
+        if multiple:
+            return self._get_all_near(point, buffer_size)
+        return self._get_nearest(point, buffer_size)
 
-        # buffer point if size is specified
-        geom = tmp = Point(tmp)
-        if buffer_size:
-            geom = tmp.buffer(buffer_size)
+    def _intersects_point(self, record, point):
+        """ point in polygon test including the boundary """
+        if self.simplify:
+            simplified, inner, outer = self._resolutions(record)
+            if inner.contains(point):
+                return True
+            if not outer.intersects(point):
+                return False
+        return self._prepared(record).intersects(point)
+
+    def _distance(self, record, point, distance):
+        """ distance from point to geometry or None if it is beyond distance """
+        if self.simplify:
+            # full resolution boundary is within tolerance of simplified one
+            simplified = self._resolutions(record)[0]
+            if point.distance(simplified) - self.simplify * SAFETY > distance:
+                return None
+        dist = point.distance(record['geometry'])
+        if dist <= distance:
+            return dist
+        return None
+
+    def _intersects_many(self, record, xs, ys):
+        """ vectorized point in polygon test including the boundary """
+        try:
+            if not self.simplify:
+                return self._intersects_exact(self._prepared(record), xs, ys)
+            simplified, inner, outer = self._resolutions(record)
+            found = vectorized.contains(inner, xs, ys)
+            uncertain = ~found & self._intersects_exact(outer, xs, ys)
+            if uncertain.any():
+                geometry = self._prepared(record)
+                exact = self._intersects_exact(geometry, xs[uncertain], ys[uncertain])
+                found[uncertain] = exact
+            return found
+        except shapely.geos.TopologicalError as e:
+            # geometry is invalid so nothing matches
+            return np.zeros(len(xs), dtype=bool)
+
+    def _intersects_exact(self, geometry, xs, ys):
+        found = vectorized.contains(geometry, xs, ys)
+        return found | vectorized.touches(geometry, xs, ys)
+
+    def get_objects(self, points, buffer_size=0, multiple=False):
+        """
+        lookup objects for a sequence of points as [[x, y], ...]
+
+        Returns a list with the result `get_object` would return for each
+        point. The index is searched once with the bounds of all points and
+        each matching feature is tested against every point inside its
+        bounding box in a single vectorized call.
+
+        """
+        if buffer_size and multiple:
+            # all matches within distance are resolved one point at a time
+            return [
+                self.get_object(point, buffer_size=buffer_size, multiple=True)
+                for point in points
+            ]
+        points = np.asarray(points, dtype=float)
+        if not len(points):
+            return []
+        if points.ndim != 2 or points.shape[1] != 2:
+            error = "Arg points must be a N x 2 array of coordinates: {0}"
+            raise ValueError(error.format(points.shape))
+        xs, ys = points[:, 0], points[:, 1]
         if multiple:
-            return self._get_all_near(geom)
-        return self._get_nearest(tmp, geom)
+            results = [[] for i in range(len(points))]
+        else:
+            results = [None] * len(points)
+        unresolved = np.ones(len(points), dtype=bool)
+        bounds = (xs.min(), ys.min(), xs.max(), ys.max())
+        for bbox_match in self.idx.intersection(bounds):
+            record = self.data_store[bbox_match]
+            minx, miny, maxx, maxy = record['geometry'].bounds
+            mask = (xs >= minx) & (xs <= maxx) & (ys >= miny) & (ys <= maxy)
+            if not multiple:
+                # keep first match for each point like get_object
+                mask &= unresolved
+            if not mask.any():
+                continue
+            candidates = np.flatnonzero(mask)
+            found = self._intersects_many(record, xs[mask], ys[mask])
+            for i in candidates[found]:
+                if multiple:
+                    results[i].append(record['properties'])
+                else:
+                    results[i] = record['properties']
+                    unresolved[i] = False
+        if buffer_size:
+            # points outside of all features get the nearest within distance
+            for i in np.flatnonzero(unresolved):
+                results[i] = self.get_object(points[i], buffer_size=buffer_size)
+        return results
+
+    def _prepared(self, record):
+        """ prepared geometry of record used for all predicate tests """
+        prepared = record.get('_prepared')
+        if prepared is None:
+            prepared = record['_prepared'] = prep(record['geometry'])
+        return prepared
+
+    def _resolutions(self, record):
+        """
+        simplified geometry with prepared safe interior and outer boundary
+
+        Built on first use of each record. The simplified boundary is within
+        the tolerance of the full resolution boundary, so shrinking it by the
+        tolerance gives an area fully inside and growing it an area that
+        contains the full resolution geometry.
+
+        """
+        resolutions = record.get('_resolutions')
+        if resolutions is None:
+            tolerance = self.simplify
+            simplified = record['geometry'].simplify(tolerance, preserve_topology=True)
+            inner = prep(simplified.buffer(-tolerance * SAFETY))
+            outer = prep(simplified.buffer(tolerance * SAFETY))
+            resolutions = record['_resolutions'] = (simplified, inner, outer)
+        return resolutions
 
     def _build_obj(self, feature):
         feature['geometry'] = shape(feature['geometry'])
+        self._prepared(feature)
         return feature
 
     def _build_from_geojson(self, src):
-        """ Build a RTree index to disk using bounding box of each feature """
-        geojson = json.loads(self.read(src))
-        idx = index.Index()
+        """ Build a RTree index in memory using bounding box of each feature """
+        with self.open(src) as f:
+            return self._bulk_load(enumerate(iter_features(f)))
+
+    def _bulk_load(self, features):
+        """ build data store and packed RTree index from (key, feature) """
         data_store = {}
-        for i, feature in enumerate(geojson['features']):
-            feature = self._build_obj(feature)
-            idx.insert(i, feature['geometry'].bounds)
-            data_store[i] = feature
+        def stream():
+            for key, feature in features:
+                feature = self._build_obj(feature)
+                data_store[key] = feature
+                yield key, feature['geometry'].bounds, None
+        idx = build_index(stream())
+        return data_store, idx
+
+    def _is_current(self, src, location):
+        """ check that persisted index exists and is newer than local src """
+        if not index_exists(location):
+            return False
+        if self.is_url(src):
+            return True
+        return index_mtime(location) >= os.path.getmtime(src)
+
+    def _load_or_build(self, src):
+        """ Open persisted index for src or build it from geojson and persist """
+        location = self.get_location(src)
+        if not location:
+            return self._build_from_geojson(src)
+        # the lock of the cached download, one task builds while others wait
+        with file_lock(location):
+            if self._is_current(src, location):
+                try:
+                    return open_index(location)
+                except (IOError, ValueError, RTreeError):
+                    # unreadable or outdated index format so build a new one
+                    pass
+            data_store, idx = self._build_from_geojson(src)
+            try:
+                write_index(location, data_store)
+            except (IOError, OSError):
+                # failing to persist only costs the next task a rebuild
+                pass
         return data_store, idx
 
+    def _load_or_build_cover(self, src, persist):
+        """ Open persisted geohash cover for src or build it from the index """
+        location = self.get_location(src) if persist else None
+        path = location + '.cover' if location else None
+        if path and os.path.isfile(path):
+            if self.is_url(src) or os.path.getmtime(path) >= os.path.getmtime(src):
+                cover = read_cover(path, self.cover_precision)
+                if cover is not None:
+                    return cover
+        cover = build_cover(self, max_precision=self.cover_precision)
+        if path:
+            try:
+                write_cover(path, cover, self.cover_precision)
+            except (IOError, OSError):
+                pass
+        return cover
+
+    def get_covered(self, geohash):
+        """ properties of feature with a cover cell containing geohash """
+        if not self.cover:
+            return None
+        key = find_cover(self.cover, geohash, self.cover_precision)
+        if key is None:
+            return None
+        return self.data_store[key]['properties']
+
     def _initialize(self):
         """ Build a RTree in memory for features to be added to """
         return {}, index.Index()
 
+    def load(self, features):
+        """
+        Replace contents of the index with features from (key, feature)
+
+        All features are bulk loaded into a packed RTree, which is faster to
+        build and to query than calling `insert` for each feature.
+
+        """
+        self.data_store, self.idx = self._bulk_load(features)
+
     def insert(self, key, feature):
         feature = self._build_obj(feature)
         self.data_store[key] = feature
@@ -126,45 +377,158 @@ class SpatialLookup(FileReader):
 
 
 class CachedLookup(SpatialLookup):
-    """ Cache results of spatial lookups """
+    """
+    Cache results of spatial lookups
+
+    Each instance keeps its own bounded cache keyed by geohash. `cache_size`
+    limits the number of entries, `cache_bytes` the approximate memory used
+    and `cache_policy` selects 'lru' or 'clock' eviction.
+
+    If `shared_cache` is the path of a sqlite file, results for lookups
+    built from a `src` are also read from and written to that file so
+    later tasks on the same node start with a warm cache.
 
-    geohash_cache = {}
+    """
 
-    def __init__(self, precision=7,  *args, **kwargs):
+    def __init__(self, precision=7, cache_size=DEFAULT_MAX_ENTRIES, cache_bytes=None,
+            cache_policy='lru', shared_cache=SHARED_CACHE, *args, **kwargs):
         super(CachedLookup, self).__init__(*args, **kwargs)
         self.precision = precision
-        self.hit = 0
-        self.miss = 0
+        self.covered = 0
+        self.geohash_cache = build_cache(
+            policy=cache_policy,
+            max_entries=cache_size,
+            max_bytes=cache_bytes
+        )
+        self.shared_cache = None
+        # results of a previous version of src are never read
+        version = self.version(kwargs.get('src', None))
+        if shared_cache and version:
+            self.shared_cache = SQLiteCache(shared_cache, version)
+
+    @property
+    def hit(self):
+        return self.geohash_cache.hits
+
+    @property
+    def miss(self):
+        return self.geohash_cache.misses
+
+    def cache_stats(self):
+        """ hit, miss and eviction counts of geohash cache """
+        stats = self.geohash_cache.stats()
+        stats['covered'] = self.covered
+        if self.shared_cache:
+            stats['shared'] = self.shared_cache.stats()
+        return stats
+
+    def _cached(self, key):
+        """ cached payload for key from local then shared cache or MISSING """
+        payload = self.geohash_cache.get(key)
+        if payload is MISSING and self.shared_cache:
+            payload = self.shared_cache.get(key)
+            if payload is not MISSING:
+                self.geohash_cache.set(key, payload)
+        return payload
+
+    def _cache(self, key, payload):
+        self.geohash_cache.set(key, payload)
+        if self.shared_cache:
+            self.shared_cache.set(key, payload)
 
-    def get(self, point, buffer_size=0, multiple=False):
-        """ lookup state and county based on geohash of coordinates from tweet """
-        lon, lat = point
-        geohash = Geohash.encode(lat, lon, precision=self.precision)
+    def _get_covered(self, geohash, multiple):
+        """ resolve geohash from cover of features unless all matches are needed """
+        if multiple or not self.cover:
+            return None
+        payload = self.get_covered(geohash)
+        if payload is not None:
+            self.covered += 1
+        return payload
+
+    def get(self, point, buffer_size=0, multiple=False, geohash=None):
+        """
+        lookup state and county based on geohash of coordinates from tweet
+
+        A precomputed `geohash` of the point at least `precision` long is
+        truncated instead of encoding the point again.
+
+        """
+        if geohash and len(geohash) >= self.precision:
+            geohash = geohash[:self.precision]
+        else:
+            lon, lat = point
+            geohash = Geohash.encode(lat, lon, precision=self.precision)
+        payload = self._get_covered(geohash, multiple)
+        if payload is not None:
+            # geohash is inside a single feature
+            return payload
         key = (geohash, buffer_size, multiple)
-        if key in self.geohash_cache:
+        payload = self._cached(key)
+        if payload is not MISSING:
             # cache hit on geohash
-            self.hit += 1
-            #print self.hit, self.miss
-            return self.geohash_cache[key]
-        self.miss += 1
+            return payload
         # cache miss on geohash
         # project point to ESRI:102005
         lat, lon = Geohash.decode(geohash)
         proj_point = project([float(lon), float(lat)])
         args = dict(buffer_size=buffer_size, multiple=multiple)
         payload = self.get_object(proj_point, **args)
-        self.geohash_cache[key] = payload
+        self._cache(key, payload)
         return payload
 
+    def get_many(self, points, buffer_size=0, multiple=False):
+        """
+        lookup a batch of points as [[longitude, latitude], ...]
+
+        Cached results are returned directly and all cache misses are
+        resolved together with a single call to `get_objects`.
+
+        """
+        results = []
+        misses = {}
+        for lon, lat in points:
+            geohash = Geohash.encode(lat, lon, precision=self.precision)
+            key = (geohash, buffer_size, multiple)
+            payload = self._get_covered(geohash, multiple)
+            if payload is not None:
+                results.append((None, payload))
+                continue
+            payload = misses.get(key, MISSING)
+            if payload is MISSING:
+                payload = self._cached(key)
+            if payload is MISSING:
+                lat, lon = Geohash.decode(geohash)
+                misses[key] = payload = [float(lon), float(lat)]
+            results.append((key, payload))
+        if misses:
+            # project decoded geohashes of all misses to ESRI:102005 at once
+            args = dict(buffer_size=buffer_size, multiple=multiple)
+            missed = misses.keys()
+            points = project_many([misses[key] for key in missed])
+            payloads = self.get_objects(points, **args)
+            for key, payload in zip(missed, payloads):
+                misses[key] = payload
+                self._cache(key, payload)
+        # replace decoded points of misses with resolved payloads
+        return [misses[key] if key in misses else payload for key, payload in results]
+
 
 class CachedCountyLookup(CachedLookup):
     """ Cached spatial lookup for US counties """
 
-    def __init__(self, src=COUNTIES_GEOJSON, **kwargs):
-        super(CachedCountyLookup, self).__init__(src=src, **kwargs)
+    def __init__(self, src=COUNTIES_GEOJSON, simplify=None, **kwargs):
+        kwargs.update(src=src, simplify=simplify)
+        super(CachedCountyLookup, self).__init__(**kwargs)
+
+    def get(self, point, geohash=None):
+        payload = super(CachedCountyLookup, self).get(point, geohash=geohash)
+        return self._state_county(payload)
+
+    def get_many(self, points):
+        payloads = super(CachedCountyLookup, self).get_many(points)
+        return [self._state_county(payload) for payload in payloads]
 
-    def get(self, point):
-        payload = super(CachedCountyLookup, self).get(point)
+    def _state_county(self, payload):
         if payload:
             return payload['STATE'], payload['COUNTY']
         return None, None
@@ -173,11 +537,40 @@ class CachedCountyLookup(CachedLookup):
 class CachedMetroLookup(CachedLookup):
     """ Cached spatial lookup for US metro areas """
 
-    def __init__(self, src=METRO_GEOJSON, **kwargs):
-        super(CachedMetroLookup, self).__init__(src=src, **kwargs)
+    def __init__(self, src=METRO_GEOJSON, simplify=None, **kwargs):
+        kwargs.update(src=src, simplify=simplify)
+        super(CachedMetroLookup, self).__init__(**kwargs)
+
+    def get(self, point, buffer_size, geohash=None):
+        args = dict(buffer_size=buffer_size, geohash=geohash)
+        payload = super(CachedMetroLookup, self).get(point, **args)
+        return self._name(payload)
+
+    def get_many(self, points, buffer_size):
+        args = dict(buffer_size=buffer_size)
+        payloads = super(CachedMetroLookup, self).get_many(points, **args)
+        return [self._name(payload) for payload in payloads]
 
-    def get(self, point, buffer_size):
-        payload = super(CachedMetroLookup, self).get(point, buffer_size=buffer_size)
+    def _name(self, payload):
         if payload:
             return payload['NAME10']
         return None
+
+
+def add_lookup_cache_option(job):
+    """ add `--lookup-cache-size` option to MRJob `job` """
+    job.add_passthrough_option(
+        '--lookup-cache-size',
+        type='int',
+        default=DEFAULT_MAX_ENTRIES,
+        help="Geohashes cached by each spatial lookup of a mapper " +
+            "(default={0})".format(DEFAULT_MAX_ENTRIES)
+    )
+
+
+def report_cache(job, lookup, name):
+    """ increment counters for hits, misses and evictions of the cache of `lookup` """
+    stats = lookup.cache_stats()
+    for stat in ['hits', 'misses', 'evictions']:
+        counter = "{0} {1}".format(name, stat)
+        job.increment_counter(CACHE_COUNTER_GROUP, counter, stats[stat])
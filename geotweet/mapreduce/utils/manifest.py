@@ -0,0 +1,102 @@
+import os
+import json
+import time
+
+from .files import atomic_write
+
+
+"""
+Manifest of input logs already processed by a job
+
+Stored as a JSON object mapping each job name to the inputs merged into its
+results, with the size of each input and the time it was processed
+
+    {"metro-words": {"/logs/twitter-stream.log.2016-03-27_01-53": {
+        "size": 1330712, "processed": 1459043580.5}}}
+
+The manifest is rewritten to a temporary file and renamed into place, so
+a failed run never leaves it partially written. Inputs that changed size
+after they were processed are reported by `changed`, they are not processed
+again since their counts would be merged twice.
+
+Inputs are recorded with a "started" time before a run and marked as
+processed after it, so inputs of a run that failed or died in between are
+reported by `interrupted`. Their counts may be partly or fully merged
+already, merging is at least once and running them again may count them
+twice.
+
+Jobs run with `--incremental` merge their counts into existing MongoDB
+documents instead of inserting new ones. Counts below the minimum count of
+a job and outside of `--top-k` are kept too, since they add up over runs.
+"""
+
+
+class Manifest(object):
+    """ Inputs processed by each job """
+
+    def __init__(self, path):
+        self.path = path
+        self.jobs = {}
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                self.jobs = json.load(f)
+
+    def processed(self, job):
+        """ inputs merged into the results of job """
+        return dict(
+            (src, entry) for src, entry in self.jobs.get(job, {}).items()
+            if entry.get('processed')
+        )
+
+    def interrupted(self, job):
+        """ inputs of runs of job that started but never completed """
+        return sorted(
+            src for src, entry in self.jobs.get(job, {}).items()
+            if not entry.get('processed')
+        )
+
+    def pending(self, job, inputs):
+        """ inputs not yet processed by job, in the given order """
+        processed = self.processed(job)
+        return [src for src in inputs if src not in processed]
+
+    def changed(self, job, inputs):
+        """ inputs processed by job with a different size since """
+        processed = self.processed(job)
+        return [
+            src for src in inputs
+            if src in processed and processed[src]['size'] != _size(src)
+        ]
+
+    def start(self, job, inputs):
+        """ record inputs of a run of job about to merge their counts """
+        entries = self.jobs.setdefault(job, {})
+        now = time.time()
+        for src in inputs:
+            entries[src] = dict(size=_size(src), started=now)
+
+    def mark(self, job, inputs):
+        """ record inputs as processed by job """
+        entries = self.jobs.setdefault(job, {})
+        now = time.time()
+        for src in inputs:
+            entries[src] = dict(size=_size(src), processed=now)
+
+    def save(self):
+        with atomic_write(self.path, 'w') as f:
+            json.dump(self.jobs, f, indent=2, sort_keys=True)
+
+
+def _size(src):
+    return os.path.getsize(src) if os.path.isfile(src) else None
+
+
+def add_incremental_option(job):
+    """ add `--incremental` option to MRJob `job` """
+    job.add_passthrough_option(
+        '--incremental',
+        action='store_true',
+        default=False,
+        help="Add counts to existing MongoDB documents with upserts, every count " +
+            "is kept so merged totals are exact and --top-k is ignored"
+    )
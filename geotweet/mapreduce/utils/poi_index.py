@@ -0,0 +1,94 @@
+import os
+import json
+import hashlib
+
+from shapely.geometry import Point
+
+from .proj import project_many
+from .lookup import CachedLookup
+from .files import atomic_write
+from .store import index_exists, open_index, write_index
+
+
+"""
+Prebuilt POI indexes for each metro area
+
+A directory holds a persisted spatial index (see `store.py`) of the named
+points-of-interest of every metro area and a manifest mapping metro area
+names to index locations
+
+    <directory>/manifest.json
+    <directory>/<md5 of metro area name>.features
+
+POIs are projected to ESRI:102005 before they are indexed, only POIs with
+a name and one of POI_TAGS are kept.
+"""
+MANIFEST = 'manifest.json'
+POI_TAGS = ["amenity", "builing", "shop", "office", "tourism"]
+
+
+def poi_name(tags):
+    """ name of POI with any of POI_TAGS or None """
+    if 'name' not in tags:
+        return None
+    if any(tag in tags for tag in POI_TAGS):
+        return tags['name']
+    return None
+
+
+def index_name(metro):
+    return hashlib.md5(metro.encode('utf-8')).hexdigest()
+
+
+def write_poi_indexes(directory, pois):
+    """
+    Write an index for each metro area from a mapping of metro area name
+    to a list of (lonlat, tags) and the manifest listing them
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    manifest = {}
+    for metro, records in pois.items():
+        records = [(lonlat, tags) for lonlat, tags in records if poi_name(tags)]
+        if not records:
+            continue
+        coordinates = project_many([lonlat for lonlat, tags in records])
+        data_store = dict(
+            (key, dict(geometry=Point(point), properties=dict(tags=tags)))
+            for key, ((lonlat, tags), point) in enumerate(zip(records, coordinates))
+        )
+        name = index_name(metro)
+        write_index(os.path.join(directory, name), data_store)
+        manifest[metro] = name
+    # manifest is written last so it only lists complete indexes
+    with atomic_write(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+class POIIndex(object):
+    """
+    Open the index of a metro area from a directory the first time it is
+    needed, feature data is memory mapped and decoded on demand
+    """
+
+    def __init__(self, directory, precision=8):
+        self.directory = directory
+        self.precision = precision
+        with open(os.path.join(directory, MANIFEST), 'r') as f:
+            self.manifest = json.load(f)
+        self.lookups = {}
+
+    def get(self, metro):
+        """ cached lookup of POIs in metro area or None if it has none """
+        if metro in self.lookups:
+            return self.lookups[metro]
+        lookup = None
+        name = self.manifest.get(metro)
+        # rtree takes anything but a byte string path for a data stream
+        location = os.path.join(self.directory, str(name)) if name else None
+        if location and index_exists(location):
+            lookup = CachedLookup(precision=self.precision)
+            lookup.data_store, lookup.idx = open_index(location)
+        self.lookups[metro] = lookup
+        return lookup
@@ -1,3 +1,6 @@
+import math
+
+import numpy as np
 from pyproj import Proj, transform
 
 
@@ -10,9 +13,113 @@ ESRI102005 = '+proj=eqdc +lat_0=39 +lon_0=-96 ' + \
 proj102005 = Proj(ESRI102005)
 
 
+"""
+Analytic Equidistant Conic projection (Snyder, Map Projections - A Working
+Manual, p. 113) for the fixed parameters of ESRI:102005.
+
+NAD83 and WGS 84 are treated as the same datum (as proj4 does) so only the
+GRS 80 ellipsoid is needed. Results match pyproj to within a millimeter.
+"""
+A = 6378137.0                   # GRS 80 semi-major axis
+F = 1 / 298.257222101           # GRS 80 flattening
+E2 = F * (2 - F)
+E4 = E2 * E2
+E6 = E4 * E2
+LON_0 = math.radians(-96)
+LAT_0 = math.radians(39)
+LAT_1 = math.radians(33)
+LAT_2 = math.radians(45)
+# meridian distance series coefficients
+M0 = 1 - E2 / 4 - 3 * E4 / 64 - 5 * E6 / 256
+M2 = 3 * E2 / 8 + 3 * E4 / 32 + 45 * E6 / 1024
+M4 = 15 * E4 / 256 + 45 * E6 / 1024
+M6 = 35 * E6 / 3072
+# footpoint latitude series coefficients
+E1 = (1 - math.sqrt(1 - E2)) / (1 + math.sqrt(1 - E2))
+P2 = 3 * E1 / 2 - 27 * E1 ** 3 / 32
+P4 = 21 * E1 ** 2 / 16 - 55 * E1 ** 4 / 32
+P6 = 151 * E1 ** 3 / 96
+P8 = 1097 * E1 ** 4 / 512
+
+
+def _m(lib, phi):
+    return lib.cos(phi) / lib.sqrt(1 - E2 * lib.sin(phi) ** 2)
+
+
+def _meridian(lib, phi):
+    """ distance along the meridian from the equator to latitude phi """
+    return A * (
+        M0 * phi - M2 * lib.sin(2 * phi) + M4 * lib.sin(4 * phi) - M6 * lib.sin(6 * phi)
+    )
+
+
+N = A * (_m(math, LAT_1) - _m(math, LAT_2)) / \
+    (_meridian(math, LAT_2) - _meridian(math, LAT_1))
+G = _m(math, LAT_1) / N + _meridian(math, LAT_1) / A
+RHO_0 = A * G - _meridian(math, LAT_0)
+
+
+def _forward(lib, lon, lat):
+    lam = lib.radians(lon) - LON_0
+    # normalize longitude difference to [-pi, pi)
+    lam = (lam + math.pi) % (2 * math.pi) - math.pi
+    rho = A * G - _meridian(lib, lib.radians(lat))
+    theta = N * lam
+    return rho * lib.sin(theta), RHO_0 - rho * lib.cos(theta)
+
+
+def _inverse(lib, x, y):
+    rho = lib.sqrt(x ** 2 + (RHO_0 - y) ** 2)
+    theta = _arctan2(lib, x, RHO_0 - y)
+    mu = (A * G - rho) / (A * M0)
+    phi = mu + P2 * lib.sin(2 * mu) + P4 * lib.sin(4 * mu) + \
+        P6 * lib.sin(6 * mu) + P8 * lib.sin(8 * mu)
+    lam = theta / N + LON_0
+    lam = (lam + math.pi) % (2 * math.pi) - math.pi
+    return lib.degrees(lam), lib.degrees(phi)
+
+
+def _arctan2(lib, y, x):
+    if lib is math:
+        return math.atan2(y, x)
+    return np.arctan2(y, x)
+
+
 def project(lonlat):
-    return transform(proj4326, proj102005, *lonlat)
+    """ project [longitude, latitude] to ESRI:102005 (x, y) """
+    lon, lat = lonlat
+    return _forward(math, float(lon), float(lat))
 
 
 def rproject(lonlat):
-    return transform(proj102005, proj4326, *lonlat)
+    """ project ESRI:102005 [x, y] to (longitude, latitude) """
+    x, y = lonlat
+    return _inverse(math, float(x), float(y))
+
+
+def _split(points):
+    points = np.asarray(points, dtype=float)
+    if not len(points):
+        return np.empty(0), np.empty(0)
+    if points.ndim != 2 or points.shape[1] != 2:
+        error = "Arg points must be a N x 2 array of coordinates: {0}"
+        raise ValueError(error.format(points.shape))
+    return points[:, 0], points[:, 1]
+
+
+def project_many(lonlats):
+    """ project N x 2 array of [longitude, latitude] to ESRI:102005 """
+    x, y = _forward(np, *_split(lonlats))
+    return np.column_stack((x, y))
+
+
+def rproject_many(points):
+    """ project N x 2 array of ESRI:102005 [x, y] to [longitude, latitude] """
+    lon, lat = _inverse(np, *_split(points))
+    return np.column_stack((lon, lat))
+
+
+def transform_many(points, src=proj4326, dst=proj102005):
+    """ transform N x 2 array between any two projections with pyproj """
+    x, y = transform(src, dst, *_split(points))
+    return np.column_stack((x, y))
@@ -0,0 +1,80 @@
+from mrjob.protocol import JSONProtocol
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+"""
+Internal protocols for passing records between steps of the geotweet jobs
+
+    json    mrjob JSONProtocol (default), which is backed by ujson when
+            it is installed in newer versions of mrjob
+    ujson   ujson encoding of key and value, keys are read back as tuples
+
+Select one with the `--internal-protocol` option of a job.
+"""
+DEFAULT_PROTOCOL = 'json'
+# ujson before 2.0 rounds floats to 10 decimals unless asked for more
+try:
+    ujson.dumps(0.0, double_precision=15)
+    UJSON_ARGS = dict(double_precision=15)
+except (AttributeError, TypeError):
+    UJSON_ARGS = {}
+
+
+def _tuples(obj):
+    """ convert lists of decoded key back to tuples """
+    if obj.__class__ is list:
+        return tuple([_tuples(item) if item.__class__ is list else item for item in obj])
+    return obj
+
+
+class UJSONProtocol(object):
+    """
+    Encode key and value as JSON with ujson separated by a tab
+
+    Decoded keys are cached so runs of the same key in a reducer are only
+    decoded once, and lists in keys are converted to tuples so keys compare
+    the same as the keys yielded by the previous step.
+
+    """
+    _last_key_encoded = None
+    _last_key_decoded = None
+
+    def read(self, line):
+        raw_key, raw_value = line.split('\t', 1)
+        if raw_key != self._last_key_encoded:
+            self._last_key_encoded = raw_key
+            self._last_key_decoded = _tuples(ujson.loads(raw_key))
+        return self._last_key_decoded, ujson.loads(raw_value)
+
+    def write(self, key, value):
+        return ujson.dumps(key, **UJSON_ARGS) + '\t' + ujson.dumps(value, **UJSON_ARGS)
+
+
+PROTOCOLS = dict(json=JSONProtocol, ujson=UJSONProtocol)
+
+
+def add_protocol_option(job):
+    """ add `--internal-protocol` option to MRJob `job` """
+    job.add_passthrough_option(
+        '--internal-protocol',
+        type='choice',
+        choices=sorted(PROTOCOLS.keys()),
+        default=DEFAULT_PROTOCOL,
+        help="Protocol to encode records between steps: {0} (default {1})".format(
+            ', '.join(sorted(PROTOCOLS.keys())), DEFAULT_PROTOCOL
+        )
+    )
+
+
+def build_protocol(name):
+    """ create internal protocol by name """
+    if name not in PROTOCOLS:
+        error = "Protocol < {0} > is invalid. Must be one of {1}"
+        raise ValueError(error.format(name, sorted(PROTOCOLS.keys())))
+    if name == 'ujson' and ujson is None:
+        raise ValueError("Protocol < ujson > requires the ujson package")
+    return PROTOCOLS[name]()
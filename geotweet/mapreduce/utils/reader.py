@@ -1,11 +1,30 @@
 import sys
 import os
+import re
+import mmap
 import urllib2
 import hashlib
 
+from .files import atomic_write, file_lock
+
+
+CACHE_DIR = '/tmp'
+CHUNK_SIZE = 1024 * 1024
+MD5_ETAG = re.compile('^[0-9a-f]{32}$')
+
 
 class FileReader(object):
-    """ Read file from the local file system or remote url and cache """
+    """
+    Read file from the local file system or remote url and cache
+
+    Files are transcoded from latin-1 to utf-8 into a cache file named by
+    `get_location`. Remote files are streamed to a temporary file in chunks,
+    validated against the size and checksum reported by the server, and
+    renamed into place. An exclusive lock on `<location>.lock` makes sure
+    only one process on a node writes the cache file while others wait for
+    it, and readers never see a partially written file (see `files.py`).
+
+    """
 
     def is_url(self, src):
         return src.startswith('http')
@@ -17,7 +36,7 @@ class FileReader(object):
         digest = self.digest(src)
         if not digest:
             return None
-        return os.path.join('/tmp', "geotweet-file-{0}".format(digest))
+        return os.path.join(CACHE_DIR, "geotweet-file-{0}".format(digest))
 
     def digest(self, src):
         if not src or type(src) != str:
@@ -29,23 +48,99 @@ class FileReader(object):
             m.update(os.path.abspath(src))
         return m.hexdigest()
 
-    def read(self, src):
-        """ Download GeoJSON file of US counties from url (S3 bucket) """
-        geojson = None
+    def version(self, src):
+        """
+        digest of src and its version, the mtime and size of local files or
+        the ETag of the download of urls, None for invalid src
+        """
+        digest = self.digest(src)
+        if not digest:
+            return None
+        m = hashlib.md5(digest)
+        if self.is_url(src):
+            etag = self.get_location(src) + '.etag'
+            if os.path.isfile(etag):
+                with open(etag, 'r') as f:
+                    m.update(f.read())
+        elif os.path.isfile(src):
+            stat = os.stat(src)
+            m.update("{0}:{1}".format(stat.st_mtime, stat.st_size))
+        return m.hexdigest()
+
+    def fetch(self, src):
+        """ return path of cached utf-8 copy of src, downloading it if needed """
         if not self.is_valid_src(src):
             error = "File < {0} > does not exists or does start with 'http'."
             raise ValueError(error.format(src))
-        if not self.is_url(src):
-            return open(src, 'r').read().decode('latin-1').encode('utf-8')
-        tmp = self.get_location(src)
-        # if src poits to url that was already downloaded
-        # read from local file instead
-        if os.path.isfile(tmp):
-            with open(tmp, 'r') as f:
-                return f.read()
-        # download file and write to local filesystem before returning
+        if isinstance(src, unicode):
+            src = src.encode('utf-8')
+        location = self.get_location(src)
+        if self._is_cached(src, location):
+            return location
+        with file_lock(location):
+            # another process may have finished while waiting on the lock
+            if not self._is_cached(src, location):
+                self._write_cache(src, location)
+        return location
+
+    def _is_cached(self, src, location):
+        if not os.path.isfile(location):
+            return False
+        if self.is_url(src):
+            return True
+        return os.path.getmtime(location) >= os.path.getmtime(src)
+
+    def _write_cache(self, src, location):
+        etag = None
+        with atomic_write(location) as dst:
+            if self.is_url(src):
+                etag = self._download(src, dst)
+            else:
+                with open(src, 'rb') as f:
+                    self._transcode(f, dst)
+        if etag:
+            with atomic_write(location + '.etag', 'w') as f:
+                f.write(etag)
+
+    def _transcode(self, f, dst):
+        """ copy f to dst in chunks converted from latin-1 to utf-8 """
+        size = 0
+        m = hashlib.md5()
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), ''):
+            size += len(chunk)
+            m.update(chunk)
+            dst.write(chunk.decode('latin-1').encode('utf-8'))
+        return size, m.hexdigest()
+
+    def _download(self, src, dst):
+        """ stream src to dst, validate size and checksum and return ETag """
         response = urllib2.urlopen(src)
-        data = response.read().decode('latin-1').encode('utf-8')
-        with open(tmp, 'w') as f:
-            f.write(data)
-            return data
+        try:
+            size, md5 = self._transcode(response, dst)
+        finally:
+            response.close()
+        headers = response.info()
+        expected = headers.getheader('Content-Length')
+        if expected is not None and int(expected) != size:
+            error = "Download of < {0} > is incomplete: {1} of {2} bytes"
+            raise IOError(error.format(src, size, expected))
+        # ETag of objects uploaded to S3 in one part is the md5 of the content
+        etag = (headers.getheader('ETag') or '').strip('"')
+        if MD5_ETAG.match(etag) and etag != md5:
+            error = "Download of < {0} > is corrupt: md5 {1} does not match {2}"
+            raise IOError(error.format(src, md5, etag))
+        return etag
+
+    def open(self, src):
+        """ open cached utf-8 copy of src for reading """
+        return open(self.fetch(src), 'rb')
+
+    def mmap(self, src):
+        """ read only memory map of cached utf-8 copy of src """
+        with self.open(src) as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, src):
+        """ contents of src as a utf-8 string """
+        with self.open(src) as f:
+            return f.read()
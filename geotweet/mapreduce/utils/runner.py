@@ -0,0 +1,236 @@
+import os
+import gzip
+import zlib
+import shutil
+import logging
+import tempfile
+import itertools
+import multiprocessing
+from io import BytesIO
+
+from mrjob.parse import parse_mr_job_stderr
+
+
+"""
+Multi-core local runner for MRJob jobs
+
+Input files are split into shards by byte range, a shard holds every line
+starting inside its range. Each step runs its mappers (and combiner) on the
+shards in a pool of processes, partitions their output by a hash of the
+serialized key and runs one reducer task for each partition in the pool.
+Records are passed between steps with the internal protocol of the job and
+sorted the same way as the inline runner, so jobs see the same input.
+
+Workers are forked from the runner with the job instance already created,
+and `mapper_init` of a step is called before forking unless a shared cache
+(GEOTWEET_SHARED_CACHE) is in use, so spatial indexes built there are shared
+copy-on-write instead of being built by every task. Persisted indexes are
+loaded into memory when opened (see `store.py`), workers never share the
+position of an open file. A `mapper_init` run before forking must not emit
+records. Each task gets a freshly forked
+worker so task state never leaks into the next shard.
+"""
+DEFAULT_SHARD_SIZE = 64 * 1024 * 1024
+UNSUPPORTED = [
+    'mapper_cmd', 'mapper_pre_filter',
+    'combiner_cmd', 'combiner_pre_filter',
+    'reducer_cmd', 'reducer_pre_filter'
+]
+
+# job and steps of the running job, inherited by forked workers
+_job = None
+_steps = None
+
+
+def shard_inputs(paths, shard_size=DEFAULT_SHARD_SIZE):
+    """ (path, start, end) byte ranges of at most `shard_size` for each file """
+    shards = []
+    for path in paths:
+        size = os.path.getsize(path)
+        if path.endswith('.gz') or not size:
+            # compressed files can not be split
+            shards.append((path, 0, None))
+            continue
+        for start in range(0, size, shard_size):
+            shards.append((path, start, min(start + shard_size, size)))
+    return shards
+
+
+def read_shard(path, start, end):
+    """ lines starting at a byte offset in [start, end) """
+    if end is None:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            for line in f:
+                yield line
+        return
+    with open(path, 'rb') as f:
+        if start:
+            # skip line started in the previous shard
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line
+
+
+def _call(func, *args):
+    return func(*args) or ()
+
+
+def _group(lines):
+    """ (serialized key, lines) of sorted lines """
+    return itertools.groupby(sorted(lines), key=lambda line: line.split('\t', 1)[0])
+
+
+def _reduce_lines(lines, step, prefix, read, write):
+    """ run reducer or combiner functions of step with `prefix` over lines """
+    func = step[prefix]
+    if step[prefix + '_init']:
+        for key, value in _call(step[prefix + '_init']):
+            yield write(key, value)
+    for _, group in _group(lines):
+        group = [read(line) for line in group]
+        values = (value for _, value in group)
+        for key, value in _call(func, group[0][0], values):
+            yield write(key, value)
+    if step[prefix + '_final']:
+        for key, value in _call(step[prefix + '_final']):
+            yield write(key, value)
+
+
+def _map_task(args):
+    """ run mappers and combiner of a step on one shard, write partitions """
+    step_num, task, shard, partitions, work_dir, warm, last = args
+    step = _steps[step_num]
+    _job.stderr = BytesIO()
+    internal = _job.internal_protocol()
+    read = _job.input_protocol().read if step_num == 0 else internal.read
+    # output of a map only last step is final output
+    write = _job.output_protocol().write if last else internal.write
+    if not warm and step['mapper_init']:
+        output = [write(k, v) for k, v in _call(step['mapper_init'])]
+    else:
+        output = []
+    mapper = step['mapper']
+    for line in read_shard(*shard):
+        key, value = read(line.rstrip('\r\n'))
+        for out_key, out_value in _call(mapper, key, value):
+            output.append(write(out_key, out_value))
+    if step['mapper_final']:
+        output.extend(write(k, v) for k, v in _call(step['mapper_final']))
+    if step['combiner']:
+        output = list(_reduce_lines(output, step, 'combiner', internal.read, write))
+    files = [
+        open(os.path.join(work_dir, "map-{0}-{1}".format(task, i)), 'wb')
+        for i in range(partitions)
+    ]
+    for line in output:
+        key = line.split('\t', 1)[0]
+        files[zlib.crc32(key) % partitions].write(line + '\n')
+    for f in files:
+        f.close()
+    return _job.stderr.getvalue()
+
+
+def _reduce_task(args):
+    """ run reducer of a step on one partition of all map outputs """
+    step_num, partition, paths, output, last = args
+    step = _steps[step_num]
+    _job.stderr = BytesIO()
+    internal = _job.internal_protocol()
+    protocol = _job.output_protocol() if last else internal
+    lines = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            lines.extend(line.rstrip('\r\n') for line in f)
+    with open(output, 'wb') as f:
+        for line in _reduce_lines(lines, step, 'reducer', internal.read, protocol.write):
+            f.write(line + '\n')
+    return _job.stderr.getvalue()
+
+
+class ParallelRunner(object):
+    """
+    Run all steps of MRJob `job` on local `paths` with `processes` workers
+
+    Output lines of the last step are written to `stdout` partition by
+    partition and counters are summed over all tasks.
+
+    """
+    def __init__(self, job, paths, processes=None, shard_size=DEFAULT_SHARD_SIZE):
+        self.job = job
+        self.paths = paths
+        self.processes = processes or multiprocessing.cpu_count()
+        self.shard_size = shard_size
+        self.counters = {}
+
+    def run(self, stdout):
+        global _job, _steps
+        _job, _steps = self.job, self.job.steps()
+        for step in _steps:
+            if any(step[key] for key in UNSUPPORTED):
+                raise ValueError("Only python mappers, combiners and reducers are supported")
+        work_dir = tempfile.mkdtemp(prefix='geotweet-parallel-')
+        try:
+            shards = shard_inputs(self.paths, self.shard_size)
+            for step_num, step in enumerate(_steps):
+                last = step_num == len(_steps) - 1
+                outputs = self.run_step(step_num, step, shards, work_dir, last)
+                shards = [(path, 0, os.path.getsize(path)) for path in outputs]
+            for path in outputs:
+                with open(path, 'rb') as f:
+                    shutil.copyfileobj(f, stdout)
+        finally:
+            shutil.rmtree(work_dir)
+            _job = _steps = None
+        return self.counters
+
+    def run_step(self, step_num, step, shards, work_dir, last):
+        """ run map and reduce tasks of a step and return its output files """
+        step_dir = os.path.join(work_dir, "step-{0}".format(step_num))
+        os.mkdir(step_dir)
+        partitions = self.processes if step['reducer'] else 1
+        # warm spatial indexes once before forking unless tasks share a cache
+        warm = bool(step['mapper_init']) and not os.getenv('GEOTWEET_SHARED_CACHE')
+        if warm and list(_call(step['mapper_init'])):
+            raise ValueError("mapper_init can not emit records when run before forking")
+        map_last = last and not step['reducer']
+        tasks = [
+            (step_num, task, shard, partitions, step_dir, warm, map_last)
+            for task, shard in enumerate(shards)
+        ]
+        self.collect(self.pool_map(_map_task, tasks))
+        if not step['reducer']:
+            # map only step keeps output of each shard
+            return [
+                os.path.join(step_dir, "map-{0}-0".format(task))
+                for task in range(len(shards))
+            ]
+        outputs = []
+        tasks = []
+        for partition in range(partitions):
+            paths = [
+                os.path.join(step_dir, "map-{0}-{1}".format(task, partition))
+                for task in range(len(shards))
+            ]
+            output = os.path.join(step_dir, "part-{0:05d}".format(partition))
+            tasks.append((step_num, partition, paths, output, last))
+            outputs.append(output)
+        self.collect(self.pool_map(_reduce_task, tasks))
+        return outputs
+
+    def pool_map(self, func, tasks):
+        logging.info("Running {0} tasks of {1}".format(len(tasks), func.__name__))
+        pool = multiprocessing.Pool(self.processes, maxtasksperchild=1)
+        try:
+            return pool.map(func, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    def collect(self, stderrs):
+        for stderr in stderrs:
+            parse_mr_job_stderr(stderr, counters=self.counters)
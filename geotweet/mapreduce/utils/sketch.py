@@ -0,0 +1,296 @@
+import heapq
+import hashlib
+import math
+import struct
+from array import array
+
+
+"""
+Bounded summaries of counts
+
+`TopK` keeps the k largest (count, item) pairs of a stream in a min heap.
+`SpaceSaving` (Metwally et al. 2005) estimates counts of the most frequent
+items of a stream while monitoring at most `capacity` items. An item with
+a true count above N / capacity, where N is the total count added, is
+always monitored and its estimate exceeds the true count by at most the
+error kept with it.
+`CountMinSketch` (Cormode and Muthukrishnan 2005) estimates the count of
+any key with an error of at most epsilon * N with probability 1 - delta.
+Sketches of the same size are merged by adding their tables.
+"""
+DEFAULT_CAPACITY = 1000
+DEFAULT_EPSILON = 0.0001
+DEFAULT_DELTA = 0.01
+
+
+class TopK(object):
+    """ k largest (count, item) pairs added """
+
+    def __init__(self, k):
+        if k < 1:
+            raise ValueError("Arg k=< {0} > must be at least 1".format(k))
+        self.k = k
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def add(self, count, item):
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, (count, item))
+        elif (count, item) > self.heap[0]:
+            heapq.heapreplace(self.heap, (count, item))
+
+    def items(self):
+        """ (count, item) pairs ordered by largest count first """
+        return sorted(self.heap, reverse=True)
+
+
+class SpaceSaving(object):
+    """
+    Space-Saving summary of item counts
+
+    When a new item arrives and all `capacity` slots are taken the item
+    with the smallest count is replaced, and the new item inherits that
+    count as its error.
+
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("Arg capacity=< {0} > must be at least 1".format(capacity))
+        self.capacity = capacity
+        self.counts = {}        # item -> [count, error]
+        self.heap = []          # (count, item) entries, may be outdated
+        self.total = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, item, count=1):
+        self.total += count
+        entry = self.counts.get(item)
+        if entry is not None:
+            entry[0] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = [count, 0]
+            heapq.heappush(self.heap, (count, item))
+            return
+        minimum, evicted = self._pop_min()
+        del self.counts[evicted]
+        self.counts[item] = [minimum + count, minimum]
+        heapq.heappush(self.heap, (minimum + count, item))
+
+    def _pop_min(self):
+        """ remove and return the monitored item with the smallest count """
+        while True:
+            count, item = heapq.heappop(self.heap)
+            current = self.counts[item][0]
+            if current == count:
+                return count, item
+            # count grew since the entry was pushed so push it again
+            heapq.heappush(self.heap, (current, item))
+
+    def items(self):
+        """ (item, estimated count, error) for every monitored item """
+        return [(item, count, error) for item, (count, error) in self.counts.items()]
+
+
+def add_top_options(job, sketch=False):
+    """ add `--top-k` and optionally `--sketch-capacity` options to MRJob `job` """
+    job.add_passthrough_option(
+        '--top-k',
+        type='int',
+        default=0,
+        help="Only output the top K records of each metro area (default 0 for all)"
+    )
+    if sketch:
+        job.add_passthrough_option(
+            '--sketch-capacity',
+            type='int',
+            default=0,
+            help="Count words of each metro area in mappers with a Space-Saving " +
+                "sketch of this many items, counts become approximate and may be " +
+                "above or below the true count by up to the words counted by each " +
+                "mapper / capacity, summed over mappers (default 0 off)"
+        )
+
+
+def top(values, k):
+    """ largest k (count, ...) values ordered by count or all values if k is not set """
+    if not k:
+        return values
+    heap = TopK(k)
+    for value in values:
+        heap.add(value[0], tuple(value[1:]))
+    return [(count,) + rest for count, rest in heap.items()]
+
+
+def _hashes(key):
+    """ two independent 64 bit hashes of a tuple of strings """
+    data = u'\t'.join(key).encode('utf-8')
+    return struct.unpack('<QQ', hashlib.md5(data).digest())
+
+
+class CountMinSketch(object):
+    """
+    Count-Min sketch of `depth` rows of `width` counters
+
+    Each row is indexed by its own hash of the key, derived from two hashes
+    so every key is only hashed once. With `conservative` set only the
+    smallest counters of a key are incremented (conservative update), which
+    lowers the error and keeps every estimate an upper bound.
+
+    """
+    def __init__(self, width, depth, conservative=False):
+        if width < 1 or depth < 1:
+            error = "Args width=< {0} > and depth=< {1} > must be at least 1"
+            raise ValueError(error.format(width, depth))
+        self.width = width
+        self.depth = depth
+        self.conservative = conservative
+        self.table = array('l', [0]) * (width * depth)
+        self.total = 0
+
+    @classmethod
+    def from_error(cls, epsilon=DEFAULT_EPSILON, delta=DEFAULT_DELTA, **kwargs):
+        """ smallest sketch with error of at most epsilon * N with probability 1 - delta """
+        if not 0 < epsilon < 1 or not 0 < delta < 1:
+            error = "Args epsilon=< {0} > and delta=< {1} > must be between 0 and 1"
+            raise ValueError(error.format(epsilon, delta))
+        width = int(math.ceil(math.e / epsilon))
+        depth = int(math.ceil(math.log(1.0 / delta)))
+        return cls(width, depth, **kwargs)
+
+    def _cells(self, key):
+        h1, h2 = _hashes(key)
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        self.total += count
+        table = self.table
+        cells = self._cells(key)
+        if self.conservative:
+            target = min(table[cell] for cell in cells) + count
+            for cell in cells:
+                if table[cell] < target:
+                    table[cell] = target
+        else:
+            for cell in cells:
+                table[cell] += count
+
+    def query(self, key):
+        """ estimated count of key, never less than the true count """
+        table = self.table
+        return min(table[cell] for cell in self._cells(key))
+
+    def merge(self, other):
+        """ add counts of sketch `other` of the same size """
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Only sketches of the same size can be merged")
+        table = self.table
+        for cell, count in enumerate(other.table):
+            if count:
+                table[cell] += count
+        self.total += other.total
+
+    def dump(self):
+        return dict(
+            width=self.width,
+            depth=self.depth,
+            total=self.total,
+            table=self.table.tolist()
+        )
+
+    @classmethod
+    def load(cls, data):
+        sketch = cls(data['width'], data['depth'])
+        sketch.table = array('l', data['table'])
+        sketch.total = data['total']
+        return sketch
+
+
+class FrequentKeys(object):
+    """
+    Mergeable summary of the frequent keys of a stream
+
+    A Count-Min sketch estimates counts and a Space-Saving summary of
+    1 / epsilon keys collects candidates. A key counted more than
+    epsilon * N times in total is counted more than epsilon * N_i times in
+    at least one of the merged streams, so it is always a candidate.
+
+    Keys counted less often are only found if they were a candidate of some
+    stream, so `frequent` may miss keys with a count between its `min_count`
+    and `error_bound`, and estimates may exceed true counts by `error_bound`
+    (with probability 1 - delta). Keeping epsilon below min_count / N finds
+    every key counted `min_count` times.
+
+    """
+    def __init__(self, epsilon=DEFAULT_EPSILON, delta=DEFAULT_DELTA, conservative=False):
+        self.epsilon = epsilon
+        self.sketch = CountMinSketch.from_error(
+            epsilon, delta, conservative=conservative
+        )
+        self.candidates = SpaceSaving(int(math.ceil(1.0 / epsilon)))
+        self.keys = set()
+
+    def add(self, key, count=1):
+        self.sketch.add(key, count)
+        self.candidates.add(key, count)
+
+    def merge(self, data):
+        """ merge a summary dumped by another instance """
+        self.sketch.merge(CountMinSketch.load(data['sketch']))
+        self.keys.update(tuple(key) for key in data['candidates'])
+
+    def dump(self):
+        return dict(
+            sketch=self.sketch.dump(),
+            candidates=[key for key, count, error in self.candidates.items()]
+        )
+
+    def error_bound(self):
+        """ epsilon * N, the overcount bound and the count above which no key is missed """
+        return int(math.ceil(self.epsilon * self.sketch.total))
+
+    def frequent(self, min_count):
+        """ (key, estimated count) of candidates counted at least `min_count` times """
+        keys = self.keys.union(key for key, count, error in self.candidates.items())
+        for key in keys:
+            estimate = self.sketch.query(key)
+            if estimate >= min_count:
+                yield key, estimate
+
+
+def add_approximate_options(job):
+    """ add options for counting with `FrequentKeys` summaries to MRJob `job` """
+    job.add_passthrough_option(
+        '--approximate',
+        action='store_true',
+        default=False,
+        help="Count with mergeable Count-Min sketches, counts may exceed the true " +
+            "count and keys counted less than epsilon times the total may be missing"
+    )
+    job.add_passthrough_option(
+        '--epsilon',
+        type='float',
+        default=DEFAULT_EPSILON,
+        help="Approximate counts exceed the true count by at most epsilon times " +
+            "the total count, keys counted more often are never missed. Use at " +
+            "most the minimum count / expected total to find every key " +
+            "(default {0})".format(DEFAULT_EPSILON)
+    )
+    job.add_passthrough_option(
+        '--delta',
+        type='float',
+        default=DEFAULT_DELTA,
+        help="Probability of an approximate count exceeding the epsilon bound " +
+            "(default {0})".format(DEFAULT_DELTA)
+    )
+    job.add_passthrough_option(
+        '--conservative-update',
+        action='store_true',
+        default=False,
+        help="Only increment the smallest sketch counters of each key"
+    )
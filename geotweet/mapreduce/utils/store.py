@@ -0,0 +1,171 @@
+import os
+import json
+import mmap
+import struct
+import itertools
+
+from shapely import wkb
+from rtree import index
+
+from .files import atomic_write
+
+
+"""
+Prebuilt spatial index files
+
+A spatial index is persisted as a single feature store file
+
+    <location>.features     bounds, WKB geometry and JSON properties
+
+Feature store layout (little endian)
+
+    header      magic (4s), version (I), count (I)
+    table       count * (key (q), offset (Q), props length (I), wkb length (I),
+                bounds (4d))
+    data        JSON encoded feature without geometry followed by WKB geometry
+
+Keys of a feature starting with an underscore hold objects derived from the
+geometry, such as prepared geometries, and are not persisted.
+
+The R-tree is bulk loaded in memory from the bounds of the table when the
+store is opened, which takes a few milliseconds for thousands of features.
+The persisted files are never written by readers, and forked processes share
+the index copy-on-write. The store is written with `atomic_write` so an index
+is published as one complete file.
+"""
+MAGIC = 'GTFS'
+VERSION = 2
+HEADER = struct.Struct('<4sII')
+ENTRY = struct.Struct('<qQII4d')
+
+
+def store_location(location):
+    return location + '.features'
+
+
+def index_exists(location):
+    return os.path.isfile(store_location(location))
+
+
+def index_mtime(location):
+    return os.path.getmtime(store_location(location))
+
+
+class FeatureStore(object):
+    """
+    Read only mapping of feature id to feature backed by a memory mapped file
+
+    Features are decoded from WKB the first time they are accessed and
+    kept for later lookups, so opening a store does not depend on the
+    number or size of the features it contains.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self.features = {}
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            error = "File < {0} > is not a valid feature store"
+            raise ValueError(error.format(path))
+        self.table = {}
+        self.bounds = []
+        pos = HEADER.size
+        for i in range(count):
+            entry = ENTRY.unpack_from(self.mm, pos)
+            self.table[entry[0]] = entry[1:4]
+            self.bounds.append((entry[0], entry[4:]))
+            pos += ENTRY.size
+
+    def __getitem__(self, key):
+        if key in self.features:
+            return self.features[key]
+        offset, props_len, wkb_len = self.table[key]
+        feature = json.loads(self.mm[offset:offset + props_len])
+        start = offset + props_len
+        feature['geometry'] = wkb.loads(self.mm[start:start + wkb_len])
+        self.features[key] = feature
+        return feature
+
+    def __setitem__(self, key, feature):
+        raise TypeError("FeatureStore < {0} > is read only".format(self.path))
+
+    def __contains__(self, key):
+        return key in self.table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def keys(self):
+        return self.table.keys()
+
+    def close(self):
+        self.mm.close()
+
+
+def write_store(f, records):
+    """ write feature store to file `f` from sequence of (key, feature) """
+    entries = []
+    blobs = []
+    offset = HEADER.size + ENTRY.size * len(records)
+    for key, feature in records:
+        props = dict(
+            (k, v) for k, v in feature.items()
+            if k != 'geometry' and not k.startswith('_')
+        )
+        props = json.dumps(props)
+        geometry = feature['geometry']
+        geom = geometry.wkb
+        entries.append(ENTRY.pack(key, offset, len(props), len(geom), *geometry.bounds))
+        blobs.append(props)
+        blobs.append(geom)
+        offset += len(props) + len(geom)
+    f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+    for entry in entries:
+        f.write(entry)
+    for blob in blobs:
+        f.write(blob)
+
+
+def build_index(entries):
+    """
+    Bulk load an R-tree in memory from an iterable of (id, bounds, obj)
+
+    The entries are packed with Sort-Tile-Recursive loading in a single
+    pass, which is faster than inserting them one at a time and gives a
+    better balanced tree.
+
+    """
+    entries = iter(entries)
+    try:
+        first = next(entries)
+    except StopIteration:
+        # libspatialindex refuses to bulk load an empty stream
+        return index.Index()
+    return index.Index(itertools.chain([first], entries))
+
+
+def write_index(location, data_store):
+    """ persist the features of an index built in memory """
+    records = sorted(data_store.items(), key=lambda record: record[0])
+    with atomic_write(store_location(location)) as f:
+        write_store(f, records)
+
+
+def remove_index(location):
+    try:
+        os.remove(store_location(location))
+    except OSError:
+        pass
+
+
+def open_index(location):
+    """ open persisted index and return feature store and rtree index """
+    data_store = FeatureStore(store_location(location))
+    stream = ((key, bounds, None) for key, bounds in data_store.bounds)
+    return data_store, build_index(stream)
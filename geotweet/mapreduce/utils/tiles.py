@@ -0,0 +1,46 @@
+import math
+
+import Geohash
+
+
+"""
+Geohash tiles for partitioning spatial joins
+
+Points are keyed by the geohash tile containing them. Indexed features are
+also replicated into every neighbouring tile within the search distance
+(halo), so each tile can be joined on its own. Tiles must be at least twice
+as wide and high as the halo distance.
+
+precision   width   height
+4           39.1km  19.5km
+5           4.9km   4.9km
+6           1.2km   609.4m
+"""
+METERS_PER_DEGREE = 111320.0
+DEFAULT_PRECISION = 5
+
+
+def tile(point, precision=DEFAULT_PRECISION):
+    """ geohash tile of (lon, lat) point """
+    lon, lat = point
+    return Geohash.encode(lat, lon, precision=precision)
+
+
+def halo_tiles(point, distance, precision=DEFAULT_PRECISION):
+    """
+    Tiles within `distance` meters of (lon, lat) point
+
+    A tile at least 2 * `distance` wide and high that overlaps the square
+    around the point contains one of its corners, edge midpoints or center.
+
+    """
+    lon, lat = point
+    dlat = distance / METERS_PER_DEGREE
+    dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+    tiles = set()
+    for y in (lat - dlat, lat, lat + dlat):
+        y = min(max(y, -90.0), 90.0)
+        for x in (lon - dlon, lon, lon + dlon):
+            x = (x + 180.0) % 360.0 - 180.0
+            tiles.add(Geohash.encode(y, x, precision=precision))
+    return tiles
@@ -12,6 +12,11 @@ try:
     STOPWORDS_LIST = os.environ['STOPWORDS_LIST_LOCAL']
 except KeyError:
     STOPWORDS_LIST = STOPWORDS_LIST_URL
+# characters removed by WordExtractor
+NON_ASCII = ''.join(chr(i) for i in range(128, 256))
+PUNCTUATION = '#.!?,"(){}[]|'
+LEADING = '@\\/~'
+TRAILING = '\\/:~'
 
 
 class WordExtractor(FileReader):
@@ -32,8 +37,8 @@ class WordExtractor(FileReader):
                 error = "Arg src=< {0} > is invalid."
                 error += " Must be existing file or url that starts with 'http'"
                 raise ValueError(error.format(src))
-            words = self.read(src)
-            for word in words.splitlines():
+            with self.open(src) as f:
+                for word in f.read().splitlines():
                     self.stopwords[word] = ""
 
     def clean_unicode(self, line):
@@ -44,6 +49,13 @@ class WordExtractor(FileReader):
     def clean_punctuation(self, word):
         return self.sub_ends.sub('', self.sub_all.sub('', word))
 
+    def to_ascii(self, line):
+        """ lowercase line with all non-ascii characters removed """
+        line = line.lower()
+        if isinstance(line, unicode):
+            return line.encode('ascii', 'ignore')
+        return line.translate(None, NON_ASCII)
+
     def run(self, line):
         """
         Extract words from tweet
@@ -51,13 +63,26 @@ class WordExtractor(FileReader):
         1. Remove non-ascii characters
         2. Split line into individual words
         3. Clean up puncuation characters
+
+        Characters are removed with `str.translate` and `str.strip` instead
+        of regular expressions, output is the same as cleaning each word with
+        `clean_unicode` and `clean_punctuation`.
         
         """
+        stopwords = self.stopwords
         words = []
-        for word in self.clean_unicode(line.lower()).split():
+        for word in self.to_ascii(line).split():
             if word.startswith('http'):
                 continue
-            cleaned = self.clean_punctuation(word)
-            if len(cleaned) > 1 and cleaned not in self.stopwords:
+            if '&' in word:
+                word = word.replace('&amp;', '')
+            cleaned = word.translate(None, PUNCTUATION).lstrip(LEADING).rstrip(TRAILING)
+            if len(cleaned) > 1 and cleaned not in stopwords:
                 words.append(cleaned)
         return words
+
+    def run_many(self, lines):
+        """ generate list of words extracted from each line """
+        run = self.run
+        for line in lines:
+            yield run(line)
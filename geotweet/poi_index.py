@@ -0,0 +1,59 @@
+import json
+import logging
+
+from .mapreduce.utils.lookup import CachedMetroLookup
+from .mapreduce.utils.poi_index import write_poi_indexes
+
+
+METERS_PER_MILE = 1609
+METRO_DISTANCE = 50 * METERS_PER_MILE
+GEOHASH_PRECISION = 7
+BATCH_SIZE = 5000
+
+
+class POIIndexBuilder(object):
+    """
+    Build per metro area POI indexes from the output of `geotweet osm`
+
+    Each POI is assigned to a metro area with the same lookup used by the
+    POI nearby tweets job, the indexes written to the output directory are
+    read by the job with `--poi-index` to join tweets with POIs in mappers.
+
+    """
+    def __init__(self, args):
+        self.pois = args.pois
+        self.output = args.output
+
+    def run(self):
+        lookup = CachedMetroLookup(precision=GEOHASH_PRECISION)
+        metros = {}
+        for path in self.pois:
+            logging.info("Reading POI nodes from {0}".format(path))
+            batch = []
+            for record in self.read(path):
+                batch.append(record)
+                if len(batch) >= BATCH_SIZE:
+                    self.assign(lookup, batch, metros)
+                    batch = []
+            if batch:
+                self.assign(lookup, batch, metros)
+        manifest = write_poi_indexes(self.output, metros)
+        log = "Wrote POI indexes of {0} metro areas to {1}"
+        logging.info(log.format(len(manifest), self.output))
+
+    def assign(self, lookup, batch, metros):
+        """ add (lonlat, tags) records to list of their metro area """
+        names = lookup.get_many([lonlat for lonlat, tags in batch], METRO_DISTANCE)
+        for metro, record in zip(names, batch):
+            if metro:
+                metros.setdefault(metro, []).append(record)
+
+    def read(self, path):
+        """ (lonlat, tags) of each POI node in file """
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                    yield data['coordinates'], data['tags']
+                except (ValueError, KeyError):
+                    continue
@@ -0,0 +1,43 @@
+import unittest
+import os
+from os.path import dirname
+import sys
+
+root = dirname(dirname(dirname(dirname(os.path.abspath(__file__)))))
+sys.path.append(root)
+
+from geotweet.geomongo.mongo import Mongo
+
+
+DB = "geotweet_test"
+COLLECTION = "increment_test"
+KEYS = ["metro_area", "word"]
+
+
+class IncrementManyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.mongo = Mongo(db=DB, collection=COLLECTION)
+        self.mongo.collection.drop()
+
+    def tearDown(self):
+        self.mongo.collection.drop()
+
+    def doc(self, word, count):
+        return dict(metro_area="Portland, OR--WA", word=word, count=count)
+
+    def test_merge(self):
+        self.mongo.increment_many([self.doc("coffee", 3), self.doc("beer", 2)], KEYS)
+        self.mongo.increment_many([self.doc("coffee", 4), self.doc("rain", 1)], KEYS)
+        counts = dict(
+            (doc['word'], doc['count']) for doc in self.mongo.collection.find()
+        )
+        self.assertEqual(dict(coffee=7, beer=2, rain=1), counts)
+
+    def test_empty(self):
+        self.mongo.increment_many([], KEYS)
+        self.assertEqual(0, self.mongo.collection.count())
+
+
+if __name__ == "__main__":
+    unittest.main()
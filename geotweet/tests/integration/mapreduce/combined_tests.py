@@ -0,0 +1,57 @@
+import unittest
+import os
+from os.path import dirname
+import sys
+import json
+
+root = dirname(dirname(dirname(dirname(os.path.abspath(__file__)))))
+sys.path.append(root)
+
+DATA_DIR = os.path.join(root, 'data', 'geo')
+os.environ['COUNTIES_GEOJSON_LOCAL'] = os.path.join(DATA_DIR, 'us_counties102005.geojson')
+os.environ['METRO_GEOJSON_LOCAL'] = os.path.join(DATA_DIR, 'us_metro_areas102005.geojson')
+
+# local geojson environment variables must be set before import
+from geotweet.mapreduce.combined_wordcount import CombinedWordCountJob
+from geotweet.mapreduce.combined_wordcount import STATE_COUNTY, METRO
+
+
+def build_input(text, desc="My Account", lonlat=[-122.5, 45.4]):
+    return dict(
+        description=desc,
+        text=text,
+        lonlat=lonlat
+    )
+
+
+class MapperTweetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.mr = CombinedWordCountJob(['--combine-limit', '0'])
+        self.mr.mapper_init()
+
+    def run_mapper(self, tweet):
+        output = list(self.mr.mapper(None, tweet))
+        output.extend(self.mr.mapper_final() or [])
+        return dict(output)
+
+    def test_tagged_keys(self):
+        output = self.run_mapper(build_input("Foobar Foobaz foobar"))
+        tags = set(key[0] for key in output)
+        self.assertEqual(set([STATE_COUNTY, METRO]), tags)
+        self.assertEqual(2, output[(STATE_COUNTY, 'foobar')])
+        metro_keys = [key for key in output if key[0] == METRO]
+        self.assertEqual(set(['foobar', 'foobaz']), set(key[2] for key in metro_keys))
+
+    def test_hr_filter(self):
+        output = self.run_mapper(build_input("Foobar", desc="We are hiring"))
+        self.assertEqual({}, output)
+
+    def test_outside(self):
+        # middle of the pacific ocean
+        output = self.run_mapper(build_input("Foobar", lonlat=[-150.0, 30.0]))
+        self.assertEqual({}, output)
+
+
+if __name__ == "__main__":
+    unittest.main()
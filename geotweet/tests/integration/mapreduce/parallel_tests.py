@@ -0,0 +1,57 @@
+import unittest
+import os
+from os.path import dirname
+import sys
+from io import BytesIO
+
+root = dirname(dirname(dirname(dirname(os.path.abspath(__file__)))))
+sys.path.append(root)
+
+DATA_DIR = os.path.join(root, 'data', 'geo')
+os.environ['COUNTIES_GEOJSON_LOCAL'] = os.path.join(DATA_DIR, 'us_counties102005.geojson')
+os.environ['METRO_GEOJSON_LOCAL'] = os.path.join(DATA_DIR, 'us_metro_areas102005.geojson')
+TWEETS = os.path.join(root, 'data', 'mapreduce', 'twitter-test.log1000')
+
+# local geojson environment variables must be set before import
+from geotweet.mapreduce.state_county_wordcount import StateCountyWordCountJob
+from geotweet.mapreduce.metro_wordcount import MRMetroMongoWordCount
+from geotweet.mapreduce.utils.lookup import CachedMetroLookup, METRO_GEOJSON
+from geotweet.mapreduce.utils.store import index_exists
+from geotweet.mapreduce.utils.runner import ParallelRunner
+
+
+class ParallelRunnerTests(unittest.TestCase):
+
+    def run_inline(self, job_class=StateCountyWordCountJob):
+        job = job_class(['--no-conf', '-r', 'inline', TWEETS])
+        with job.make_runner() as runner:
+            runner.run()
+            return sorted(runner.stream_output())
+
+    def run_parallel(self, processes, shard_size, job_class=StateCountyWordCountJob):
+        job = job_class([])
+        runner = ParallelRunner(job, [TWEETS], processes=processes, shard_size=shard_size)
+        stdout = BytesIO()
+        counters = runner.run(stdout)
+        return sorted(stdout.getvalue().splitlines(True)), counters
+
+    def test_same_output(self):
+        expected = self.run_inline()
+        self.assertTrue(expected)
+        for processes, shard_size in [(1, 10 ** 9), (4, 50000)]:
+            output, counters = self.run_parallel(processes, shard_size)
+            self.assertEqual(expected, output)
+            self.assertIn('geotweet', counters)
+
+    def test_persisted_index(self):
+        """ workers forked after opening a persisted index query it concurrently """
+        lookup = CachedMetroLookup()
+        self.assertTrue(index_exists(lookup.get_location(METRO_GEOJSON)))
+        expected = self.run_inline(MRMetroMongoWordCount)
+        self.assertTrue(expected)
+        output, counters = self.run_parallel(4, 20000, MRMetroMongoWordCount)
+        self.assertEqual(expected, output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import os
+from os.path import dirname
+import sys
+
+import numpy as np
+
+from . import ROOT as GEOTWEET_DIR  # also adds ROOT to path to import from geotweet
+from geotweet.mapreduce.utils.lookup import SpatialLookup, SIMPLIFY_TOLERANCE
+
+
+GEO_DIR = os.path.join(GEOTWEET_DIR, 'data/geo')
+STATES_GEOJSON_LOCAL = os.path.join(GEO_DIR, 'us_states102005.geojson')
+METRO_GEOJSON_LOCAL = os.path.join(GEO_DIR, 'us_metro_areas102005.geojson')
+# Portland, OR area in ESRI:102005
+PORTLAND_BOUNDS = (-2120000, 960000, -1960000, 1090000)
+METERS_PER_MILE = 1609
+METRO_DISTANCE = 50 * METERS_PER_MILE
+
+
+def sample_grid(bounds, steps):
+    minx, miny, maxx, maxy = bounds
+    xs, ys = np.meshgrid(np.linspace(minx, maxx, steps), np.linspace(miny, maxy, steps))
+    return np.column_stack((xs.ravel(), ys.ravel()))
+
+
+class MultiResolutionTests(unittest.TestCase):
+    """ simplified predicates must return same results as full resolution """
+
+    def assert_same(self, src, bounds, steps, **kwargs):
+        exact = SpatialLookup(src=src)
+        simplified = SpatialLookup(src=src, simplify=SIMPLIFY_TOLERANCE)
+        points = sample_grid(bounds, steps)
+        for point in points:
+            expected = exact.get_object(point, **kwargs)
+            actual = simplified.get_object(point, **kwargs)
+            error = "Results differ at < {0} >: {1} != {2}"
+            self.assertEqual(expected, actual, error.format(point, expected, actual))
+        expected = exact.get_objects(points, **kwargs)
+        self.assertEqual(expected, simplified.get_objects(points, **kwargs))
+
+    def test_states(self):
+        bounds = SpatialLookup(src=STATES_GEOJSON_LOCAL).idx.bounds
+        self.assert_same(STATES_GEOJSON_LOCAL, bounds, 80)
+
+    def test_states_dense(self):
+        self.assert_same(STATES_GEOJSON_LOCAL, PORTLAND_BOUNDS, 120)
+
+    def test_metro_distance(self):
+        args = dict(buffer_size=METRO_DISTANCE)
+        self.assert_same(METRO_GEOJSON_LOCAL, PORTLAND_BOUNDS, 40, **args)
+
+    def test_metro_dense(self):
+        self.assert_same(METRO_GEOJSON_LOCAL, PORTLAND_BOUNDS, 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
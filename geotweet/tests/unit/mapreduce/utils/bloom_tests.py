@@ -0,0 +1,111 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from . import ROOT
+from geotweet.mapreduce.utils.bloom import BloomFilter, ScalableBloomFilter
+
+
+def keys(start, stop):
+    return [str(i) for i in range(start, stop)]
+
+
+class BloomFilterTests(unittest.TestCase):
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        added = sum(1 for key in keys(0, 1000) if not bloom.add(key))
+        self.assertGreater(added, 980)
+        self.assertTrue(all(key in bloom for key in keys(0, 1000)))
+        self.assertTrue(bloom.add('10'))
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(10000, error_rate=0.01)
+        for key in keys(0, 10000):
+            bloom.add(key)
+        false_positives = sum(1 for key in keys(10000, 30000) if key in bloom)
+        self.assertLess(false_positives / 20000.0, 0.02)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, BloomFilter, 0)
+        self.assertRaises(ValueError, BloomFilter, 10, error_rate=1)
+
+
+class ScalableBloomFilterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_grows(self):
+        bloom = ScalableBloomFilter(capacity=1000, error_rate=0.001)
+        added = [key for key in keys(0, 20000) if not bloom.add(key)]
+        self.assertGreater(len(bloom.stages), 1)
+        self.assertTrue(all(key in bloom for key in keys(0, 20000)))
+        # total error stays below error_rate / (1 - tightening)
+        self.assertGreater(len(added), 20000 * 0.995)
+        false_positives = sum(1 for key in keys(20000, 40000) if key in bloom)
+        self.assertLess(false_positives / 20000.0, 0.005)
+
+    def test_bounded(self):
+        bloom = ScalableBloomFilter(capacity=1000, max_capacity=4000, max_stages=3)
+        for key in keys(0, 50000):
+            bloom.add(key)
+        self.assertEqual(3, len(bloom.stages))
+        self.assertEqual(4000, bloom.stages[-1].capacity)
+        # false positives are not added
+        self.assertGreater(len(bloom) + bloom.expired, 49900)
+        # newest keys are remembered even if they were false positives of
+        # stages that expired since
+        self.assertTrue(all(key in bloom for key in keys(42000, 50000)))
+        self.assertLess(sum(1 for key in keys(0, 1000) if key in bloom), 10)
+
+    def test_save_load(self):
+        bloom = ScalableBloomFilter(capacity=1000, max_capacity=2000, max_stages=2)
+        for key in keys(0, 5000):
+            bloom.add(key)
+        path = os.path.join(self.tmp, 'ids.bloom')
+        bloom.save(path)
+        loaded = ScalableBloomFilter.load(path)
+        self.assertEqual(len(bloom), len(loaded))
+        self.assertEqual(bloom.expired, loaded.expired)
+        self.assertTrue(loaded.add('4999'))
+        self.assertFalse(loaded.add('new'))
+        # settings are kept
+        self.assertEqual(2, loaded.max_stages)
+
+    def test_save_newest_stage(self):
+        bloom = ScalableBloomFilter(capacity=1000, max_capacity=2000, max_stages=2)
+        path = os.path.join(self.tmp, 'ids.bloom')
+        for key in keys(0, 2500):
+            bloom.add(key)
+        bloom.save(path)
+        full = os.stat(path + '.0').st_ino
+        bloom.add('new')
+        bloom.save(path)
+        # full stages are not written again
+        self.assertEqual(full, os.stat(path + '.0').st_ino)
+        for key in keys(2500, 5000):
+            bloom.add(key)
+        bloom.save(path)
+        # files of expired stages are removed
+        expected = ['ids.bloom'] + ['ids.bloom.{0}'.format(number)
+            for number in range(bloom.first_stage, bloom.first_stage + 2)]
+        self.assertEqual(sorted(expected), sorted(os.listdir(self.tmp)))
+        self.assertEqual(len(bloom), len(ScalableBloomFilter.load(path)))
+
+    def test_truncated(self):
+        bloom = ScalableBloomFilter(capacity=1000)
+        bloom.add('1')
+        path = os.path.join(self.tmp, 'ids.bloom')
+        bloom.save(path)
+        with open(path + '.0', 'r+b') as f:
+            f.truncate(os.path.getsize(path + '.0') - 10)
+        self.assertRaises(ValueError, ScalableBloomFilter.load, path)
+
+
+if __name__ == "__main__":
+    unittest.main()
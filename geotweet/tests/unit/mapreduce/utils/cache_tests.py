@@ -0,0 +1,120 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+from . import ROOT
+from geotweet.mapreduce.utils.cache import LRUCache, ClockCache, SQLiteCache
+from geotweet.mapreduce.utils.cache import build_cache, MISSING
+
+
+class LRUCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = LRUCache(max_entries=2)
+
+    def test_stats(self):
+        self.assertIsNone(self.cache.get('a', None))
+        self.cache.set('a', 1)
+        self.assertEqual(1, self.cache.get('a'))
+        stats = self.cache.stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(0.5, stats['hit_rate'])
+
+    def test_cached_none(self):
+        self.cache.set('a', None)
+        self.assertIsNone(self.cache.get('a', 'missing'))
+
+    def test_evict_least_recent(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertEqual(1, self.cache.evictions)
+
+    def test_max_bytes(self):
+        cache = LRUCache(max_entries=None, max_bytes=1000)
+        for i in range(100):
+            cache.set(('geohash{0}'.format(i), 0, False), i)
+        self.assertLessEqual(cache.bytes, 1000)
+        self.assertGreater(cache.evictions, 0)
+
+
+class ClockCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ClockCache(max_entries=3)
+
+    def test_evict_unreferenced(self):
+        for key in ['a', 'b', 'c']:
+            self.cache.set(key, key)
+        self.cache.get('a')
+        self.cache.get('c')
+        self.cache.set('d', 'd')
+        self.assertEqual(3, len(self.cache))
+        self.assertNotIn('b', self.cache)
+        for key in ['a', 'c', 'd']:
+            self.assertEqual(key, self.cache.get(key))
+
+    def test_bounded(self):
+        for i in range(100):
+            self.cache.set(i, i)
+            self.cache.get(i)
+        self.assertEqual(3, len(self.cache))
+        self.assertEqual(97, self.cache.evictions)
+
+
+class BuildCacheTests(unittest.TestCase):
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            build_cache(policy='random')
+
+    def test_unbounded(self):
+        with self.assertRaises(ValueError):
+            build_cache(max_entries=None)
+
+
+class SQLiteCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'cache.db')
+        self.key = ('c20fbr3', 80450, False)
+        self.payload = {u'NAME10': u'Portland, OR--WA'}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_shared(self):
+        writer = SQLiteCache(self.path, 'metro')
+        reader = SQLiteCache(self.path, 'metro')
+        writer.set(self.key, self.payload)
+        self.assertEqual(self.payload, writer.get(self.key))
+        self.assertIs(MISSING, reader.get(self.key))
+        writer.flush()
+        self.assertEqual(self.payload, reader.get(self.key))
+        writer.close()
+        reader.close()
+
+    def test_cached_none(self):
+        cache = SQLiteCache(self.path, 'metro', batch_size=1)
+        cache.set(self.key, None)
+        self.assertIsNone(cache.get(self.key))
+        cache.close()
+
+    def test_namespace(self):
+        metro = SQLiteCache(self.path, 'metro', batch_size=1)
+        county = SQLiteCache(self.path, 'county')
+        metro.set(self.key, self.payload)
+        self.assertIs(MISSING, county.get(self.key))
+        metro.close()
+        county.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from StringIO import StringIO
+
+import Geohash
+
+from . import ROOT
+from geotweet.mapreduce.utils.columnar import Chunk, ColumnarValueProtocol, MAGIC
+from geotweet.mapreduce.utils.columnar import encode_chunk, expand_chunks, write_chunks
+
+
+TWEETS = [
+    dict(
+        user_id=14, tweet_id='1001', text=u'Coffee at Caf\xe9 \U0001f600',
+        description=None, lonlat=[-122.6793, 45.5191], followers_count=10
+    ),
+    dict(
+        user_id=2 ** 40, tweet_id='1002', text=u'Hiring now', description=u'jobs',
+        lonlat=[-73.9857, 40.7484], followers_count=0
+    ),
+    # missing fields and a value of mixed type
+    dict(user_id=7, tweet_id='1003', text=u'', lonlat=None, followers_count=u'n/a'),
+]
+
+
+class EncodeChunkTests(unittest.TestCase):
+
+    def setUp(self):
+        self.line = encode_chunk(TWEETS)
+        self.chunk = Chunk(self.line)
+
+    def test_single_line(self):
+        self.assertTrue(self.line.startswith(MAGIC))
+        self.assertNotIn('\n', self.line)
+
+    def test_columns(self):
+        kinds = dict((name, kind) for name, (kind, _, _) in self.chunk.columns.items())
+        self.assertEqual('float', kinds['lon'])
+        self.assertEqual('int', kinds['user_id'])
+        self.assertEqual('str', kinds['text'])
+        self.assertEqual('ascii', kinds['geohash'])
+        self.assertEqual('json', kinds['followers_count'])
+
+    def test_round_trip(self):
+        records = list(self.chunk.records())
+        self.assertEqual(3, len(records))
+        for tweet, record in zip(TWEETS, records):
+            for name in ['user_id', 'tweet_id', 'text', 'lonlat', 'followers_count']:
+                self.assertEqual(tweet[name], record[name])
+            self.assertEqual(tweet.get('description'), record['description'])
+
+    def test_geohash(self):
+        geohash = self.chunk.column('geohash')
+        self.assertEqual(Geohash.encode(45.5191, -122.6793, precision=8), geohash[0])
+        self.assertIsNone(geohash[2])
+
+    def test_projection(self):
+        records = list(self.chunk.records(['lonlat', 'text']))
+        self.assertEqual(set(['lonlat', 'text']), set(records[0].keys()))
+        # unknown columns are null
+        self.assertEqual([None] * 3, self.chunk.column('source'))
+
+    def test_write_chunks(self):
+        f = StringIO()
+        self.assertEqual(3, write_chunks(iter(TWEETS), f, chunk_size=2))
+        lines = f.getvalue().splitlines()
+        self.assertEqual([2, 1], [len(Chunk(line)) for line in lines])
+
+
+class ProtocolTests(unittest.TestCase):
+
+    def test_read(self):
+        protocol = ColumnarValueProtocol()
+        key, value = protocol.read(encode_chunk(TWEETS))
+        self.assertIsInstance(value, Chunk)
+        key, value = protocol.read('{"tags": {"name": "Cafe"}}')
+        self.assertEqual(dict(tags=dict(name='Cafe')), value)
+
+
+class ExpandChunksTests(unittest.TestCase):
+
+    class Job(object):
+
+        @expand_chunks(['text'])
+        def mapper(self, key, data):
+            yield data.get('text'), sorted(data.keys())
+
+    def test_expand(self):
+        output = list(self.Job().mapper(None, Chunk(encode_chunk(TWEETS[:2]))))
+        self.assertEqual([(u'Coffee at Caf\xe9 \U0001f600', ['text']),
+            (u'Hiring now', ['text'])], output)
+
+    def test_pass_through(self):
+        output = list(self.Job().mapper(None, dict(text=u'word', source=u'web')))
+        self.assertEqual([(u'word', ['source', 'text'])], output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import os
+import sys
+
+from . import ROOT
+from geotweet.mapreduce.utils.combine import PartialCounts
+
+
+class PartialCountsTests(unittest.TestCase):
+
+    def test_counts(self):
+        counts = PartialCounts(limit=10)
+        for word in ['a', 'b', 'a', 'a']:
+            counts.add(word)
+        self.assertFalse(counts.full())
+        self.assertEqual(dict(a=3, b=1), dict(counts.flush()))
+        self.assertEqual(0, len(counts))
+        self.assertEqual(4, counts.added)
+        self.assertEqual(2, counts.emitted)
+        self.assertEqual(2.0, counts.ratio())
+
+    def test_full(self):
+        counts = PartialCounts(limit=2)
+        counts.add(('a', 'b'))
+        counts.add(('a', 'b'))
+        self.assertFalse(counts.full())
+        counts.add(('a', 'c'))
+        self.assertTrue(counts.full())
+
+    def test_no_limit(self):
+        counts = PartialCounts(limit=0)
+        self.assertFalse(counts.full())
+        counts.add('a')
+        self.assertTrue(counts.full())
+
+    def test_total(self):
+        """ flushing at any limit keeps the total count of each key """
+        words = [str(i % 7) for i in range(100)]
+        for limit in [0, 1, 3, 100]:
+            counts = PartialCounts(limit=limit)
+            totals = {}
+            for word in words:
+                counts.add(word)
+                if counts.full():
+                    for key, count in counts.flush():
+                        totals[key] = totals.get(key, 0) + count
+            for key, count in counts.flush():
+                totals[key] = totals.get(key, 0) + count
+            self.assertEqual(100, sum(totals.values()))
+            self.assertEqual(100, counts.added)
+
+    def test_empty_ratio(self):
+        self.assertEqual(0.0, PartialCounts().ratio())
+
+
+if __name__ == "__main__":
+    unittest.main()
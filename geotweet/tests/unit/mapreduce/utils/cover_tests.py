@@ -0,0 +1,73 @@
+import unittest
+import os
+from os.path import dirname
+import sys
+import json
+import tempfile
+
+import Geohash
+
+from . import ROOT
+from geotweet.mapreduce.utils.lookup import project, rproject, SpatialLookup
+from geotweet.mapreduce.utils.cover import build_cover, read_cover, write_cover
+
+
+testdata = os.path.join(dirname(os.path.abspath(__file__)), 'testdata')
+def read(geojson):
+    return json.loads(open(os.path.join(testdata, geojson), 'r').read())
+
+
+POLYGON_1 = read('polygon_102500_1.geojson')
+POLYGON_2 = read('polygon_102500_2.geojson')
+PRECISION = 6
+
+
+def init_index():
+    location = SpatialLookup()
+    for key, polygon in enumerate([POLYGON_1, POLYGON_2]):
+        location.insert(key, polygon)
+    return location
+
+
+class GeohashCoverTests(unittest.TestCase):
+
+    def setUp(self):
+        self.location = init_index()
+        self.location.cover_precision = PRECISION
+        self.location.cover = build_cover(self.location, max_precision=PRECISION)
+
+    def test_not_empty(self):
+        self.assertTrue(self.location.cover, "Expected cells inside polygons")
+
+    def test_matches_exact(self):
+        minx, miny, maxx, maxy = self.location.idx.bounds
+        west, south = rproject((minx, miny))
+        east, north = rproject((maxx, maxy))
+        covered = 0
+        for i in range(-5, 46):
+            for j in range(-5, 46):
+                lon = west + (east - west) * i / 40.0
+                lat = south + (north - south) * j / 40.0
+                geohash = Geohash.encode(lat, lon, precision=7)
+                found = self.location.get_covered(geohash)
+                if found is None:
+                    continue
+                covered += 1
+                lat, lon = Geohash.decode(geohash)
+                point = project([float(lon), float(lat)])
+                self.assertEqual(self.location.get_object(point), found)
+        self.assertGreater(covered, 0)
+
+    def test_persist(self):
+        path = tempfile.mktemp()
+        try:
+            write_cover(path, self.location.cover, PRECISION)
+            self.assertEqual(self.location.cover, read_cover(path, PRECISION))
+            error = "Cover built with different precision should not be used"
+            self.assertIsNone(read_cover(path, PRECISION - 1), error)
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from . import ROOT
+from geotweet.mapreduce.utils.columnar import Chunk, encode_chunk
+from geotweet.mapreduce.utils.dedup import DuplicateRule, ExactDedup, DUPLICATE
+
+
+TWEETS = [
+    dict(tweet_id='1', text=u'first', source=u'web'),
+    dict(tweet_id='2', text=u'second', source=u'web'),
+    dict(tweet_id='1', text=u'first', source=u'web'),
+]
+POI = dict(coordinates=[-122.68, 45.52], tags=dict(name=u'Cafe'))
+
+
+class FakeJob(object):
+
+    def __init__(self):
+        self.counters = {}
+
+    def increment_counter(self, group, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+
+class DuplicateRuleTests(unittest.TestCase):
+
+    def test_rejects(self):
+        rule = DuplicateRule()
+        self.assertEqual([False, False, True], [rule.rejects(t) for t in TWEETS])
+        # records without a tweet id are never duplicates
+        self.assertFalse(rule.rejects(POI))
+        self.assertFalse(rule.rejects(POI))
+
+
+class ExactDedupTests(unittest.TestCase):
+
+    def setUp(self):
+        self.job = FakeJob()
+        self.dedup = ExactDedup(self.job, ['text'])
+
+    def shuffle(self, records):
+        """ group mapper output by key like the shuffle """
+        groups = {}
+        for key, value in records:
+            groups.setdefault(repr(key), (key, []))[1].append(value)
+        return [groups[name] for name in sorted(groups)]
+
+    def test_exact(self):
+        mapped = list(self.dedup.mapper(None, Chunk(encode_chunk(TWEETS))))
+        mapped += list(self.dedup.mapper(None, POI))
+        output = [
+            value for key, values in self.shuffle(mapped)
+            for _, value in self.dedup.reducer(key, iter(values))
+        ]
+        self.assertEqual(3, len(output))
+        self.assertIn(POI, output)
+        # only projected columns and tweet id of tweets are passed on
+        self.assertIn(dict(tweet_id='2', text=u'second'), output)
+        self.assertEqual({DUPLICATE: 1}, self.job.counters)
+
+
+if __name__ == "__main__":
+    unittest.main()
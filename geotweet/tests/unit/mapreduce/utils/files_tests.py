@@ -0,0 +1,60 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from . import ROOT
+from geotweet.mapreduce.utils.files import atomic_write, file_lock
+
+
+class AtomicWriteTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'data')
+        with open(self.path, 'w') as f:
+            f.write('old')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def read(self):
+        with open(self.path, 'r') as f:
+            return f.read()
+
+    def test_replace(self):
+        with atomic_write(self.path, 'w') as f:
+            f.write('new')
+            self.assertEqual('old', self.read())
+        self.assertEqual('new', self.read())
+        self.assertEqual(['data'], os.listdir(self.tmp))
+
+    def test_failure(self):
+        with self.assertRaises(RuntimeError):
+            with atomic_write(self.path, 'w') as f:
+                f.write('partial')
+                raise RuntimeError()
+        self.assertEqual('old', self.read())
+        self.assertEqual(['data'], os.listdir(self.tmp))
+
+
+class FileLockTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'data')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_reentrant(self):
+        with file_lock(self.path):
+            with file_lock(self.path):
+                self.assertTrue(os.path.isfile(self.path + '.lock'))
+        # released lock can be taken again
+        with file_lock(self.path):
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import sys
+import re
+
+from . import ROOT
+from geotweet.mapreduce.utils.filters import Rule, TweetFilter, hr_rule, source_rule
+
+
+SOURCE = '<a href="http://{0}" rel="nofollow">Client</a>'
+
+
+class FakeJob(object):
+
+    def __init__(self):
+        self.counters = {}
+
+    def increment_counter(self, group, counter, amount=1):
+        key = (group, counter)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+
+class RuleTests(unittest.TestCase):
+
+    def test_hr(self):
+        rule = hr_rule()
+        self.assertTrue(rule.rejects(dict(description="Now hiring in Portland")))
+        self.assertTrue(rule.rejects(dict(description="#jobs #career")))
+        self.assertFalse(rule.rejects(dict(description="Coffee and bikes")))
+        self.assertFalse(rule.rejects(dict(description=None)))
+        self.assertFalse(rule.rejects(dict()))
+
+    def test_hr_same_as_regex(self):
+        """ rule matches the same descriptions as the previous inline filter """
+        expr = "|".join(["(job)", "(hiring)", "(career)"])
+        rule = hr_rule()
+        for text in ["Job", "jobs", "HIRING", "careers", "a job", "nothing", "hir ing"]:
+            expected = bool(re.findall(expr, text))
+            self.assertEqual(expected, rule.rejects(dict(description=text)))
+
+    def test_source(self):
+        rule = source_rule()
+        self.assertFalse(rule.rejects(dict(source=SOURCE.format('instagram.com'))))
+        self.assertTrue(rule.rejects(dict(source=SOURCE.format('weather.example.com'))))
+        # dots are matched literally
+        self.assertTrue(rule.rejects(dict(source=SOURCE.format('twitterxcom'))))
+        self.assertTrue(rule.rejects(dict(source=None)))
+
+    def test_regex(self):
+        rule = Rule('digits', 'text', [r'\d{3}'], regex=True)
+        self.assertTrue(rule.rejects(dict(text="call 555")))
+        self.assertFalse(rule.rejects(dict(text="call 55")))
+
+    def test_no_patterns(self):
+        with self.assertRaises(ValueError):
+            Rule('empty', 'text', [])
+
+
+class TweetFilterTests(unittest.TestCase):
+
+    def test_counters(self):
+        tweet_filter = TweetFilter([hr_rule(), source_rule()])
+        tweets = [
+            dict(description="hiring", source=SOURCE.format('weather.com')),
+            dict(description="", source=SOURCE.format('weather.com')),
+            dict(description="", source=SOURCE.format('twitter.com')),
+        ]
+        results = [tweet_filter.rejects(tweet) for tweet in tweets]
+        self.assertEqual([True, True, False], results)
+        job = FakeJob()
+        tweet_filter.report(job)
+        self.assertEqual({
+            ('geotweet filter', 'hr description'): 1,
+            ('geotweet filter', 'source domain'): 1
+        }, job.counters)
+        # counts are reset after reporting
+        tweet_filter.report(job)
+        self.assertEqual(2, sum(job.counters.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import unittest
+import os
+import sys
+import json
+from StringIO import StringIO
+
+from . import ROOT
+from geotweet.mapreduce.utils.geojson import iter_features
+
+
+STATES = os.path.join(ROOT, 'geotweet/data/geo/us_states102005.geojson')
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata')
+
+
+def collection(features, **members):
+    data = dict(type='FeatureCollection', features=features)
+    data.update(members)
+    return json.dumps(data, indent=1)
+
+
+class IterFeaturesTests(unittest.TestCase):
+
+    def assert_features(self, text, chunk_sizes=(1, 7, 64, 65536), **kwargs):
+        expected = json.loads(text.decode(kwargs.get('encoding', 'utf-8')))
+        for chunk_size in chunk_sizes:
+            actual = list(iter_features(StringIO(text), chunk_size=chunk_size, **kwargs))
+            self.assertEqual(expected['features'], actual)
+
+    def test_states(self):
+        with open(STATES, 'rb') as f:
+            text = f.read()
+        self.assert_features(text, chunk_sizes=(1000, 65536))
+
+    def test_testdata(self):
+        features = []
+        for name in sorted(os.listdir(TESTDATA)):
+            with open(os.path.join(TESTDATA, name), 'r') as f:
+                features.append(json.load(f))
+        self.assert_features(collection(features))
+
+    def test_members(self):
+        features = [dict(type='Feature', properties=dict(id=i), geometry=None)
+            for i in range(5)]
+        text = collection(features, crs=dict(type='name'), count=123456789, bbox=[1.5, 2])
+        self.assert_features(text)
+
+    def test_empty(self):
+        self.assert_features(collection([]))
+        self.assertEqual([], list(iter_features(StringIO('{}'))))
+
+    def test_encoding(self):
+        features = [dict(properties=dict(name=u'Caf\xe9'))]
+        text = json.dumps(dict(features=features), ensure_ascii=False)
+        self.assert_features(text.encode('utf-8'))
+        self.assert_features(text.encode('latin-1'), encoding='latin-1')
+
+    def test_invalid(self):
+        for text in ['', '[]', '{"features": [{"a": 1}', '{"features": [1 2]}']:
+            with self.assertRaises(ValueError):
+                list(iter_features(StringIO(text), chunk_size=4))
+
+
+if __name__ == "__main__":
+    unittest.main()
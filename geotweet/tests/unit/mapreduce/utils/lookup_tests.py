@@ -120,5 +120,71 @@ class GetObjectOrder(unittest.TestCase):
         self.assertEqual('polygon1', found['id'], error.format(found['id']))
    
 
+class GetObjectsBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.location = init_polygon_2_index()
+        # grid of points covering both polygons and the area around them
+        minx, miny, maxx, maxy = self.location.idx.bounds
+        self.points = [
+            (minx + (maxx - minx) * i / 20.0, miny + (maxy - miny) * j / 20.0)
+            for i in range(-5, 26) for j in range(-5, 26)
+        ]
+        self.points.append(project(POINT_WITHIN['geometry']['coordinates']))
+
+    def assert_same(self, **kwargs):
+        expected = [self.location.get_object(p, **kwargs) for p in self.points]
+        actual = self.location.get_objects(self.points, **kwargs)
+        self.assertEqual(expected, actual)
+
+    def test_nearest(self):
+        self.assert_same()
+
+    def test_multiple(self):
+        self.assert_same(multiple=True)
+
+    def test_buffer(self):
+        self.assert_same(buffer_size=4000)
+
+    def test_empty(self):
+        self.assertEqual([], self.location.get_objects([]))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.location.get_objects([[1, 2, 3]])
+
+
+class BulkLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.expected = init_polygon_2_index()
+        self.location = SpatialLookup()
+        features = [
+            (1, read('polygon_102500_1.geojson')),
+            (2, read('polygon_102500_2.geojson'))
+        ]
+        self.location.load(iter(features))
+        minx, miny, maxx, maxy = self.expected.idx.bounds
+        self.points = [
+            (minx + (maxx - minx) * i / 10.0, miny + (maxy - miny) * j / 10.0)
+            for i in range(-2, 13) for j in range(-2, 13)
+        ]
+
+    def test_same_as_insert(self):
+        for kwargs in [dict(), dict(multiple=True), dict(buffer_size=4000)]:
+            expected = [self.expected.get_object(p, **kwargs) for p in self.points]
+            actual = [self.location.get_object(p, **kwargs) for p in self.points]
+            self.assertEqual(expected, actual)
+
+    def test_bounds(self):
+        self.assertEqual(self.expected.idx.bounds, self.location.idx.bounds)
+        self.assertEqual([1, 2], sorted(self.location.data_store.keys()))
+
+    def test_empty(self):
+        self.location.load([])
+        self.assertEqual({}, self.location.data_store)
+        self.assertIsNone(self.location.get_object(self.points[0]))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+
+from . import ROOT
+from geotweet.mapreduce.utils.manifest import Manifest
+
+
+class ManifestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'manifest.json')
+        self.logs = []
+        for name in ['twitter-stream.log.1', 'twitter-stream.log.2']:
+            log = os.path.join(self.tmp, name)
+            with open(log, 'w') as f:
+                f.write('{}\n')
+            self.logs.append(log)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_pending(self):
+        manifest = Manifest(self.path)
+        self.assertEqual(self.logs, manifest.pending('metro-words', self.logs))
+        manifest.mark('metro-words', self.logs[:1])
+        self.assertEqual(self.logs[1:], manifest.pending('metro-words', self.logs))
+        # other jobs keep their own inputs
+        self.assertEqual(self.logs, manifest.pending('poi-nearby', self.logs))
+
+    def test_changed(self):
+        manifest = Manifest(self.path)
+        manifest.mark('metro-words', self.logs)
+        self.assertEqual([], manifest.changed('metro-words', self.logs))
+        with open(self.logs[1], 'a') as f:
+            f.write('{}\n')
+        self.assertEqual(self.logs[1:], manifest.changed('metro-words', self.logs))
+        self.assertEqual([], manifest.pending('metro-words', self.logs))
+
+    def test_interrupted(self):
+        manifest = Manifest(self.path)
+        manifest.start('metro-words', self.logs)
+        self.assertEqual(sorted(self.logs), manifest.interrupted('metro-words'))
+        self.assertEqual(self.logs, manifest.pending('metro-words', self.logs))
+        manifest.mark('metro-words', self.logs[:1])
+        self.assertEqual(self.logs[1:], manifest.interrupted('metro-words'))
+        self.assertEqual([], manifest.interrupted('poi-nearby'))
+
+    def test_save(self):
+        manifest = Manifest(self.path)
+        manifest.mark('metro-words', self.logs)
+        self.assertFalse(os.path.exists(self.path))
+        manifest.save()
+        reopened = Manifest(self.path)
+        self.assertEqual([], reopened.pending('metro-words', self.logs))
+        processed = reopened.processed('metro-words')[self.logs[0]]
+        self.assertEqual(3, processed['size'])
+        self.assertEqual(['manifest.json'], [
+            name for name in os.listdir(self.tmp) if name.startswith('manifest')
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
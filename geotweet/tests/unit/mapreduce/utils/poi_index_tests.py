@@ -0,0 +1,62 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from . import ROOT
+from geotweet.mapreduce.utils.poi_index import POIIndex, MANIFEST
+from geotweet.mapreduce.utils.poi_index import poi_name, write_poi_indexes
+
+
+PORTLAND = u'Portland, OR--WA'
+SALEM = u'Salem, OR'
+# two cafes about 50m apart in downtown Portland
+CAFE = ([-122.6793, 45.5191], dict(amenity='cafe', name='Cafe'))
+BAKERY = ([-122.6787, 45.5193], dict(shop='bakery', name=u'Boulangerie Caf\xe9'))
+# POIs without a name or without one of the POI tags are not indexed
+UNNAMED = ([-122.6790, 45.5192], dict(amenity='bench'))
+HIGHWAY = ([-122.6790, 45.5192], dict(highway='bus_stop', name='Stop'))
+
+
+class POINameTests(unittest.TestCase):
+
+    def test_poi_name(self):
+        self.assertEqual('Cafe', poi_name(CAFE[1]))
+        self.assertIsNone(poi_name(UNNAMED[1]))
+        self.assertIsNone(poi_name(HIGHWAY[1]))
+
+
+class POIIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.manifest = write_poi_indexes(self.tmp, {
+            PORTLAND: [CAFE, BAKERY, UNNAMED, HIGHWAY],
+            SALEM: [UNNAMED]
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_manifest(self):
+        self.assertEqual([PORTLAND], list(self.manifest.keys()))
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp, MANIFEST)))
+
+    def test_lookup(self):
+        index = POIIndex(self.tmp)
+        lookup = index.get(PORTLAND)
+        self.assertEqual(2, len(lookup.data_store))
+        pois = lookup.get([-122.6790, 45.5192], buffer_size=100, multiple=True)
+        names = set(poi['tags']['name'] for poi in pois)
+        self.assertEqual(set(['Cafe', u'Boulangerie Caf\xe9']), names)
+        # opened once per metro area
+        self.assertIs(lookup, index.get(PORTLAND))
+
+    def test_missing_metro(self):
+        index = POIIndex(self.tmp)
+        self.assertIsNone(index.get(SALEM))
+        self.assertIsNone(index.get(u'Nowhere'))
+
+
+if __name__ == "__main__":
+    unittest.main()
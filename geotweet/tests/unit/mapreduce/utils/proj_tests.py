@@ -0,0 +1,55 @@
+import unittest
+import os
+import sys
+
+import numpy as np
+from pyproj import transform
+
+from . import ROOT
+from geotweet.mapreduce.utils.proj import project, rproject, project_many, \
+    rproject_many, transform_many, proj4326, proj102005
+
+
+PORTLAND = (-122.5, 45.5)
+TOLERANCE = 0.001   # meters
+
+
+def grid():
+    lons, lats = np.meshgrid(np.linspace(-170, -60, 45), np.linspace(18, 71, 30))
+    return np.column_stack((lons.ravel(), lats.ravel()))
+
+
+class ProjectTests(unittest.TestCase):
+
+    def test_scalar(self):
+        expected = transform(proj4326, proj102005, *PORTLAND)
+        actual = project(PORTLAND)
+        for e, a in zip(expected, actual):
+            self.assertAlmostEqual(e, a, delta=TOLERANCE)
+
+    def test_scalar_inverse(self):
+        actual = rproject(project(PORTLAND))
+        for e, a in zip(PORTLAND, actual):
+            self.assertAlmostEqual(e, a, places=7)
+
+    def test_many(self):
+        lonlats = grid()
+        expected = transform_many(lonlats)
+        actual = project_many(lonlats)
+        self.assertLess(np.abs(expected - actual).max(), TOLERANCE)
+
+    def test_many_inverse(self):
+        lonlats = grid()
+        actual = rproject_many(project_many(lonlats))
+        self.assertLess(np.abs(lonlats - actual).max(), 1e-7)
+
+    def test_many_empty(self):
+        self.assertEqual((0, 2), project_many([]).shape)
+
+    def test_many_invalid(self):
+        with self.assertRaises(ValueError):
+            project_many([[1, 2, 3]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import os
+import sys
+
+from mrjob.protocol import JSONProtocol
+
+from . import ROOT
+from geotweet.mapreduce.utils.protocol import UJSONProtocol, build_protocol
+
+
+RECORDS = [
+    ((u'Portland, OR', u'coffee'), 1),
+    ((u'word', u'Oregon', u'Multnomah'), 12),
+    (u'Portland, OR', [1, [-122.86660999999991, 45.49233310000002], {u'name': u'Caf\xe9'}]),
+    ((u'Portland, OR', (u'nested', 1)), None),
+]
+
+
+class UJSONProtocolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = UJSONProtocol()
+
+    def test_roundtrip(self):
+        for key, value in RECORDS:
+            line = self.protocol.write(key, value)
+            self.assertEqual((key, value), self.protocol.read(line))
+
+    def test_tuple_keys(self):
+        key, value = self.protocol.read(self.protocol.write(RECORDS[3][0], 1))
+        self.assertIsInstance(key, tuple)
+        self.assertIsInstance(key[1], tuple)
+
+    def test_json_compatible(self):
+        json_protocol = JSONProtocol()
+        for key, value in RECORDS:
+            expected = json_protocol.read(json_protocol.write(key, value))
+            self.assertEqual(expected, json_protocol.read(self.protocol.write(key, value)))
+            self.assertEqual((key, value), self.protocol.read(json_protocol.write(key, value)))
+
+    def test_cached_key(self):
+        first = self.protocol.read(self.protocol.write((u'a', u'b'), 1))[0]
+        second = self.protocol.read(self.protocol.write((u'a', u'b'), 2))[0]
+        self.assertIs(first, second)
+
+
+class BuildProtocolTests(unittest.TestCase):
+
+    def test_build(self):
+        self.assertIsInstance(build_protocol('ujson'), UJSONProtocol)
+        self.assertIsInstance(build_protocol('json'), JSONProtocol)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            build_protocol('xml')
+
+
+if __name__ == "__main__":
+    unittest.main()
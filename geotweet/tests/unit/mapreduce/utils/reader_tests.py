@@ -0,0 +1,116 @@
+import unittest
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+from StringIO import StringIO
+from mimetools import Message
+
+from . import ROOT
+from geotweet.mapreduce.utils import reader
+from geotweet.mapreduce.utils.reader import FileReader
+
+
+URL = 'http://example.com/file.txt'
+DATA = 'caf\xe9\n' * 1000
+
+
+class FakeResponse(StringIO):
+
+    def __init__(self, data, headers):
+        StringIO.__init__(self, data)
+        self.headers = headers
+
+    def info(self):
+        header = ''.join("{0}: {1}\r\n".format(k, v) for k, v in self.headers.items())
+        return Message(StringIO(header))
+
+
+class FileReaderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache_dir = reader.CACHE_DIR
+        self.urlopen = reader.urllib2.urlopen
+        reader.CACHE_DIR = self.tmp
+        self.src = os.path.join(self.tmp, 'src.txt')
+        with open(self.src, 'wb') as f:
+            f.write(DATA)
+        self.fr = FileReader()
+
+    def tearDown(self):
+        reader.CACHE_DIR = self.cache_dir
+        reader.urllib2.urlopen = self.urlopen
+        shutil.rmtree(self.tmp)
+
+    def serve(self, data, **headers):
+        reader.urllib2.urlopen = lambda src: FakeResponse(data, headers)
+
+    def test_local(self):
+        expected = DATA.decode('latin-1').encode('utf-8')
+        self.assertEqual(expected, self.fr.read(self.src))
+        location = self.fr.fetch(self.src)
+        self.assertEqual(self.fr.get_location(self.src), location)
+        with self.fr.open(self.src) as f:
+            self.assertEqual(expected, f.read())
+        mm = self.fr.mmap(self.src)
+        self.assertEqual(expected, mm[:])
+        mm.close()
+
+    def test_local_modified(self):
+        self.fr.fetch(self.src)
+        location = self.fr.get_location(self.src)
+        os.utime(location, (0, 0))
+        with open(self.src, 'wb') as f:
+            f.write('updated')
+        self.assertEqual('updated', self.fr.read(self.src))
+
+    def test_remote(self):
+        self.serve(DATA, **{
+            'Content-Length': len(DATA),
+            'ETag': '"{0}"'.format(hashlib.md5(DATA).hexdigest())
+        })
+        self.assertEqual(DATA.decode('latin-1').encode('utf-8'), self.fr.read(URL))
+        # cached copy is used once downloaded
+        self.serve('')
+        self.assertEqual(DATA.decode('latin-1').encode('utf-8'), self.fr.read(URL))
+
+    def test_version(self):
+        version = self.fr.version(self.src)
+        self.assertEqual(version, self.fr.version(self.src))
+        with open(self.src, 'ab') as f:
+            f.write('more')
+        self.assertNotEqual(version, self.fr.version(self.src))
+        etag = hashlib.md5(DATA).hexdigest()
+        self.serve(DATA, ETag='"{0}"'.format(etag))
+        version = self.fr.version(URL)
+        self.fr.fetch(URL)
+        self.assertNotEqual(version, self.fr.version(URL))
+
+    def test_remote_incomplete(self):
+        self.serve(DATA[:100], **{'Content-Length': len(DATA)})
+        with self.assertRaises(IOError):
+            self.fr.read(URL)
+        self.assert_clean()
+
+    def test_remote_corrupt(self):
+        self.serve(DATA, ETag='"{0}"'.format(hashlib.md5('other').hexdigest()))
+        with self.assertRaises(IOError):
+            self.fr.read(URL)
+        self.assert_clean()
+
+    def assert_clean(self):
+        """ failed download leaves no cached or temporary files """
+        location = self.fr.get_location(URL)
+        self.assertFalse(os.path.exists(location))
+        names = [name for name in os.listdir(self.tmp) if '-tmp' in name]
+        self.assertEqual([], names)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.fr.read(os.path.join(self.tmp, 'missing.txt'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import os
+import gzip
+import shutil
+import tempfile
+
+from . import ROOT
+from geotweet.mapreduce.utils.runner import shard_inputs, read_shard
+
+
+class ShardTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.lines = ['{0}\n'.format('x' * (i % 7)) for i in range(200)]
+        self.path = os.path.join(self.tmp, 'input.log')
+        with open(self.path, 'wb') as f:
+            f.writelines(self.lines)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def read_all(self, shards):
+        lines = []
+        for shard in shards:
+            lines.extend(read_shard(*shard))
+        return lines
+
+    def test_every_line_once(self):
+        """ lines crossing shard boundaries are read by exactly one shard """
+        for shard_size in [1, 3, 8, 50, 10 ** 6]:
+            shards = shard_inputs([self.path], shard_size)
+            self.assertEqual(self.lines, self.read_all(shards))
+
+    def test_shard_size(self):
+        size = os.path.getsize(self.path)
+        shards = shard_inputs([self.path], 100)
+        self.assertEqual((size + 99) // 100, len(shards))
+        self.assertEqual(size, shards[-1][2])
+
+    def test_no_trailing_newline(self):
+        with open(self.path, 'ab') as f:
+            f.write('last')
+        shards = shard_inputs([self.path], 10)
+        self.assertEqual(self.lines + ['last'], self.read_all(shards))
+
+    def test_gzip(self):
+        path = os.path.join(self.tmp, 'input.log.gz')
+        with gzip.open(path, 'wb') as f:
+            f.writelines(self.lines)
+        shards = shard_inputs([path], 10)
+        self.assertEqual([(path, 0, None)], shards)
+        self.assertEqual(self.lines, self.read_all(shards))
+
+
+if __name__ == "__main__":
+    unittest.main()
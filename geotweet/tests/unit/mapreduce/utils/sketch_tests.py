@@ -0,0 +1,166 @@
+import unittest
+import math
+import random
+from collections import Counter
+
+from . import ROOT
+from geotweet.mapreduce.utils.sketch import TopK, SpaceSaving, top
+from geotweet.mapreduce.utils.sketch import CountMinSketch, FrequentKeys
+
+
+def build_stream(seed=0):
+    """ skewed stream of words where word `i` occurs about 1 / i as often """
+    rand = random.Random(seed)
+    words = ['word{0}'.format(i) for i in range(1, 500)]
+    weights = [1.0 / i for i in range(1, 500)]
+    total = sum(weights)
+    stream = []
+    for _ in range(20000):
+        x = rand.random() * total
+        for word, weight in zip(words, weights):
+            x -= weight
+            if x <= 0:
+                break
+        stream.append(word)
+    return stream
+
+
+class TopKTests(unittest.TestCase):
+
+    def test_same_as_sorted(self):
+        rand = random.Random(1)
+        pairs = [(rand.randint(0, 100), 'item{0}'.format(i)) for i in range(1000)]
+        heap = TopK(10)
+        for count, item in pairs:
+            heap.add(count, item)
+        self.assertEqual(sorted(pairs, reverse=True)[:10], heap.items())
+
+    def test_fewer_than_k(self):
+        heap = TopK(5)
+        heap.add(1, 'a')
+        heap.add(3, 'b')
+        self.assertEqual([(3, 'b'), (1, 'a')], heap.items())
+
+    def test_invalid_k(self):
+        with self.assertRaises(ValueError):
+            TopK(0)
+
+
+class SpaceSavingTests(unittest.TestCase):
+
+    def test_exact_with_capacity(self):
+        stream = build_stream()
+        sketch = SpaceSaving(capacity=500)
+        for word in stream:
+            sketch.add(word)
+        counts = Counter(stream)
+        for word, count, error in sketch.items():
+            self.assertEqual(counts[word], count)
+            self.assertEqual(0, error)
+        self.assertEqual(len(counts), len(sketch))
+
+    def test_bounds(self):
+        stream = build_stream()
+        capacity = 50
+        sketch = SpaceSaving(capacity=capacity)
+        for word in stream:
+            sketch.add(word)
+        counts = Counter(stream)
+        self.assertEqual(capacity, len(sketch))
+        self.assertEqual(len(stream), sketch.total)
+        for word, count, error in sketch.items():
+            self.assertTrue(count - error <= counts[word] <= count)
+        # every word occurring more than N / capacity times is monitored
+        monitored = set(word for word, count, error in sketch.items())
+        for word, count in counts.items():
+            if count > len(stream) / capacity:
+                self.assertIn(word, monitored)
+
+    def test_weighted(self):
+        sketch = SpaceSaving(capacity=2)
+        sketch.add('a', 5)
+        sketch.add('b', 2)
+        sketch.add('c', 1)
+        self.assertEqual(
+            [('a', 5, 0), ('c', 3, 2)], sorted(sketch.items())
+        )
+
+
+class TopTests(unittest.TestCase):
+
+    def test_all(self):
+        values = [[1, 'a'], [3, 'b']]
+        self.assertEqual(values, top(values, 0))
+
+    def test_k(self):
+        values = [[1, 'a'], [3, 'b'], [2, 'c']]
+        self.assertEqual([(3, 'b'), (2, 'c')], top(values, 2))
+
+
+class CountMinSketchTests(unittest.TestCase):
+
+    def build(self, stream, **kwargs):
+        sketch = CountMinSketch.from_error(epsilon=0.001, delta=0.01, **kwargs)
+        for word in stream:
+            sketch.add((word, ))
+        return sketch
+
+    def test_bounds(self):
+        stream = build_stream()
+        counts = Counter(stream)
+        for conservative in [False, True]:
+            sketch = self.build(stream, conservative=conservative)
+            bound = 0.001 * len(stream)
+            for word, count in counts.items():
+                estimate = sketch.query((word, ))
+                self.assertTrue(count <= estimate <= count + bound)
+
+    def test_merge(self):
+        stream = build_stream()
+        half = len(stream) // 2
+        merged = self.build(stream[:half])
+        merged.merge(CountMinSketch.load(self.build(stream[half:]).dump()))
+        whole = self.build(stream)
+        self.assertEqual(list(whole.table), list(merged.table))
+        self.assertEqual(len(stream), merged.total)
+
+    def test_merge_size(self):
+        with self.assertRaises(ValueError):
+            CountMinSketch(10, 2).merge(CountMinSketch(20, 2))
+
+    def test_unicode_keys(self):
+        """ keys hash the same after a round trip through JSON """
+        sketch = CountMinSketch(100, 3)
+        sketch.add(('word', u'Oreg\xf3n'))
+        self.assertEqual(1, sketch.query((u'word', u'Oreg\xf3n')))
+
+    def test_invalid_error(self):
+        with self.assertRaises(ValueError):
+            CountMinSketch.from_error(epsilon=0)
+
+
+class FrequentKeysTests(unittest.TestCase):
+
+    def test_frequent(self):
+        stream = build_stream()
+        counts = Counter(stream)
+        epsilon = 0.005
+        parts = [stream[i::4] for i in range(4)]
+        merged = FrequentKeys(epsilon=epsilon)
+        for part in parts:
+            summary = FrequentKeys(epsilon=epsilon)
+            for word in part:
+                summary.add((word, ))
+            merged.merge(summary.dump())
+        found = dict(merged.frequent(100))
+        # every key above the error bound is found with an upper bound count
+        for word, count in counts.items():
+            if count > epsilon * len(stream) and count >= 100:
+                self.assertIn((word, ), found)
+        for key, estimate in found.items():
+            self.assertTrue(estimate >= counts[key[0]])
+        self.assertEqual(int(math.ceil(epsilon * len(stream))), merged.error_bound())
+
+
+if __name__ == "__main__":
+    unittest.main()
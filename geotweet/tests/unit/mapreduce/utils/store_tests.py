@@ -0,0 +1,78 @@
+import unittest
+import os
+from os.path import dirname
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+
+from . import ROOT
+from geotweet.mapreduce.utils.lookup import project, SpatialLookup
+from geotweet.mapreduce.utils.store import FeatureStore, index_exists, remove_index
+from geotweet.mapreduce.utils.store import open_index, store_location
+
+
+testdata = os.path.join(dirname(os.path.abspath(__file__)), 'testdata')
+def read(geojson):
+    return json.loads(open(os.path.join(testdata, geojson), 'r').read())
+
+
+POLYGON_1 = read('polygon_102500_1.geojson')
+POLYGON_2 = read('polygon_102500_2.geojson')
+POINT_WITHIN = read('point_within.geojson')
+POINT_3200M =  read('point_3200m.geojson')
+
+
+class PersistedIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmp, 'polygons.geojson')
+        with open(self.src, 'w') as f:
+            collection = dict(type='FeatureCollection', features=[POLYGON_1, POLYGON_2])
+            f.write(json.dumps(collection))
+        self.location = SpatialLookup().get_location(self.src)
+
+    def tearDown(self):
+        remove_index(self.location)
+        shutil.rmtree(self.tmp)
+
+    def test_persist(self):
+        built = SpatialLookup(src=self.src)
+        error = "Index files were not written for < {0} >".format(self.src)
+        self.assertTrue(index_exists(self.location), error)
+        loaded = SpatialLookup(src=self.src)
+        error = "Expected index to be loaded from feature store"
+        self.assertIsInstance(loaded.data_store, FeatureStore, error)
+        self.assertEqual(len(built.data_store), len(loaded.data_store))
+        for point in [POINT_WITHIN, POINT_3200M]:
+            point = project(point['geometry']['coordinates'])
+            for buffer_size in [0, 4000, 100000]:
+                expected = built.get_object(point, buffer_size=buffer_size)
+                actual = loaded.get_object(point, buffer_size=buffer_size)
+                self.assertEqual(expected, actual)
+
+    def test_read_only(self):
+        SpatialLookup(src=self.src)
+        path = store_location(self.location)
+        digest = hashlib.md5(open(path, 'rb').read()).hexdigest()
+        data_store, idx = open_index(self.location)
+        self.assertEqual(2, len(list(idx.intersection(idx.bounds))))
+        data_store.close()
+        del idx
+        error = "Opening an index must not modify its files"
+        self.assertEqual(digest, hashlib.md5(open(path, 'rb').read()).hexdigest(), error)
+
+    def test_stale(self):
+        SpatialLookup(src=self.src)
+        # source modified after index was written
+        mtime = os.path.getmtime(self.src) + 10
+        os.utime(self.src, (mtime, mtime))
+        lookup = SpatialLookup(src=self.src)
+        error = "Expected index to be rebuilt from modified source"
+        self.assertNotIsInstance(lookup.data_store, FeatureStore, error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import math
+import random
+
+from . import ROOT
+from geotweet.mapreduce.utils.tiles import tile, halo_tiles, METERS_PER_DEGREE
+
+
+PORTLAND = (-122.6765, 45.5231)
+
+
+def offset(point, dx, dy):
+    """ (lon, lat) moved by dx and dy meters """
+    lon, lat = point
+    dlat = dy / METERS_PER_DEGREE
+    dlon = dx / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+    return lon + dlon, lat + dlat
+
+
+class TileTests(unittest.TestCase):
+
+    def test_tile(self):
+        self.assertEqual('c20fb', tile(PORTLAND, 5))
+        # tiles nest in tiles of lower precision
+        self.assertTrue(tile(PORTLAND, 8).startswith(tile(PORTLAND, 6)))
+
+    def test_halo_contains_tile(self):
+        self.assertIn(tile(PORTLAND), halo_tiles(PORTLAND, 100))
+
+    def test_halo_covers_distance(self):
+        """ every point within distance falls in one of the halo tiles """
+        rand = random.Random(0)
+        distance = 150
+        for _ in range(200):
+            center = (rand.uniform(-124.0, -70.0), rand.uniform(25.0, 49.0))
+            tiles = halo_tiles(center, distance, 6)
+            for _ in range(20):
+                angle = rand.uniform(0, 2 * math.pi)
+                radius = rand.uniform(0, distance)
+                point = offset(
+                    center, radius * math.cos(angle), radius * math.sin(angle)
+                )
+                self.assertIn(tile(point, 6), tiles)
+
+    def test_halo_edge(self):
+        """ point next to a tile edge is replicated to the neighbour tile """
+        west, east = tile((-122.6, 45.5), 5), tile((-122.6 + 0.05, 45.5), 5)
+        self.assertNotEqual(west, east)
+        # find the edge between the two tiles
+        lo, hi = -122.6, -122.55
+        for _ in range(50):
+            mid = (lo + hi) / 2
+            if tile((mid, 45.5), 5) == west:
+                lo = mid
+            else:
+                hi = mid
+        point = offset((lo, 45.5), -50, 0)
+        self.assertEqual(set([west, east]), halo_tiles(point, 100, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
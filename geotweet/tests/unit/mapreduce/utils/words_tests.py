@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import unittest
+import os
+import json
+import random
+
+from . import ROOT
+from geotweet.mapreduce.utils.words import WordExtractor
+
+
+STOPWORDS = os.path.join(ROOT, 'geotweet/data/stopwords.txt')
+TWEETS = os.path.join(ROOT, 'geotweet/data/mapreduce/twitter-test.log1000')
+CHARS = u'ab#.!?,"(){}[]|&amp;@\\/:~ http éİK　\t'
+
+
+def run_legacy(extractor, line):
+    """ original regular expression based implementation of `run` """
+    words = []
+    for word in extractor.clean_unicode(line.lower()).split():
+        if word.startswith('http'):
+            continue
+        cleaned = extractor.clean_punctuation(word)
+        if len(cleaned) > 1 and cleaned not in extractor.stopwords:
+            words.append(cleaned)
+    return words
+
+
+class WordExtractorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.extractor = WordExtractor(src=STOPWORDS)
+
+    def assert_same(self, line):
+        expected = run_legacy(self.extractor, line)
+        actual = self.extractor.run(line)
+        self.assertEqual(expected, actual, "Line < {0} >".format(repr(line)))
+
+    def test_basic(self):
+        line = u"Hello @World!! Check http://t.co/abc &amp; #Portland café ~coffee:"
+        self.assertEqual(
+            ['hello', 'world', 'check', 'portland', 'caf', 'coffee'],
+            self.extractor.run(line)
+        )
+
+    def test_stopwords(self):
+        self.assertEqual(['coffee'], self.extractor.run(u"The coffee is at the"))
+
+    def test_tweets(self):
+        with open(TWEETS, 'r') as f:
+            for line in f:
+                self.assert_same(json.loads(line)['text'])
+
+    def test_random(self):
+        rand = random.Random(0)
+        for i in range(2000):
+            length = rand.randint(0, 30)
+            line = u''.join(rand.choice(CHARS) for j in range(length))
+            self.assert_same(line)
+            self.assert_same(line.encode('utf-8'))
+
+    def test_run_many(self):
+        lines = [u"first line here", u"", u"second line"]
+        expected = [self.extractor.run(line) for line in lines]
+        self.assertEqual(expected, list(self.extractor.run_many(iter(lines))))
+
+
+if __name__ == "__main__":
+    unittest.main()
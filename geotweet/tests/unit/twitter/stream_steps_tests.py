@@ -3,9 +3,11 @@ import json
 import os
 from os.path import dirname
 import sys
+import shutil
+import tempfile
 import inspect
 
-from geotweet.twitter.stream_steps import GeoFilterStep, ExtractStep
+from geotweet.twitter.stream_steps import GeoFilterStep, ExtractStep, DedupStep, ProcessStep
 
 
 import geotweet
@@ -56,5 +58,49 @@ class ExtractStepTests(unittest.TestCase):
                 self.assertIsNotNone(data['user_id'], 'Parsed tweet user_id is None')
 
 
+class CollectStep(ProcessStep):
+
+    def __init__(self):
+        self.tweets = []
+
+    def process(self, tweet):
+        self.tweets.append(tweet)
+        return tweet
+
+
+class DedupStepTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'twitter-stream.bloom')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def build(self):
+        step = DedupStep(path=self.path)
+        collect = CollectStep()
+        step.set_next(collect)
+        return step, collect
+
+    def test_drop_duplicates(self):
+        step, collect = self.build()
+        for tweet_id in ['1', '2', '1', '3', '2']:
+            step.process(dict(tweet_id=tweet_id))
+        self.assertEqual(['1', '2', '3'], [t['tweet_id'] for t in collect.tweets])
+        self.assertEqual(2, step.duplicates)
+        self.assertIsNone(step.process(None))
+
+    def test_restart(self):
+        step, collect = self.build()
+        step.process(dict(tweet_id='1'))
+        step.save()
+        # tweets sent again after a restart are dropped
+        step, collect = self.build()
+        step.process(dict(tweet_id='1'))
+        step.process(dict(tweet_id='2'))
+        self.assertEqual(['2'], [t['tweet_id'] for t in collect.tweets])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import signal
 import argparse
 
 root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -8,7 +9,7 @@ sys.path.append(root)
 
 from stream import TwitterStream
 from load import LogListener
-from stream_steps import GeoFilterStep, ExtractStep, LogStep
+from stream_steps import GeoFilterStep, ExtractStep, DedupStep, LogStep
 
 import logging
 
@@ -35,6 +36,7 @@ class Geotweet(object):
             self.log_interval = args.log_interval \
                 if args.log_interval else DEFAULT_LOG_INTERVAL
             self.bbox = self.build_bbox(args.bbox if args.bbox else CONTINENTAL_US)
+            self.dedup = not args.no_dedup
         except AttributeError:
             pass
         try:
@@ -78,9 +80,20 @@ class Geotweet(object):
         # initialize processing step chain
         self.add_step(GeoFilterStep())
         self.add_step(ExtractStep())
+        dedup = None
+        if self.dedup:
+            # tweet ids are kept next to the logs, the loader only picks up logs
+            dedup = DedupStep(path=os.path.join(self.log_dir, 'twitter-stream.bloom'))
+            self.add_step(dedup)
         self.add_step(LogStep(logfile=log, log_interval=self.log_interval))
+        # stop on SIGTERM like on Ctrl-C so the tweet ids are saved
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
         # start Twitter Streaming API (does not return)
-        TwitterStream().start(process_step=self.starting_step, locations=self.bbox)
+        try:
+            TwitterStream().start(process_step=self.starting_step, locations=self.bbox)
+        finally:
+            if dedup:
+                dedup.save()
 
     def load(self):
         msg = "Start listening for events in directory: {0}"
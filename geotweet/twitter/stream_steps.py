@@ -1,9 +1,19 @@
 import os
 import json
+import time
 from logging.handlers import TimedRotatingFileHandler
 
 import logging
 
+from ..mapreduce.utils.bloom import ScalableBloomFilter
+
+
+# DedupStep remembers the last 30 to 40 million tweet ids in under 90MB
+DEDUP_CAPACITY = 100000
+DEDUP_MAX_CAPACITY = 10000000
+DEDUP_MAX_STAGES = 4
+DEDUP_SAVE_INTERVAL = 60
+
 
 def get_rotating_logger(logfile, interval, when="M"):
     # create log directory if it doesn't exist
@@ -89,6 +99,57 @@ class ExtractStep(ProcessStep):
         return self.next(data)
 
 
+class DedupStep(ProcessStep):
+    """
+    Drop tweets with a `tweet_id` seen before
+
+    When the stream reconnects, tweets already logged may be sent again.
+    Ids are kept in a scalable Bloom filter of bounded size, so a small
+    fraction of new tweets is dropped as false positives. With `path` set
+    the filter is loaded from that file, saved to it every `save_interval`
+    seconds and on shutdown, so duplicates are also dropped across restarts.
+    Only the newest stage of the filter is written again by a save.
+
+    """
+    def __init__(self, path=None, save_interval=DEDUP_SAVE_INTERVAL):
+        self.path = path
+        self.save_interval = save_interval
+        self.duplicates = 0
+        self.seen = None
+        if path and os.path.isfile(path):
+            try:
+                self.seen = ScalableBloomFilter.load(path)
+                logging.info("Loaded {0} tweet ids from {1}".format(len(self.seen), path))
+            except (IOError, ValueError) as e:
+                logging.error("Ignoring saved tweet ids: {0}".format(e))
+        if self.seen is None:
+            self.seen = ScalableBloomFilter(
+                capacity=DEDUP_CAPACITY,
+                max_capacity=DEDUP_MAX_CAPACITY,
+                max_stages=DEDUP_MAX_STAGES
+            )
+        self.saved = time.time()
+
+    def process(self, tweet):
+        if not tweet:
+            return None
+        if self.seen.add(tweet['tweet_id']):
+            self.duplicates += 1
+            return None
+        if self.path and time.time() - self.saved >= self.save_interval:
+            self.save()
+        return self.next(tweet)
+
+    def save(self):
+        """ persist filter to `path` """
+        if not self.path:
+            return
+        self.seen.save(self.path)
+        self.saved = time.time()
+        logging.debug("Saved tweet ids to {0}, {1} duplicates dropped".format(
+            self.path, self.duplicates))
+
+
 class LogStep(ProcessStep):
     """ Log tweet to rotating log """
 
@@ -0,0 +1,59 @@
+import json
+import logging
+
+from .mapreduce.utils.lookup import CachedCountyLookup, CachedMetroLookup
+
+
+METERS_PER_MILE = 1609
+METRO_DISTANCE = 50 * METERS_PER_MILE
+GEOHASH_PRECISION = 7
+BATCH_SIZE = 5000
+LOOKUPS = ['county', 'metro']
+
+
+class CacheWarmer(object):
+    """
+    Pre-warm a shared lookup cache from historical tweet logs
+
+    Resolves the coordinates of every tweet in the logs with the same lookup
+    and geohash precision used by the MapReduce jobs, writing the results to
+    the sqlite file used as `GEOTWEET_SHARED_CACHE` on the hadoop nodes.
+
+    """
+    def __init__(self, args):
+        self.logs = args.logs
+        self.cache = args.cache
+        self.lookup = args.lookup
+        if self.lookup not in LOOKUPS:
+            error = "--lookup must be one of {0}".format(LOOKUPS)
+            raise ValueError(error)
+
+    def run(self):
+        kwargs = dict(precision=GEOHASH_PRECISION, shared_cache=self.cache)
+        if self.lookup == 'county':
+            lookup = CachedCountyLookup(**kwargs)
+            resolve = lambda points: lookup.get_many(points)
+        else:
+            lookup = CachedMetroLookup(**kwargs)
+            resolve = lambda points: lookup.get_many(points, METRO_DISTANCE)
+        for log in self.logs:
+            logging.info("Warming {0} cache from {1}".format(self.lookup, log))
+            points = []
+            for lonlat in self.read(log):
+                points.append(lonlat)
+                if len(points) >= BATCH_SIZE:
+                    resolve(points)
+                    points = []
+            if points:
+                resolve(points)
+        lookup.shared_cache.close()
+        logging.info("Cache stats: {0}".format(lookup.cache_stats()))
+
+    def read(self, log):
+        """ coordinates of each tweet in log """
+        with open(log, 'r') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)['lonlat']
+                except (ValueError, KeyError):
+                    continue
@@ -26,6 +26,7 @@ setup(
         'python-twitter',
         'pymongo',
         'Geohash',
+        'numpy',
         'Shapely',
         'Rtree',
         'pyproj',